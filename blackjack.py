@@ -11,9 +11,16 @@ __copyright__ = "Copyright 2019, Kyle Long"
 __python_version__ = "3.7.4"
 
 
+import os
+import sys
 import time
 import random
-from collections import OrderedDict
+import select
+from collections import OrderedDict, deque
+from contextlib import contextmanager, redirect_stdout
+
+from rules import TableRules
+from shuffles import gather
 
 YES_LIST = ['y', 'yes', 'Y', 'Yes']
 NO_LIST = ['n', 'no', 'N', 'No']
@@ -21,21 +28,65 @@ HIT_LIST = ['h', 'hit', 'H', 'Hit']
 STAY_LIST = ['s', 'stay', 'S', 'Stay']
 DOUBLE_DOWN_LIST = ['d', 'double', 'double down', 'D', 'Double', 'Double Down']
 SPLIT_LIST = ['split', 'Split']
+SURRENDER_LIST = ['r', 'surrender', 'R', 'Surrender']
+YES_NO = ('y', 'n')
+
+# case-insensitive lookup of every accepted response -> its short form
+# (the first entry of its list), i.e. 'Double Down' -> 'd'
+ACTIONS = {alias.lower(): responses[0]
+           for responses in (YES_LIST, NO_LIST, HIT_LIST, STAY_LIST,
+                             DOUBLE_DOWN_LIST, SPLIT_LIST, SURRENDER_LIST)
+           for alias in responses}
+
+# responses typed ahead on one line (i.e. '25 h s'), used by later prompts
+# of the player who typed them (input_player, None if typed at a prompt
+# for nobody in particular, i.e. table setup, or queued by replay.py)
+input_queue = deque()
+input_player = None
+
+# callbacks notified of table events as listener(event, **data), see emit()
+listeners = []
+
+# hi-lo count tag for each card value (Ace = 1)
+HI_LO = {1: -1, 2: 1, 3: 1, 4: 1, 5: 1, 6: 1, 7: 0, 8: 0, 9: 0, 10: -1}
 
 MIN_PLAYERS = 1
 MAX_PLAYERS = 5
 MIN_DECKS = 1
 MAX_DECKS = 8
 
+# seconds to pause between dealer actions & shuffles. quiet() sets it to 0
+DELAY = 1
+
+# print settlements. quiet() turns it off so headless runs skip formatting
+RENDER = True
+
+# seconds a player has to answer each kind of prompt before the default
+# answer is taken for them (see input_func()). None waits forever
+TIMEOUTS = {'wager': None, 'insurance': None, 'action': None,
+            'play_again': None}
+
+# prompts in a row a player can let time out before the defaults stop
+# wagering for them & take them away from the table
+IDLE_TIMEOUTS = 3
+
+# rules used when none are passed in: dealer hits soft 17, 3:2 blackjack,
+# unlimited resplits, reshuffle at 50% penetration
+RULES = TableRules()
+
 divider = '\n*************************************'
 
 
-def run():
+def run(rules=RULES, shuffler=None):
     """
     Collects initial info such as how many gamblers will be playing, the name
     of each gambler, buy in amounts, and how many decks will be in the shoe.
 
     Creates the Gamblers, Dealer, & Deck, and then starts the game.
+
+    args:
+        rules (class):      TableRules() object
+        shuffler (class):   optional shuffles.Procedure() for the shoe
     """
     num_players = None
 
@@ -63,13 +114,13 @@ def run():
                            min_value=MIN_DECKS,
                            max_value=MAX_DECKS)
 
-    deck = Deck(num_decks)
-    play(players, deck)
+    deck = Deck(num_decks, shuffler)
+    play(players, deck, rules=rules)
 
     return
 
 
-def play(players, deck, first_shuffle=True):
+def play(players, deck, first_shuffle=True, rules=RULES):
     """
     Creates & shuffles deck/shoe.
     Deal cards.
@@ -83,14 +134,22 @@ def play(players, deck, first_shuffle=True):
         deck (class):           Deck() object
         first_shuffle (bool):   used to wish everybody good luck
                                 on the first shuffle of the game
+        rules (class):          TableRules() object
     """
+    if listeners:
+        emit('table_open', players=players, deck=deck, rules=rules)
+
     while len(players) > 1:
 
-        # reshuffle after 50% penetration
-        if len(deck.cards) < 52 * deck.num_decks * 0.5:
+        # reshuffle at the rules' penetration, keeping enough cards back
+        # for a round at this table. The shuffle is seeded so a session
+        # can be replayed from its shoe seeds (see replay.py)
+        if len(deck.cards) < rules.reshuffle_at(deck.num_decks,
+                                                len(players)):
+            seed = random.getrandbits(64)
             deck.cards = []
             deck.create()
-            deck.shuffle()
+            deck.shuffle(seed)
 
             shuffle_str = ''
             if first_shuffle:
@@ -110,29 +169,123 @@ def play(players, deck, first_shuffle=True):
                               f'{deck.num_decks} deck shoe.{Format.END}'
 
             print(f'\n{shuffle_str}\n')
-            time.sleep(1)
+            if listeners:
+                emit('shuffle', deck=deck, seed=seed)
+            if DELAY:
+                time.sleep(DELAY)
 
-        deal(players, deck)
-        print_cards(players)
+        play_round(players, deck, rules)
+        play_again(players, deck)
+        first_shuffle = False
 
-        if not check_dealer_for_blackjack(players):
-            play_hands(players, deck)
+    return
 
-        determine_winners(players, deck)
-        settle_up(players)
-        reset_hands(players)
-        play_again(players, deck)
+
+def play_round(players, deck, rules=RULES):
+    """
+    Play a single round: deal, play each hand, play the dealer's hand,
+    and settle up all bets.
+
+    args:
+        players (list):     list of all players
+        deck (class):       Deck() object
+        rules (class):      TableRules() object
+    """
+    deal(players, deck)
+    print_cards(players)
+
+    if not check_dealer_for_blackjack(players, rules):
+        play_hands(players, deck, rules)
+
+    determine_winners(players, deck, rules)
+    settle_up(players, rules)
+    if listeners:
+        emit('round_end', players=players, deck=deck)
+    reset_hands(players)
 
     return
 
 
-def play_hands(players, deck):
+def emit(event, **data):
+    """
+    Notify every listener of a table event. Call sites check
+    `if listeners:` first so an unobserved table pays nothing.
+
+    events:
+        table_open:     players, deck & rules (before the first round)
+        shuffle:        deck, seed the shoe was shuffled with
+        prompt:         question, answer, seconds spent answering, kind
+                        of prompt & whether it timed_out
+        decision:       players, player, hand & action ('s', 'h', 'd',
+                        'split', 'r', or 'y'/'n' for insurance), before
+                        the action is applied
+        split:          hand that was split, hands it was split into
+        dealer_done:    dealer_hand, seconds spent playing it
+        settle:         player, hand, winnings
+        round_end:      players, deck (before hands are reset)
+
+    args:
+        event (str):    name of the event
+        data (dict):    event details, passed on as keyword arguments
+    """
+    for listener in listeners:
+        listener(event, **data)
+
+    return
+
+
+@contextmanager
+def quiet():
+    """
+    Silences all table output & pauses. Used to run headless
+    simulations through the same functions a live table uses.
+    """
+    global DELAY, RENDER
+    delay, render = DELAY, RENDER
+    DELAY, RENDER = 0, False
+    try:
+        with open(os.devnull, 'w') as devnull, redirect_stdout(devnull):
+            yield
+    finally:
+        DELAY, RENDER = delay, render
+
+
+def shoe_state(deck, players=None):
+    """
+    Shoe information visible to everybody at the table. The dealer's
+    hole card is left out of the count until it is revealed.
+
+    args:
+        deck (class):       Deck() object
+        players (list):     list of all players
+
+    returns:
+        (dict):             num_decks, cards_remaining,
+                            running_count & true_count
+    """
+    running_count = deck.running_count
+    if players and players[-1].hands:
+        hole_card = players[-1].hands[0].cards[0]
+        if hole_card.hidden:
+            running_count -= HI_LO[hole_card.value]
+
+    cards_remaining = len(deck.cards)
+    decks_remaining = max(cards_remaining / 52, 0.5)
+
+    return {'num_decks': deck.num_decks,
+            'cards_remaining': cards_remaining,
+            'running_count': running_count,
+            'true_count': running_count / decks_remaining}
+
+
+def play_hands(players, deck, rules=RULES):
     """
     Play each Gambler's hand.
 
     args:
         players (list):     list of all players
         deck (class):       Deck() object
+        rules (class):      TableRules() object
     """
     for player in players:
         if player.name == 'Dealer':
@@ -145,8 +298,9 @@ def play_hands(players, deck):
             hand = player.hands[i]
             i += 1
 
-            # No need to continue if hand is a blackjack
-            if hand.blackjack:
+            # No need to continue if hand is a blackjack or has already
+            # been played (i.e. a round resumed from a snapshot)
+            if hand.blackjack or hand.final_value is not None:
                 continue
 
             while True:
@@ -156,28 +310,48 @@ def play_hands(players, deck):
                 else:
                     player_name = player.name
 
-                hand_list = HIT_LIST + STAY_LIST
                 suggested_dict = {'stay': 's', 'hit': 'h'}
 
-                # Double downs & splits only allowed right after initial deal
+                # Double downs, splits & surrenders only allowed right
+                # after the initial deal (and as the rules allow)
                 if hand.first_iter:
-                    if player.money >= hand.wager * 2:
-                        hand_list += DOUBLE_DOWN_LIST
+                    splits = num_hands - 1
+                    if player.money >= hand.wager * 2 and \
+                            (not splits or rules.double_after_split):
                         suggested_dict['double down'] = 'd'
-                    if hand.cards[0].rank == hand.cards[1].rank:
-                        hand_list += SPLIT_LIST
+                    if hand.cards[0].rank == hand.cards[1].rank and \
+                            rules.can_split(hand.cards[0].rank, splits):
                         suggested_dict['split'] = 'split'
+                    if rules.late_surrender and not splits:
+                        suggested_dict['surrender'] = 'r'
 
                 suggested_keys = ", ".join(suggested_dict.keys())
                 suggested_values = "/".join(suggested_dict.values())
                 question = f'{player_name}, would you like to ' \
                     f'{suggested_keys}? ({suggested_values}): '
-
-                # Ask gambler what action they'd like to take
-                user_input = input_func(question,
-                                        expected_type=str,
-                                        str_options=hand_list,
-                                        str_suggestions=suggested_values)
+                options = list(suggested_dict.values())
+
+                # Ask gambler (or their bot) what action they'd like to take
+                if player.strategy:
+                    upcard = players[-1].hands[0].cards[1]
+                    user_input = player.strategy.action(
+                        hand, upcard, options, player.money,
+                        shoe_state(deck, players))
+                    if user_input not in options:
+                        raise ValueError(f'{player.strategy.name} chose an '
+                                         f'illegal action: {user_input!r}')
+                else:
+                    user_input = input_func(question,
+                                            expected_type=str,
+                                            str_options=options,
+                                            str_suggestions=suggested_values,
+                                            kind='action',
+                                            default='s',
+                                            player=player)
+
+                if listeners:
+                    emit('decision', players=players, player=player,
+                         hand=hand, action=user_input)
 
                 # Check for 'hit'
                 if user_input in HIT_LIST:
@@ -192,6 +366,14 @@ def play_hands(players, deck):
                     print_cards(players)
                     break
 
+                # Check for 'surrender'
+                elif user_input in SURRENDER_LIST:
+                    hand.surrender = True
+                    hand.final_value = hand.get_hand_value()[-1]
+                    print(f'\n{player_name} has surrendered.')
+                    print_cards(players)
+                    break
+
                 # Check for 'double down'
                 elif user_input in DOUBLE_DOWN_LIST:
                     hand.double_down = True
@@ -226,12 +408,19 @@ def play_hands(players, deck):
                         h.wager = hand.wager
                         h.deal_card(deck)
 
+                        # split Aces may only get the one card
+                        if h.cards[0].rank == 'Ace' and \
+                                not rules.hit_split_aces:
+                            h.final_value = h.get_hand_value()[-1]
+
                     # insert split hands list in the place of the old hand
                     player.hands = \
                         [new_hand if x == hand else x for x in player.hands]
 
                     # flatten the list
                     player.hands = flatten_list(player.hands)
+                    if listeners:
+                        emit('split', hand=hand, hands=new_hand)
 
                     num_hands = len(player.hands)
                     i -= 1
@@ -262,17 +451,39 @@ def deal(players, deck, test=False):
         if player.name != 'Dealer':
             if test:
                 hand.wager = 25
+            elif player.strategy:
+                hand.wager = player.strategy.wager(player.money,
+                                                   shoe_state(deck))
+                if not (1 <= hand.wager <= player.money):
+                    raise ValueError(f'{player.strategy.name} placed an '
+                                     f'illegal wager: {hand.wager!r}')
             else:
+                # a player who doesn't answer repeats their last wager,
+                # or sits out if they have none or have been idle a while.
+                # Sitting out (a wager of 0) is only offered with a
+                # deadline, so without one a typed 0 is still refused
+                default = min(player.last_wager or 0, int(player.money))
+                if player.timeouts >= IDLE_TIMEOUTS:
+                    default = 0
+                sit_out = TIMEOUTS.get('wager') is not None
                 question = f'{player.name}, how much would you like ' \
-                           f'to wager? (Balance ${player.money}): '
+                           f'to wager? (Balance ${player.money}' \
+                           f'{", 0 to sit out" if sit_out else ""}): '
                 hand.wager = input_func(question,
                                         expected_type=int,
-                                        min_value=1,
-                                        max_value=player.money)
+                                        min_value=0 if sit_out else 1,
+                                        max_value=player.money,
+                                        kind='wager',
+                                        default=default,
+                                        player=player)
+                if not hand.wager:
+                    print(f'{player.name} is sitting out this round.')
+                    continue
+            player.last_wager = hand.wager
 
         # Deal 2 cards
         for i in range(2):
-            card = deck.cards.pop()
+            card = deck.draw()
 
             # First card for dealer is face down
             if i == 0 and player.name == 'Dealer':
@@ -298,12 +509,13 @@ def reset_hands(players):
     return
 
 
-def check_dealer_for_blackjack(players):
+def check_dealer_for_blackjack(players, rules=RULES):
     """
     Check to see if the dealer has blackjack
 
     args:
         players (list):     list of all players
+        rules (class):      TableRules() object
 
     returns:
         (bool):             True if dealer has blackjack
@@ -312,7 +524,7 @@ def check_dealer_for_blackjack(players):
     dealer_hand = players[-1].hands[0]
 
     # Offer gamblers insurance if dealer is showing 'Ace'
-    if dealer_hand.cards[1].rank == 'Ace':
+    if rules.insurance and dealer_hand.cards[1].rank == 'Ace':
         offer_insurance(players)
 
     dealer_hand.get_hand_value(include_hidden=True)
@@ -322,7 +534,8 @@ def check_dealer_for_blackjack(players):
         dealer_hand.cards[0].hidden = False
 
         for player in players[:-1]:
-            player.hands[0].final_value = player.hands[0].get_hand_value()[0]
+            for hand in player.hands[:1]:
+                hand.final_value = hand.get_hand_value()[0]
 
         return True
 
@@ -335,12 +548,27 @@ def offer_insurance(players):
         players (list):     list of all players
     """
     for player in players[:-1]:
-        question = f'{player.name}, would you like insurance? (y/n): '
-        insurance = input_func(question,
-                               expected_type=str,
-                               str_options=YES_LIST + NO_LIST,
-                               str_suggestions='y/n')
-        if insurance in YES_LIST:
+        # sitting out this round
+        if not player.hands:
+            continue
+
+        if player.strategy:
+            insurance = player.strategy.insurance(player.hands[0],
+                                                  player.money)
+        else:
+            question = f'{player.name}, would you like insurance? (y/n): '
+            insurance = input_func(question,
+                                   expected_type=str,
+                                   str_options=YES_NO,
+                                   str_suggestions='y/n',
+                                   kind='insurance',
+                                   default='n',
+                                   player=player) in YES_LIST
+
+        if listeners:
+            emit('decision', players=players, player=player,
+                 hand=player.hands[0], action='y' if insurance else 'n')
+        if insurance:
             player.hands[0].insurance = True
 
 
@@ -374,11 +602,16 @@ def play_again(players, deck):
     """
     gamblers = players[:-1]
     for gambler in gamblers:
+        # an idle player is taken away from the table
+        default = 'n' if gambler.timeouts >= IDLE_TIMEOUTS else 'y'
         question = f'{gambler.name}, would you like to play again? (y/n): '
         play_input = input_func(question,
                                 expected_type=str,
-                                str_options=YES_LIST + NO_LIST,
-                                str_suggestions='y/n')
+                                str_options=YES_NO,
+                                str_suggestions='y/n',
+                                kind='play_again',
+                                default=default,
+                                player=gambler)
 
         if play_input in YES_LIST:
             # Buy in for more money if need be
@@ -387,8 +620,11 @@ def play_again(players, deck):
                             'Would you like to buy in for more money? (y/n): '
                 re_buy = input_func(question,
                                     expected_type=str,
-                                    str_options=YES_LIST + NO_LIST,
-                                    str_suggestions='y/n')
+                                    str_options=YES_NO,
+                                    str_suggestions='y/n',
+                                    kind='play_again',
+                                    default='n',
+                                    player=gambler)
                 if re_buy in YES_LIST:
                     gambler.buy_in()
                 elif re_buy in NO_LIST:
@@ -399,29 +635,28 @@ def play_again(players, deck):
             players.remove(gambler)
             gambler.goodbye()
 
-    play(players, deck, first_shuffle=False)
-
     return
 
 
-def determine_winners(players, deck):
+def determine_winners(players, deck, rules=RULES):
     """
     Determine winners for all gamblers' hands
 
     args:
         players (list):     list of all players
         deck (class):       Deck() object
+        rules (class):      TableRules() object
     """
     dealer = players[-1]
     dealer_hand = dealer.hands[0]
     dealer_hand.cards[0].hidden = False
 
     # Play out the dealer's hand
-    play_dealer_hand(players, deck, dealer_hand)
+    play_dealer_hand(players, deck, dealer_hand, rules)
 
     for player in players[:-1]:
         for hand in player.hands:
-            if not hand.busted:
+            if not hand.busted and not hand.surrender:
                 if dealer_hand.busted:
                     hand.win = True
                 elif hand.final_value > dealer_hand.final_value:
@@ -432,7 +667,7 @@ def determine_winners(players, deck):
     return
 
 
-def play_dealer_hand(players, deck, dealer_hand):
+def play_dealer_hand(players, deck, dealer_hand, rules=RULES):
     """
     Play out the dealer's hand
 
@@ -440,21 +675,23 @@ def play_dealer_hand(players, deck, dealer_hand):
         players (list):         list of all players
         deck (class):           Deck() object
         dealer_hand (class):    the dealer's hand
+        rules (class):          TableRules() object
     """
+    start = time.perf_counter()
+    stand_values = rules.stand_values
 
     # Get the initial value of the dealer's 2 card hand
     while True:
         values = dealer_hand.get_hand_value()
 
-        # dealer must hit a soft 17
-        stand_value = 17
-        if len(values) == 2:
-            stand_value = 18
+        # a soft hand has 2 values. Hits a soft 17 under H17 rules
+        stand_value = stand_values[len(values) == 2]
 
         value = values[-1]
 
         # Dealer stands
-        time.sleep(1)
+        if DELAY:
+            time.sleep(DELAY)
         if value >= stand_value:
             dealer_hand.final_value = value
 
@@ -469,82 +706,129 @@ def play_dealer_hand(players, deck, dealer_hand):
             print_cards(players, show=True)
             dealer_hand.deal_card(deck)
 
+    if listeners:
+        emit('dealer_done', dealer_hand=dealer_hand,
+             seconds=time.perf_counter() - start)
+
     return
 
 
-def settle_up(players):
+def settle_up(players, rules=RULES):
     """
-    Settle up everybody's bets.
+    Settle up everybody's bets. Every hand is settled in integer cents
+    first, then balances are updated & the results printed.
 
     args:
         players (list):     list of all players
+        rules (class):      TableRules() object
     """
+    dealer_blackjack = players[-1].hands[0].blackjack
 
-    dealer_hand = players[-1].hands[0]
-    # Notify everybody that they've lost if the dealer has blackjack
-    if dealer_hand.blackjack:
-        print(divider)
-        print('Sorry! Dealer had Blackjack.\n')
-
+    ledger = []
     for player in players[:-1]:
-        num_hands = len(player.hands)
-        i = 0
-        while i < num_hands:
-            hand = player.hands[i]
-            i += 1
+        cents = 0
+        for hand in player.hands:
+            result = hand_result(hand, dealer_blackjack, rules)
+            ledger.append((player, hand, result))
+            cents += result
+        player.cents += cents
 
-            # Handle's name differentiaion for multiple hands per gambler
-            if num_hands > 1:
-                player_name = f'{player.name} (Hand {i})'
-            else:
-                player_name = player.name
+    if RENDER:
+        print_settlement(players, ledger)
 
-            winnings = 0
+    if listeners:
+        for player, hand, result in ledger:
+            emit('settle', player=player, hand=hand,
+                 winnings=dollars(result), cents=result)
 
-            # Insurnace bets
-            if hand.insurance:
-                if dealer_hand.blackjack:
-                    winnings += hand.wager * 0.5
-                else:
-                    winnings -= hand.wager * 0.5
+    return
 
-                # Format winnings
-                if winnings % 1 == 0:
-                    winnings = int(winnings)
 
-            # Blackjack pays 3/2
-            if hand.blackjack:
-                winnings += hand.wager * 1.5
+def hand_result(hand, dealer_blackjack, rules=RULES):
+    """
+    Net result of a settled hand.
 
-                # Format winnings
-                if winnings % 1 == 0:
-                    winnings = int(winnings)
+    args:
+        hand (class):               Hand() object
+        dealer_blackjack (bool):    True if the dealer had blackjack
+        rules (class):              TableRules() object
 
-                print(f'{Format.BOLD}{Format.GREEN}{player_name} '
-                      f'got Blackjack! Won ${winnings}{Format.END}')
+    returns:
+        (int):                      net result in cents
+    """
+    wager = hand.wager
+    cents = 0
 
-            # Do nothing on push
-            elif hand.push:
-                print(f'{Format.BOLD}{player_name} pushed')
+    # Insurance bets
+    if hand.insurance:
+        if dealer_blackjack:
+            cents += wager * rules.insurance_cents
+        else:
+            cents -= wager * rules.insurance_cents
 
-            # Payout even money on win
-            elif hand.win:
-                winnings += hand.wager
-                print(f'{Format.BOLD}{Format.GREEN}{player_name} '
-                      f'won ${winnings}{Format.END}')
+    # Blackjack pays 3:2 (or 6:5)
+    if hand.blackjack:
+        cents += wager * rules.blackjack_cents
 
-            # Subtract wager on loss
-            else:
-                winnings -= hand.wager
-                print(f'{Format.BOLD}{Format.RED}{player_name} '
-                      f'lost ${abs(winnings)}{Format.END}')
+    # Lose half the wager on surrender
+    elif hand.surrender:
+        cents -= wager * 50
+
+    # Do nothing on push
+    elif hand.push:
+        pass
+
+    # Payout even money on win
+    elif hand.win:
+        cents += wager * 100
+
+    # Subtract wager on loss
+    else:
+        cents -= wager * 100
+
+    return cents
 
-            # Format player.money
-            player.money += winnings
-            if player.money % 1 == 0:
-                player.money = int(player.money)
 
-            # Print new balance
+def print_settlement(players, ledger):
+    """
+    Print the result of every hand settled by settle_up() & each
+    gambler's new balance.
+
+    args:
+        players (list):     list of all players
+        ledger (list):      (player, hand, result in cents) of each hand
+    """
+    # Notify everybody that they've lost if the dealer has blackjack
+    if players[-1].hands[0].blackjack:
+        print(divider)
+        print('Sorry! Dealer had Blackjack.\n')
+
+    for i, (player, hand, result) in enumerate(ledger):
+        # Handle's name differentiaion for multiple hands per gambler
+        if len(player.hands) > 1:
+            player_name = f'{player.name} ' \
+                          f'(Hand {player.hands.index(hand) + 1})'
+        else:
+            player_name = player.name
+
+        winnings = dollars(result)
+        if hand.blackjack:
+            print(f'{Format.BOLD}{Format.GREEN}{player_name} '
+                  f'got Blackjack! Won ${winnings}{Format.END}')
+        elif hand.surrender:
+            print(f'{Format.BOLD}{player_name} surrendered. '
+                  f'Lost ${abs(winnings)}{Format.END}')
+        elif hand.push:
+            print(f'{Format.BOLD}{player_name} pushed')
+        elif hand.win:
+            print(f'{Format.BOLD}{Format.GREEN}{player_name} '
+                  f'won ${winnings}{Format.END}')
+        else:
+            print(f'{Format.BOLD}{Format.RED}{player_name} '
+                  f'lost ${abs(winnings)}{Format.END}')
+
+        # Print new balance after the gambler's last hand
+        if i + 1 == len(ledger) or ledger[i + 1][0] is not player:
             print(f'{player.name}\'s Balance: ${player.money}\n')
 
     print(divider)
@@ -552,6 +836,18 @@ def settle_up(players):
     return
 
 
+def dollars(cents):
+    """
+    args:
+        cents (int):    amount in cents
+
+    returns:
+        amount in dollars, an int when it is whole (i.e. 657.5 or 650)
+    """
+    whole, part = divmod(cents, 100)
+    return whole if not part else cents / 100
+
+
 def print_cards(players, show=False):
     """
     Prints all players' hands
@@ -613,48 +909,150 @@ def print_cards(players, show=False):
 
 def input_func(question, expected_type=None,
                min_value=None, max_value=None,
-               str_options=None, str_suggestions=None):
+               str_options=None, str_suggestions=None,
+               kind=None, default=None, player=None):
     """
     Handle user input for any generic question.
 
+    Several responses can be typed on one line (i.e. '25 h s' to wager
+    $25, hit, then stay). The extra responses are queued & answer the
+    following prompts of the same player. An invalid queued response, or
+    a prompt for another player, clears the queue.
+
+    If TIMEOUTS has a deadline for the kind of prompt and nothing valid
+    is answered in time, the default is taken as the answer. The
+    player's run of timed out prompts is kept in Gambler.timeouts.
+
     args:
         question (str):         Question to be asked to the user
         expected_type (class):  str, int
         min_value (int):        minimum acceptable input value
         max_value (int):        maximum acceptable input value
-        str_options (list):     list of acceptable user responses
+        str_options (list):     list of acceptable responses, in their
+                                short form (i.e. 'h', 'y', 'split')
         str_suggestions (list): list of suggested responses
+        kind (str):             kind of prompt, a key of TIMEOUTS
+        default:                answer taken when the deadline passes
+        player (class):         Gambler() being asked, if any
 
     returns:
         converted_input (int):  converts user inputed str to an int
-        user_input (str):       string input from user
+        user_input (str):       short form of the user's response
 
     """
+    global input_player
+    start = time.perf_counter()
+    timeout = TIMEOUTS.get(kind)
+    if input_player is not None and input_player is not player:
+        input_queue.clear()
+        input_player = None
     while True:
-        user_input = input(question)
+        if input_queue:
+            user_input = input_queue.popleft()
+            print(f'{question}{user_input}')
+        else:
+            remaining = None
+            if timeout is not None:
+                remaining = timeout - (time.perf_counter() - start)
+            line = read_line(question, remaining)
+
+            if line is None:
+                print(f'Out of time! Answered: {default}')
+                if player is not None:
+                    player.timeouts += 1
+                if listeners:
+                    emit('prompt', question=question, answer=default,
+                         seconds=time.perf_counter() - start, kind=kind,
+                         timed_out=True)
+                return default
+
+            line = line.strip()
+
+            # a single response may contain spaces (i.e. 'double down')
+            if line.lower() in ACTIONS:
+                responses = [line]
+            else:
+                responses = line.split()
+
+            if not responses:
+                user_input = ''
+            else:
+                user_input = responses[0]
+                input_queue.extend(responses[1:])
+                input_player = player
 
         if expected_type == int:
             try:
                 converted_input = int(user_input)
             except ValueError:
+                input_queue.clear()
                 print(f'Invalid input. Expected an integer between '
                       f'{min_value}-{max_value}')
                 continue
 
             if not (min_value <= converted_input <= max_value):
+                input_queue.clear()
                 print(f'Invalid input. Expected an integer between '
                       f'{min_value}-{max_value}')
                 continue
 
+            if player is not None:
+                player.timeouts = 0
+            if listeners:
+                emit('prompt', question=question, answer=converted_input,
+                     seconds=time.perf_counter() - start, kind=kind,
+                     timed_out=False)
+
             return converted_input
 
         elif expected_type == str:
-            if user_input not in str_options:
+            action = ACTIONS.get(user_input.lower())
+            if action is None or action not in str_options:
+                input_queue.clear()
                 print(f'Invalid input. Expected one of the following: '
                       f'({str_suggestions})')
                 continue
 
-            return user_input
+            if player is not None:
+                player.timeouts = 0
+            if listeners:
+                emit('prompt', question=question, answer=action,
+                     seconds=time.perf_counter() - start, kind=kind,
+                     timed_out=False)
+
+            return action
+
+
+def read_line(question, timeout=None):
+    """
+    input() with an optional deadline, waiting on stdin with select().
+    Where stdin can't be waited on (i.e. Windows consoles, or stdin
+    replaced by a test runner) it waits like input().
+
+    args:
+        question (str):     prompt printed before reading
+        timeout (float):    seconds to wait, None waits forever
+
+    returns:
+        (str):              the line read, or None if the deadline passed
+    """
+    if timeout is None:
+        return input(question)
+
+    try:
+        print(question, end='', flush=True)
+        ready, _, _ = select.select([sys.stdin], [], [], max(timeout, 0))
+    except (OSError, ValueError, TypeError):
+        return input('')
+
+    if not ready:
+        print('')
+        return None
+
+    line = sys.stdin.readline()
+    if not line:
+        raise EOFError
+    return line.rstrip('\n')
 
 
 class Deck():
@@ -663,11 +1061,21 @@ class Deck():
 
     args:
         num_decks (int):    number of decks to be used in the shoe
+        shuffler (class):   optional shuffles.Procedure() that reshuffles
+                            the shoe from its discards instead of a
+                            uniform shuffle
     """
 
-    def __init__(self, num_decks=1):
+    def __init__(self, num_decks=1, shuffler=None):
         self.num_decks = num_decks
+        self.shuffler = shuffler
         self.cards = []
+        self._shoe = []
+        # last shuffled order & the list dealt from, so a shuffler can
+        # gather the discards in the order they were dealt
+        self._order = None
+        self._dealing = None
+        self.running_count = 0
         self.suits = ('Hearts', 'Diamonds', 'Clubs', 'Spades')
         self.ranks = OrderedDict([('Two', 2), ('Three', 3), ('Four', 4),
                                   ('Five', 5), ('Six', 6), ('Seven', 7),
@@ -676,17 +1084,108 @@ class Deck():
                                   ('Ace', 1)])
 
     def create(self):
-        for i in range(self.num_decks):
-            for suit in self.suits:
-                for rank in self.ranks:
-                    value = self.ranks[rank]
-                    self.cards.append(Card(suit, rank, value))
+        """
+        Add a full shoe of cards. The Card() objects are created once
+        per Deck and reused by every reshuffle.
+        """
+        if not self._shoe:
+            for i in range(self.num_decks):
+                for suit in self.suits:
+                    for rank in self.ranks:
+                        value = self.ranks[rank]
+                        self._shoe.append(Card(suit, rank, value))
+
+        for card in self._shoe:
+            card.hidden = False
+        self.cards.extend(self._shoe)
+        self.running_count = 0
         return
 
-    def shuffle(self):
-        random.shuffle(self.cards)
+    def shuffle(self, seed=None, antithetic=False):
+        """
+        Seeded shuffles use seeded_shuffle() so the same shoe order
+        can be replayed. With a shuffler, a full shoe is reshuffled from
+        the previous shoe's discards (shuffles.gather()), so the same
+        seed only replays the same order from the same previous shoe.
+
+        args:
+            seed (int):         optional seed so the same shoe order
+                                can be replayed (i.e. simulations)
+            antithetic (bool):  shuffle with the seed's antithetic draws
+        """
+        if self.shuffler is not None:
+            if antithetic:
+                raise ValueError('antithetic shuffles need the uniform '
+                                 'shuffle')
+            cards = self.cards
+            if self._order is not None and len(cards) == len(self._order):
+                cards = gather(self._order, len(self._dealing))
+            self.cards = self.shuffler(cards, seed)
+            self._order = self.cards[:]
+            self._dealing = self.cards
+        elif seed is None:
+            random.shuffle(self.cards)
+        else:
+            seeded_shuffle(self.cards, seed, antithetic)
         return
 
+    def card_ids(self):
+        """
+        Compact form of the shoe: one byte per card, in dealing order
+        reversed (the next card dealt is last). A card's id is its
+        position in a freshly created deck (suit * 13 + rank).
+
+        returns:
+            (bytes):        card ids
+        """
+        return bytes(CARD_IDS[(card.suit, card.rank)] for card in self.cards)
+
+    def load(self, ids):
+        """
+        Replace the shoe with new cards in the given order.
+
+        args:
+            ids (bytes):    card ids, i.e. from card_ids()
+        """
+        self.cards = [Card(*CARD_INFO[i]) for i in ids]
+        self._order = None
+        self.running_count = 0
+        return
+
+    def draw(self):
+        """
+        Remove the next card from the shoe & update the hi-lo
+        running count.
+
+        returns:
+            card (class):   Card() object
+        """
+        card = self.cards.pop()
+        self.running_count += HI_LO[card.value]
+        return card
+
+
+def seeded_shuffle(items, seed, antithetic=False):
+    """
+    In place Fisher-Yates shuffle driven by uniform draws, so a seed gives
+    the same order on every machine and its antithetic order (each draw u
+    replaced by 1 - u) can be built.
+
+    args:
+        items (list):       list to be shuffled
+        seed (int):         seed for the draws
+        antithetic (bool):  shuffle with the seed's antithetic draws
+    """
+    rng = random.Random(seed)
+    for i in range(len(items) - 1, 0, -1):
+        u = rng.random()
+        if antithetic:
+            u = 1.0 - u
+        j = min(int(u * (i + 1)), i)
+        items[i], items[j] = items[j], items[i]
+
+    return
+
 
 class Hand():
     """
@@ -700,6 +1199,7 @@ class Hand():
         self.win = False
         self.push = False
         self.double_down = False
+        self.surrender = False
         self.split = []
         self.insurance = False
         self.busted = False
@@ -721,7 +1221,7 @@ class Hand():
         if card:
             self.cards.append(card)
         else:
-            self.cards.append(deck.cards.pop())
+            self.cards.append(deck.draw())
         return
 
     def check_busted(self):
@@ -835,15 +1335,35 @@ class Dealer(Player):
 
 class Gambler(Player):
     """
-    Gambler Class holds each Gambler's total chip value.
+    Gambler Class holds each Gambler's total chip value, in cents.
     Handles buy-ins and a salutation when the game is done.
 
     args:
-        name (str):     name of the gambler
+        name (str):         name of the gambler
+        strategy (class):   optional Strategy() bot that makes the
+                            gambler's decisions instead of input()
     """
-    def __init__(self, name):
+    def __init__(self, name, strategy=None):
         Player.__init__(self, name)
-        self.money = None
+        self.cents = None
+        self.strategy = strategy
+        self.last_wager = None
+        # prompts in a row that timed out, see input_func()
+        self.timeouts = 0
+
+    @property
+    def money(self):
+        """
+        Balance in dollars. The balance itself is kept in integer cents
+        (.cents) so it never drifts.
+        """
+        if self.cents is None:
+            return None
+        return dollars(self.cents)
+
+    @money.setter
+    def money(self, value):
+        self.cents = None if value is None else round(value * 100)
 
     def buy_in(self, test=False):
         """
@@ -869,6 +1389,14 @@ class Gambler(Player):
         return
 
 
+# (suit, rank, value) for each card id, in Deck.create() order
+_deck = Deck()
+CARD_INFO = [(suit, rank, value)
+             for suit in _deck.suits
+             for rank, value in _deck.ranks.items()]
+CARD_IDS = {(suit, rank): i for i, (suit, rank, value) in enumerate(CARD_INFO)}
+
+
 class Format():
     """
     Handles text formatting for command line printing.
@@ -880,4 +1408,16 @@ class Format():
 
 
 if __name__ == "__main__":
-    run()
+    import argparse
+    import shuffles
+    parser = argparse.ArgumentParser(description='Blackjack')
+    parser.add_argument('--timeout', type=float, default=None,
+                        help='seconds to answer each prompt before the '
+                             'default answer is taken')
+    parser.add_argument('--shuffle', default=None,
+                        choices=sorted(shuffles.PRESETS),
+                        help='shuffle the shoe the way a dealer would '
+                             'instead of uniformly')
+    args = parser.parse_args()
+    TIMEOUTS.update(dict.fromkeys(TIMEOUTS, args.timeout))
+    run(shuffler=shuffles.PRESETS.get(args.shuffle))
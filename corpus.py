@@ -0,0 +1,204 @@
+#!/usr/bin/env python
+
+"""
+Precomputed corpus of shuffled shoe orders for blackjack.py simulations
+
+Shoes are written once to a compact binary file (one byte per card) and
+memory-mapped by every worker process, so simulations skip the shuffle
+and any experiment can be replayed exactly on any machine.
+
+File layout:
+    header:     magic (4s), version (H), num_decks (H),
+                cards per shoe (I), number of shoes (I)
+    body:       each shoe's Deck.card_ids(), back to back
+"""
+
+__author__ = "Kyle Long"
+__email__ = "long.kyle@gmail.com"
+__date__ = "08/26/2019"
+__copyright__ = "Copyright 2019, Kyle Long"
+__python_version__ = "3.7.4"
+
+
+import mmap
+import struct
+import argparse
+
+import blackjack as bj
+from blackjack import Deck
+import shuffles
+from shuffles import PRESETS, shoe_batches, shoe_orders
+
+MAGIC = b'BJSH'
+VERSION = 1
+HEADER = struct.Struct('<4sHHII')
+
+# bits of a shoe seed that hold the shoe index, the base seed sits above
+SHOE_BITS = 32
+
+
+def shoe_seed(seed, shoe):
+    """
+    Seed for a given shoe in a sequence. Every bot sees the same
+    shoe orders for the same (seed, shoe) pair, and no two pairs share
+    a seed (so runs at seed & seed + 1 never overlap).
+
+    args:
+        seed (int):     base seed of the run, not negative
+        shoe (int):     index of the shoe in the run, below 2 ** SHOE_BITS
+
+    returns:
+        (int):          seed passed to Deck.shuffle()
+    """
+    if seed < 0:
+        raise ValueError(f'seed {seed} is negative')
+    if not 0 <= shoe < 1 << SHOE_BITS:
+        raise ValueError(f'shoe {shoe} is out of range')
+    return seed << SHOE_BITS | shoe
+
+
+def write_corpus(path, shoes, num_decks=6, seed=0, shuffler=None,
+                 penetration=0.5):
+    """
+    Write a corpus of shuffled shoe orders. Shoe i is the order
+    Deck.shuffle(shoe_seed(seed, i)) would give, so a corpus replays the
+    same shoes as a seeded simulation. With a shuffler, each shoe is
+    instead reshuffled from an earlier one (shuffles.shoe_orders(),
+    whole batches of shoes at a time with numpy), so simulations read
+    physically shuffled shoes at no extra cost.
+
+    args:
+        path (str):             file to write
+        shoes (int):            number of shoes
+        num_decks (int):        number of decks in the shoe
+        seed (int):             base seed for the shoe sequence
+        shuffler (class):       optional shuffles.Procedure() object
+        penetration (float):    fraction of each shoe dealt before it is
+                                reshuffled by the shuffler
+    """
+    if not (bj.MIN_DECKS <= num_decks <= bj.MAX_DECKS):
+        raise ValueError(f'num_decks must be between '
+                         f'{bj.MIN_DECKS}-{bj.MAX_DECKS}')
+
+    deck = Deck(num_decks)
+    deck.create()
+    ids = list(deck.card_ids())
+
+    with open(path, 'wb') as f:
+        f.write(HEADER.pack(MAGIC, VERSION, num_decks, len(ids), shoes))
+        if shuffler is not None:
+            orders = shoe_batches if shuffles.np is not None else shoe_orders
+            for order in orders(shuffler, shoes, num_decks, seed,
+                                penetration):
+                f.write(order)
+            return
+
+        for shoe in range(shoes):
+            order = ids[:]
+            bj.seeded_shuffle(order, shoe_seed(seed, shoe))
+            f.write(bytes(order))
+
+    return
+
+
+class ShoeCorpus():
+    """
+    Read only, memory-mapped view of a corpus file. Shoes are returned
+    as zero-copy memoryview slices of the mapped file, so any number
+    of processes can share the same pages.
+
+    args:
+        path (str):     corpus file written by write_corpus()
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._file = open(path, 'rb')
+        self._map = mmap.mmap(self._file.fileno(), 0,
+                              access=mmap.ACCESS_READ)
+        self._view = memoryview(self._map)
+
+        magic, version, num_decks, shoe_size, shoes = \
+            HEADER.unpack_from(self._map)
+        if magic != MAGIC:
+            self.close()
+            raise ValueError(f'{path} is not a shoe corpus')
+        if version != VERSION:
+            self.close()
+            raise ValueError(f'{path} is corpus version {version}, '
+                             f'expected {VERSION}')
+
+        self.num_decks = num_decks
+        self.shoe_size = shoe_size
+        self.shoes = shoes
+
+    def __len__(self):
+        return self.shoes
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def shoe(self, index):
+        """
+        args:
+            index (int):        shoe index, 0 to len(corpus) - 1
+
+        returns:
+            (memoryview):       card ids for Deck.load(). Release it
+                                (i.e. use it in a with block) before
+                                the corpus is closed
+        """
+        if not (0 <= index < self.shoes):
+            raise IndexError(f'shoe {index} is out of range')
+        start = HEADER.size + index * self.shoe_size
+        return self._view[start:start + self.shoe_size]
+
+    def partition(self, worker, workers):
+        """
+        Deterministic, contiguous share of the shoes for one worker.
+        Every shoe belongs to exactly one worker.
+
+        args:
+            worker (int):       this worker's index, 0 to workers - 1
+            workers (int):      total number of workers
+
+        returns:
+            (range):            shoe indexes for this worker
+        """
+        if not (0 <= worker < workers):
+            raise ValueError(f'worker must be between 0-{workers - 1}')
+        return range(self.shoes * worker // workers,
+                     self.shoes * (worker + 1) // workers)
+
+    def close(self):
+        self._view.release()
+        self._map.close()
+        self._file.close()
+
+        return
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Write a shoe corpus')
+    parser.add_argument('path')
+    parser.add_argument('--shoes', type=int, default=100000)
+    parser.add_argument('--decks', type=int, default=6)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--shuffle', default=None, choices=sorted(PRESETS),
+                        help='reshuffle each shoe from the last one the '
+                             'way a dealer would')
+    parser.add_argument('--penetration', type=float,
+                        default=bj.RULES.penetration)
+    args = parser.parse_args()
+
+    write_corpus(args.path, args.shoes, args.decks, args.seed,
+                 PRESETS.get(args.shuffle), args.penetration)
+
+    return
+
+
+if __name__ == "__main__":
+    main()
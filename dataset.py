@@ -0,0 +1,434 @@
+#!/usr/bin/env python
+
+"""
+Per-decision dataset export for blackjack.py
+
+Every decision made in play_hands() & every insurance answer in
+offer_insurance() becomes one row: the hand's total, soft & pair flags,
+the dealer's upcard, the true count, the action taken and the hand's
+eventual net result in cents (a split's result is the sum of the hands
+it was split into).
+
+Rows are stored by column, one .npy file per column in chunks of up to
+CHUNK_ROWS rows, so each column can be memory-mapped on its own (with
+numpy, np.load(path, mmap_mode='r') reads them too). Writes go through
+bounded buffers, & a dataset can be appended to at any time: new rows
+fill the last chunk, then start new ones.
+
+Layout:
+    <path>/chunk-000000/<column>.npy
+    <path>/part-<start shoe>/chunk-000000/<column>.npy  (export())
+
+Each .npy file has a fixed HEADER_SIZE header, rewritten with the new
+row count after every append.
+"""
+
+__author__ = "Kyle Long"
+__email__ = "long.kyle@gmail.com"
+__date__ = "08/26/2019"
+__copyright__ = "Copyright 2019, Kyle Long"
+__python_version__ = "3.7.4"
+
+
+import os
+import re
+import ast
+import sys
+import mmap
+import argparse
+from array import array
+from multiprocessing import Pool
+
+import blackjack as bj
+from blackjack import Deck
+import simulation as sim
+import strategy as st
+from corpus import shoe_seed
+
+# column name, array typecode
+COLUMNS = (('total', 'b'), ('soft', 'b'), ('pair', 'b'), ('upcard', 'b'),
+           ('true_count', 'f'), ('action', 'b'), ('result', 'q'))
+
+# action column codes, insurance answers last
+DECISIONS = (st.STAY, st.HIT, st.DOUBLE_DOWN, st.SPLIT, 'r', 'y', 'n')
+_CODES = {action: code for code, action in enumerate(DECISIONS)}
+
+CHUNK_ROWS = 1 << 20
+BUFFER_ROWS = 1 << 16
+
+MAGIC = b'\x93NUMPY\x01\x00'
+HEADER_SIZE = 128
+_DESCR = {'b': '|i1', 'f': '<f4', 'q': '<i8'}
+
+
+def _header(typecode, rows):
+    """
+    .npy (version 1.0) header for a 1-d column, padded to HEADER_SIZE
+    so it can be rewritten in place as rows are appended.
+    """
+    text = f"{{'descr': '{_DESCR[typecode]}', 'fortran_order': False, " \
+           f"'shape': ({rows},), }}"
+    size = HEADER_SIZE - len(MAGIC) - 2
+    text = text.ljust(size - 1) + '\n'
+    return MAGIC + size.to_bytes(2, 'little') + text.encode('latin1')
+
+
+def _rows(path):
+    """
+    returns:
+        (int):      rows in a column file, from its header
+    """
+    with open(path, 'rb') as f:
+        header = f.read(HEADER_SIZE)
+    if header[:len(MAGIC)] != MAGIC:
+        raise ValueError(f'{path} is not a dataset column')
+    info = ast.literal_eval(header[len(MAGIC) + 2:].decode('latin1'))
+    return info['shape'][0]
+
+
+def _chunks(path):
+    """
+    returns:
+        (list):     every chunk directory under path, in order
+    """
+    chunks = []
+    for root, dirs, _ in os.walk(path):
+        dirs.sort()
+        chunks.extend(os.path.join(root, d) for d in dirs
+                      if re.fullmatch(r'chunk-\d+', d))
+    return sorted(chunks)
+
+
+class DecisionWriter():
+    """
+    Appends rows to a dataset directory through bounded buffers.
+
+    args:
+        path (str):         dataset directory, created or appended to
+        chunk_rows (int):   most rows per chunk
+        buffer_rows (int):  rows buffered before they're written
+    """
+
+    def __init__(self, path, chunk_rows=CHUNK_ROWS, buffer_rows=BUFFER_ROWS):
+        if sys.byteorder != 'little':
+            raise RuntimeError('datasets are written little endian')
+        self.path = path
+        self.chunk_rows = chunk_rows
+        self.buffer_rows = buffer_rows
+        self.buffers = [array(typecode) for _, typecode in COLUMNS]
+        os.makedirs(path, exist_ok=True)
+
+        # pick up where the last chunk left off
+        chunks = [d for d in sorted(os.listdir(path))
+                  if re.fullmatch(r'chunk-\d+', d)]
+        self.chunk = len(chunks) - 1 if chunks else 0
+        self.chunk_size = 0
+        if chunks:
+            self.chunk_size = _rows(self._column_path(COLUMNS[0][0]))
+
+    def append(self, row):
+        """
+        args:
+            row (tuple):    a value for each of COLUMNS
+        """
+        for buffer, value in zip(self.buffers, row):
+            buffer.append(value)
+        if len(self.buffers[0]) >= self.buffer_rows:
+            self.flush()
+        return
+
+    def flush(self):
+        """
+        Write the buffered rows, filling the last chunk before starting
+        a new one.
+        """
+        written = 0
+        pending = len(self.buffers[0])
+        while written < pending:
+            if self.chunk_size >= self.chunk_rows:
+                self.chunk += 1
+                self.chunk_size = 0
+            count = min(pending - written, self.chunk_rows - self.chunk_size)
+            rows = self.chunk_size + count
+            for (name, typecode), buffer in zip(COLUMNS, self.buffers):
+                self._write(name, typecode, buffer[written:written + count],
+                            rows)
+            self.chunk_size = rows
+            written += count
+
+        for buffer in self.buffers:
+            del buffer[:]
+        return
+
+    def close(self):
+        self.flush()
+        return
+
+    def _write(self, name, typecode, values, rows):
+        path = self._column_path(name)
+        if not os.path.exists(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            with open(path, 'wb') as f:
+                f.write(_header(typecode, 0))
+        # data first, so the header never counts rows that aren't there
+        with open(path, 'r+b') as f:
+            f.seek(HEADER_SIZE + (rows - len(values)) * values.itemsize)
+            f.write(values.tobytes())
+            f.seek(0)
+            f.write(_header(typecode, rows))
+        return
+
+    def _column_path(self, name):
+        return os.path.join(self.path, f'chunk-{self.chunk:06d}',
+                            f'{name}.npy')
+
+
+class DecisionRecorder():
+    """
+    Turns blackjack.emit() events into dataset rows. A round's rows are
+    held until its hands are settled, then handed to the writer.
+
+    args:
+        writer (class):     DecisionWriter() object
+        deck (class):       Deck() the table deals from, for the true
+                            count (otherwise taken from table_open)
+    """
+
+    def __init__(self, writer, deck=None):
+        self.writer = writer
+        self.deck = deck
+        self.rows = 0
+        self._pending = []
+        self._splits = {}
+        self._results = {}
+
+    def start(self):
+        bj.listeners.append(self.on_event)
+        return
+
+    def stop(self):
+        if self.on_event in bj.listeners:
+            bj.listeners.remove(self.on_event)
+        return
+
+    def on_event(self, event, **data):
+        if event == 'table_open':
+            self.deck = data['deck']
+
+        elif event == 'decision':
+            hand = data['hand']
+            values = hand.get_hand_value()
+            pair = len(hand.cards) == 2 and \
+                hand.cards[0].rank == hand.cards[1].rank
+            upcard = data['players'][-1].hands[0].cards[1].value
+            true_count = bj.shoe_state(self.deck, data['players'])[
+                'true_count']
+            self._pending.append((hand, (values[-1], len(values) == 2, pair,
+                                         upcard, true_count,
+                                         _CODES[data['action']])))
+
+        elif event == 'split':
+            self._splits[id(data['hand'])] = data['hands']
+
+        elif event == 'settle':
+            self._results[id(data['hand'])] = data['cents']
+
+        elif event == 'round_end':
+            for hand, row in self._pending:
+                self.writer.append(row + (self._result(hand),))
+            self.rows += len(self._pending)
+            self._pending = []
+            self._splits = {}
+            self._results = {}
+
+        return
+
+    def _result(self, hand):
+        """
+        Net result of a hand in cents, summing the hands it was split
+        into.
+        """
+        if id(hand) in self._results:
+            return self._results[id(hand)]
+        return sum(self._result(h) for h in self._splits.get(id(hand), ()))
+
+
+class Dataset():
+    """
+    Read only, memory-mapped view of a dataset (every chunk under a
+    directory, including export() parts).
+
+    args:
+        path (str):     dataset directory
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.chunks = _chunks(path)
+        self._maps = []
+
+    def __len__(self):
+        return sum(_rows(os.path.join(chunk, f'{COLUMNS[0][0]}.npy'))
+                   for chunk in self.chunks)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def column(self, name):
+        """
+        args:
+            name (str):     one of COLUMNS
+
+        yields:
+            (memoryview):   the column's values, a chunk at a time,
+                            straight from the mapped files
+        """
+        typecode = dict(COLUMNS)[name]
+        for chunk in self.chunks:
+            path = os.path.join(chunk, f'{name}.npy')
+            rows = _rows(path)
+            if not rows:
+                continue
+            with open(path, 'rb') as f:
+                mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            size = rows * array(typecode).itemsize
+            base = memoryview(mapped)
+            data = base[HEADER_SIZE:HEADER_SIZE + size]
+            view = data.cast(typecode)
+            # every view made here, so close() can release them
+            self._maps.append((mapped, [view, data, base]))
+            yield view
+
+        return
+
+    def rows(self):
+        """
+        yields:
+            (tuple):        every row, a value for each of COLUMNS
+        """
+        columns = [self.column(name) for name, _ in COLUMNS]
+        for views in zip(*columns):
+            yield from zip(*views)
+        return
+
+    def close(self):
+        """
+        Release the views handed out by column() & unmap the files. A
+        file still exported by a view made from one of them (a slice
+        the caller kept) stays mapped until that view is gone & close()
+        is called again.
+
+        returns:
+            (int):      files still mapped
+        """
+        kept = []
+        for mapped, views in self._maps:
+            for view in views:
+                view.release()
+            try:
+                mapped.close()
+            except BufferError:
+                kept.append((mapped, []))
+        self._maps = kept
+        return len(kept)
+
+
+def _export_chunk(args):
+    """
+    Worker for export(). Plays a range of shoes, logging every decision.
+
+    returns:
+        (int):      rows written
+    """
+    path, strategy, num_decks, seed, start, stop, bankroll, rules = args
+    deck = Deck(num_decks)
+    writer = DecisionWriter(path)
+    recorder = DecisionRecorder(writer, deck)
+    recorder.start()
+    try:
+        with bj.quiet():
+            for shoe in range(start, stop):
+                strategy.new_shoe(shoe_seed(seed, shoe))
+                sim.play_shoe(strategy, deck, shoe_seed(seed, shoe),
+                              bankroll, rules=rules)
+    finally:
+        recorder.stop()
+        writer.close()
+
+    return recorder.rows
+
+
+def export(strategy, path, start, stop, num_decks=6, seed=0,
+           processes=None, bankroll=1000, rules=bj.RULES):
+    """
+    Play a bot through shoes start to stop - 1, like play_shoes(), &
+    log every decision to a dataset. Each range of shoes is written to a
+    part of its own, so more shoes can be exported to the same dataset
+    later.
+
+    args:
+        strategy (class):   Strategy() object
+        path (str):         dataset directory
+        start (int):        index of the first shoe
+        stop (int):         index after the last shoe
+        num_decks (int):    number of decks in the shoe
+        seed (int):         base seed for the shoe sequence
+        processes (int):    worker processes (defaults to all cores)
+        bankroll (int):     balance the bot starts every round with
+        rules (class):      TableRules() the shoes are played under
+
+    returns:
+        (int):              rows written
+    """
+    tasks = []
+    for chunk in range(start, stop, sim.CHUNK_SHOES):
+        part = os.path.join(path, f'part-{chunk:09d}')
+        if os.path.exists(part):
+            raise FileExistsError(f'shoes from {chunk} are already in '
+                                  f'{path}')
+        tasks.append((part, strategy, num_decks, seed, chunk,
+                      min(chunk + sim.CHUNK_SHOES, stop), bankroll, rules))
+
+    processes = processes or os.cpu_count() or 1
+    if processes == 1:
+        return sum(map(_export_chunk, tasks))
+    with Pool(processes) as pool:
+        return sum(pool.imap_unordered(_export_chunk, tasks))
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description='Export or summarize a per-decision dataset')
+    parser.add_argument('path')
+    parser.add_argument('--shoes', type=int, default=0,
+                        help='shoes to export, 0 to summarize the dataset')
+    parser.add_argument('--start', type=int, default=0)
+    parser.add_argument('--decks', type=int, default=6)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--processes', type=int, default=None)
+    args = parser.parse_args()
+
+    if args.shoes:
+        rows = export(st.BasicStrategy(), args.path, args.start,
+                      args.start + args.shoes, args.decks, args.seed,
+                      args.processes)
+        print(f'{rows} decisions written to {args.path}')
+        return
+
+    totals = {}
+    with Dataset(args.path) as data:
+        for row in data.rows():
+            count, total = totals.get(row[5], (0, 0))
+            totals[row[5]] = (count + 1, total + row[6])
+    for code, (count, total) in sorted(totals.items()):
+        print(f'{DECISIONS[code]:<6} {count:>12} decisions, '
+              f'mean result ${total / count / 100:+.4f}')
+
+    return
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,492 @@
+#!/usr/bin/env python
+
+"""
+Distributed bot tournaments for blackjack.py over plain TCP
+
+A Coordinator hands out chunks of shoes (a bot & a range of shoe
+indexes) to any number of workers, on this host or others, that
+connect to it. Connections are authenticated with a shared key
+(multiprocessing.connection), so only run workers you trust.
+
+- Workers pull chunks, so fast workers simply take more of them.
+- A worker with nothing left to pull steals the back half of the
+  largest chunk still being played.
+- Busy workers send heartbeats. A worker that disconnects or misses
+  heartbeats has its chunk put back in the queue for somebody else.
+- Results are merged as integer sums of cents, so totals are exact
+  whatever order chunks finish in. A result for the wrong shoes is
+  reported & its chunk played again.
+
+Binding anywhere but loopback needs BLACKJACK_AUTHKEY set (the
+coordinator makes one up & prints it otherwise), since anybody holding
+the key can run code on the other end through pickles.
+
+Start a coordinator, then point workers at it:
+    python distributed.py coordinator --port 7777 --shoes 100000
+    python distributed.py worker coordinator-host:7777
+"""
+
+__author__ = "Kyle Long"
+__email__ = "long.kyle@gmail.com"
+__date__ = "08/26/2019"
+__copyright__ = "Copyright 2019, Kyle Long"
+__python_version__ = "3.7.4"
+
+
+import os
+import sys
+import time
+import secrets
+import argparse
+import ipaddress
+import threading
+import subprocess
+from collections import deque
+from multiprocessing.connection import Listener, Client
+
+import blackjack as bj
+from blackjack import Deck
+import strategy as st
+from corpus import shoe_seed
+from rules import PRESETS
+from simulation import CHUNK_SHOES, play_shoe, summarize, print_results
+
+# seconds between a busy worker's heartbeats
+HEARTBEAT = 1.0
+
+# seconds of silence before a busy worker is presumed dead
+TIMEOUT = 10.0
+
+# seconds an idle worker waits before asking for work again
+IDLE_WAIT = 0.05
+
+# shared key used when BLACKJACK_AUTHKEY isn't set, only on loopback
+AUTHKEY = b'blackjack'
+
+
+def authkey():
+    """
+    returns:
+        (bytes):    key from the BLACKJACK_AUTHKEY environment variable,
+                    or the default
+    """
+    key = os.environ.get('BLACKJACK_AUTHKEY')
+    return key.encode('utf-8') if key else AUTHKEY
+
+
+def is_loopback(host):
+    """
+    args:
+        host (str):     address to bind
+
+    returns:
+        (bool):         True if only this host can reach the address
+    """
+    if host == 'localhost':
+        return True
+    try:
+        return ipaddress.ip_address(host).is_loopback
+    except ValueError:
+        # a host name could resolve to anything
+        return False
+
+
+class Chunk():
+    """
+    Shoes start to stop - 1 for one bot, while a worker plays them.
+    """
+    __slots__ = ('index', 'start', 'stop', 'position', 'worker',
+                 'splitting')
+
+    def __init__(self, index, start, stop):
+        self.index = index
+        self.start = start
+        self.stop = stop
+        self.position = start
+        self.worker = None
+        self.splitting = False
+
+
+class Coordinator():
+    """
+    Hands out chunks of shoes to workers & merges their results.
+
+    args:
+        strategies (list):  Strategy() objects
+        shoes (int):        number of shoes each bot plays
+        num_decks (int):    number of decks in the shoe
+        seed (int):         base seed for the shoe sequence
+        bankroll (int):     balance each bot starts every round with
+        chunk_shoes (int):  shoes per chunk
+        host (str):         address to bind
+        port (int):         port to bind, 0 picks a free port
+        key (bytes):        shared authentication key
+        timeout (float):    seconds of silence before a busy worker is
+                            presumed dead
+        rules (class):      TableRules() object the shoes are played by
+    """
+
+    def __init__(self, strategies, shoes, num_decks=6, seed=0,
+                 bankroll=1000, chunk_shoes=CHUNK_SHOES, host='127.0.0.1',
+                 port=0, key=None, timeout=TIMEOUT, rules=bj.RULES):
+        self.strategies = strategies
+        self.shoes = shoes
+        self.num_decks = num_decks
+        self.seed = seed
+        self.bankroll = bankroll
+        self.timeout = timeout
+        self.rules = rules
+
+        key = key or authkey()
+        if key == AUTHKEY and not is_loopback(host):
+            raise ValueError(f'set BLACKJACK_AUTHKEY before binding to '
+                             f'{host}, the default key is public')
+
+        self.pending = deque(Chunk(index, start, min(start + chunk_shoes,
+                                                      shoes))
+                             for index in range(len(strategies))
+                             for start in range(0, shoes, chunk_shoes))
+        self.running = {}
+        self.next_id = 0
+        # rounds, sum & sum of squares of each bot, in integer cents
+        self.totals = [[0, 0, 0] for _ in strategies]
+        self.merged = [0 for _ in strategies]
+        self.stats = {'workers': 0, 'chunks': 0, 'splits': 0,
+                      'redispatched': 0, 'rejected': 0}
+
+        self.lock = threading.Lock()
+        self.done = threading.Event()
+        self.listener = Listener((host, port), authkey=key)
+        self.address = self.listener.address
+        self._send_locks = {}
+
+        if not self.pending:
+            self.done.set()
+
+    def serve(self):
+        """
+        Accept workers in a background thread.
+        """
+        threading.Thread(target=self._accept, daemon=True).start()
+        return
+
+    def wait(self, timeout=None):
+        """
+        Wait for every shoe to be merged, then stop accepting workers.
+        Connected workers are told to stop the next time they ask for
+        work.
+
+        returns:
+            totals (list):  [rounds, sum, sum of squares] of the results
+                            of each bot, like simulation.play_shoes()
+        """
+        if not self.done.wait(timeout):
+            raise TimeoutError('simulation did not finish in time')
+        self.listener.close()
+
+        return [[rounds, total / 100, total_sq / 10000]
+                for rounds, total, total_sq in self.totals]
+
+    def _accept(self):
+        while not self.done.is_set():
+            try:
+                conn = self.listener.accept()
+            except OSError:
+                # closed, or a client failed authentication
+                if self.done.is_set():
+                    return
+                continue
+            with self.lock:
+                self.stats['workers'] += 1
+                self._send_locks[conn] = threading.Lock()
+            threading.Thread(target=self._serve, args=(conn,),
+                             daemon=True).start()
+
+    def _send(self, conn, message):
+        with self._send_locks[conn]:
+            conn.send(message)
+        return
+
+    def _serve(self, conn):
+        """
+        Talk to one worker until it stops, disconnects or goes quiet.
+        """
+        try:
+            while True:
+                with self.lock:
+                    busy = any(c.worker is conn
+                               for c in self.running.values())
+                if busy and not conn.poll(self.timeout):
+                    break
+                message = conn.recv()
+                reply = self._handle(conn, message)
+                if reply is not None:
+                    self._send(conn, reply)
+                    if reply[0] == 'stop':
+                        break
+        except (EOFError, OSError):
+            pass
+        finally:
+            self._drop(conn)
+            conn.close()
+
+        return
+
+    def _handle(self, conn, message):
+        kind = message[0]
+        with self.lock:
+            if kind == 'ready':
+                return self._assign(conn)
+
+            chunk = self.running.get(message[1])
+            if chunk is None or chunk.worker is not conn:
+                # a chunk that was re-dispatched or already merged
+                return None
+
+            if kind == 'heartbeat':
+                chunk.position = message[2]
+
+            elif kind == 'split':
+                new_stop = message[2]
+                if new_stop < chunk.stop:
+                    self.pending.appendleft(Chunk(chunk.index, new_stop,
+                                                  chunk.stop))
+                    chunk.stop = new_stop
+                    self.stats['splits'] += 1
+                chunk.splitting = False
+
+            elif kind == 'result':
+                _, chunk_id, start, stop, rounds, total, total_sq = message
+                del self.running[chunk_id]
+                if (start, stop) != (chunk.start, chunk.stop):
+                    # never merge shoes nobody asked for, play them again
+                    print(f'chunk {chunk_id} returned shoes {start}-{stop}, '
+                          f'expected {chunk.start}-{chunk.stop}, '
+                          f'redispatching', file=sys.stderr)
+                    self.pending.appendleft(Chunk(chunk.index, chunk.start,
+                                                  chunk.stop))
+                    self.stats['rejected'] += 1
+                    return None
+                totals = self.totals[chunk.index]
+                totals[0] += rounds
+                totals[1] += total
+                totals[2] += total_sq
+                self.merged[chunk.index] += stop - start
+                self.stats['chunks'] += 1
+                if not self.pending and not self.running:
+                    self.done.set()
+
+        return None
+
+    def _assign(self, conn):
+        """
+        Next chunk for a worker, stealing half of the largest running
+        chunk when the queue is empty.
+        """
+        if self.done.is_set():
+            return ('stop',)
+
+        if not self.pending:
+            victims = [c for c in self.running.values()
+                       if not c.splitting and c.stop - c.position > 1]
+            if victims:
+                chunk_id, victim = max(
+                    ((i, c) for i, c in self.running.items()
+                     if c in victims),
+                    key=lambda item: item[1].stop - item[1].position)
+                victim.splitting = True
+                middle = victim.position + (victim.stop - victim.position) // 2
+                try:
+                    self._send(victim.worker, ('split', chunk_id, middle))
+                except OSError:
+                    # the victim's own thread will find it gone
+                    victim.splitting = False
+            return ('wait', IDLE_WAIT)
+
+        chunk = self.pending.popleft()
+        chunk.worker = conn
+        chunk.position = chunk.start
+        chunk_id = self.next_id
+        self.next_id += 1
+        self.running[chunk_id] = chunk
+
+        return ('chunk', chunk_id, self.strategies[chunk.index],
+                self.num_decks, self.seed, chunk.start, chunk.stop,
+                self.bankroll, self.rules.settings())
+
+    def _drop(self, conn):
+        """
+        Put any chunk a lost worker held back in the queue.
+        """
+        with self.lock:
+            for chunk_id, chunk in list(self.running.items()):
+                if chunk.worker is conn:
+                    del self.running[chunk_id]
+                    self.pending.appendleft(Chunk(chunk.index, chunk.start,
+                                                  chunk.stop))
+                    self.stats['redispatched'] += 1
+            self._send_locks.pop(conn, None)
+
+        return
+
+
+def work(address, key=None, heartbeat=HEARTBEAT):
+    """
+    Play chunks for a coordinator until it says to stop.
+
+    args:
+        address (tuple):    coordinator's (host, port)
+        key (bytes):        shared authentication key
+        heartbeat (float):  seconds between heartbeats while busy
+    """
+    conn = Client(tuple(address), authkey=key or authkey())
+    decks = {}
+    try:
+        while True:
+            conn.send(('ready',))
+            message = conn.recv()
+            # splits for a chunk already finished are stale
+            while message[0] == 'split':
+                message = conn.recv()
+
+            if message[0] == 'stop':
+                break
+            if message[0] == 'wait':
+                time.sleep(message[1])
+                continue
+
+            _, chunk_id, strategy, num_decks, seed, start, stop, \
+                bankroll, rules = message
+            rules = bj.TableRules(**rules)
+            deck = decks.setdefault(num_decks, Deck(num_decks))
+            rounds = total = total_sq = 0
+            shoe = start
+            last = time.monotonic()
+
+            with bj.quiet():
+                while shoe < stop:
+                    strategy.new_shoe(shoe_seed(seed, shoe))
+                    for result in play_shoe(strategy, deck,
+                                            shoe_seed(seed, shoe), bankroll,
+                                            rules=rules, cents=True):
+                        rounds += 1
+                        total += result
+                        total_sq += result * result
+                    shoe += 1
+
+                    while conn.poll():
+                        split = conn.recv()
+                        if split[0] == 'split' and split[1] == chunk_id:
+                            stop = max(split[2], shoe)
+                            conn.send(('split', chunk_id, stop))
+
+                    if time.monotonic() - last >= heartbeat:
+                        conn.send(('heartbeat', chunk_id, shoe))
+                        last = time.monotonic()
+
+            conn.send(('result', chunk_id, start, stop, rounds, total,
+                       total_sq))
+    except (EOFError, OSError):
+        # coordinator went away, or dropped us after giving our chunk
+        # to somebody else
+        pass
+    finally:
+        conn.close()
+
+    return
+
+
+def spawn_workers(address, count, key=None):
+    """
+    Start local worker subprocesses.
+
+    returns:
+        (list):     subprocess.Popen() objects
+    """
+    env = dict(os.environ)
+    env['BLACKJACK_AUTHKEY'] = (key or authkey()).decode('utf-8')
+    here = os.path.dirname(os.path.abspath(__file__))
+    host, port = address
+
+    return [subprocess.Popen([sys.executable,
+                              os.path.join(here, 'distributed.py'),
+                              'worker', f'{host}:{port}'],
+                             cwd=here, env=env)
+            for _ in range(count)]
+
+
+def run_distributed(strategies, shoes, num_decks=6, seed=0, workers=None,
+                    bankroll=1000, chunk_shoes=CHUNK_SHOES, host='127.0.0.1',
+                    port=0, key=None, rules=bj.RULES):
+    """
+    Run a tournament across worker processes: `workers` local
+    subprocesses (defaults to one per core) plus any remote workers
+    that connect to the port, every shoe played by `rules`.
+
+    returns:
+        (list):     summary of each bot, best mean result first
+    """
+    coordinator = Coordinator(strategies, shoes, num_decks, seed, bankroll,
+                              chunk_shoes, host, port, key, rules=rules)
+    coordinator.serve()
+    if workers is None:
+        workers = os.cpu_count() or 1
+    processes = spawn_workers(coordinator.address, workers, key)
+    try:
+        totals = coordinator.wait()
+    finally:
+        for process in processes:
+            try:
+                process.wait(timeout=TIMEOUT)
+            except subprocess.TimeoutExpired:
+                process.kill()
+
+    results = [summarize(strategy.name, *total)
+               for strategy, total in zip(strategies, totals)]
+
+    return sorted(results, key=lambda r: r['mean'], reverse=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description='Distributed blackjack bot tournament')
+    sub = parser.add_subparsers(dest='role', required=True)
+
+    coordinator = sub.add_parser('coordinator')
+    coordinator.add_argument('--host', default='127.0.0.1')
+    coordinator.add_argument('--port', type=int, default=7777)
+    coordinator.add_argument('--shoes', type=int, default=1000)
+    coordinator.add_argument('--decks', type=int, default=6)
+    coordinator.add_argument('--seed', type=int, default=0)
+    coordinator.add_argument('--workers', type=int, default=0,
+                             help='local worker processes to start')
+    coordinator.add_argument('--rules', default='default',
+                             choices=sorted(PRESETS))
+
+    worker = sub.add_parser('worker')
+    worker.add_argument('address', help='coordinator host:port')
+    args = parser.parse_args()
+
+    if args.role == 'worker':
+        host, port = args.address.rsplit(':', 1)
+        work((host, int(port)))
+        return
+
+    if authkey() == AUTHKEY and not is_loopback(args.host):
+        key = secrets.token_hex(16)
+        os.environ['BLACKJACK_AUTHKEY'] = key
+        print(f'Workers need: export BLACKJACK_AUTHKEY={key}')
+
+    bots = [st.BasicStrategy(), st.MimicDealerStrategy(),
+            st.Strategy(), st.RandomStrategy(seed=args.seed)]
+    print(f'Waiting for workers on {args.host}:{args.port}')
+    results = run_distributed(bots, args.shoes, args.decks, args.seed,
+                              args.workers, host=args.host, port=args.port,
+                              rules=PRESETS[args.rules])
+    print_results(results)
+
+    return
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,777 @@
+#!/usr/bin/env python
+
+"""
+Reinforcement learning environments for blackjack.py
+
+BlackjackEnv is a Gym style environment (reset() & step()) around the
+game engine itself: a heads up table where each episode is one round.
+Every rule of the table (splits, surrender, doubling after a split) is
+played by the engine, and the reward is the change in balance made by
+settle_up().
+
+VectorEnv steps many independent heads up tables per call. Its state
+lives in numpy arrays (a row per table) rather than Deck()/Hand()
+objects, and every step is a single compiled call over all the tables
+built on the kernel.py functions. It plays by the same rules as the
+engine, splits & surrender included; only insurance is never taken
+(like the bots). A VectorEnv of one table deals the same cards & pays
+the same rewards as a BlackjackEnv with the same seed.
+
+Both return observations as rows of ints, laid out as FIELDS plus, with
+composition=True, the count of each card value (Ace first) that hasn't
+been seen (the shoe & the dealer's hole card). Episodes go through up
+to three phases:
+
+- BET:      action is an index into wagers (skipped with one wager)
+- PLAY:     action is an index into ACTIONS
+- DONE:     the round was settled without a decision (a blackjack), any
+            action collects the reward
+"""
+
+__author__ = "Kyle Long"
+__email__ = "long.kyle@gmail.com"
+__date__ = "08/26/2019"
+__copyright__ = "Copyright 2019, Kyle Long"
+__python_version__ = "3.7.4"
+
+
+import queue
+import threading
+
+import blackjack as bj
+from blackjack import Deck, Dealer, Gambler
+import kernel
+import strategy as st
+from corpus import shoe_seed
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+# phases
+BET = 0
+PLAY = 1
+DONE = 2
+
+# actions, the first three in the order of the kernel's strategy codes
+ACTIONS = (st.STAY, st.HIT, st.DOUBLE_DOWN, st.SPLIT, st.SURRENDER)
+_STAY, _HIT, _DOUBLE_DOWN, _SPLIT, _SURRENDER = range(len(ACTIONS))
+
+# observation row, before the optional composition
+FIELDS = ('phase', 'total', 'soft', 'pair', 'first', 'upcard',
+          'running_count', 'cards_remaining')
+
+
+
+class _Closed(Exception):
+    """
+    Raised in the engine's thread to unwind a round when the
+    environment is closed.
+    """
+
+
+class _EnvBot(st.Strategy):
+    """
+    Hands every decision the engine asks for to the environment's
+    caller & waits for the answer.
+    """
+    name = 'Agent'
+
+    def __init__(self, env):
+        st.Strategy.__init__(self)
+        self.env = env
+
+    def wager(self, money, shoe):
+        if len(self.env.wagers) == 1:
+            return min(self.env.wagers[0], money)
+        return self.env.wagers[self.env._ask(BET, None, ())]
+
+    def action(self, hand, upcard, options, money, shoe):
+        return ACTIONS[self.env._ask(PLAY, hand, options)]
+
+
+class BlackjackEnv():
+    """
+    A heads up table played through the game engine, one round per
+    episode. The engine runs in a thread of its own that only runs while
+    reset() or step() waits on it.
+
+    args:
+        num_decks (int):        number of decks in the shoe
+        seed (int):             base seed for the shoe sequence
+        wagers (tuple):         wagers the agent can place
+        composition (bool):     add the unseen card counts to the
+                                observation
+        rules (class):          TableRules() the table plays by
+        bankroll (int):         balance restored before every round
+    """
+
+    def __init__(self, num_decks=6, seed=0, wagers=(10,), composition=False,
+                 rules=bj.RULES, bankroll=1000):
+        self.num_decks = num_decks
+        self.seed = seed
+        self.wagers = tuple(wagers)
+        self.composition = composition
+        self.rules = rules
+        self.bankroll = bankroll
+
+        self.deck = Deck(num_decks)
+        self.gambler = Gambler(_EnvBot.name, strategy=_EnvBot(self))
+        self.players = [self.gambler, Dealer()]
+        self.shoes = 0
+
+        self.options = ()
+        self.legal = ()
+        self._phase = DONE
+        self._result = None
+        self._to_table = queue.SimpleQueue()
+        self._from_table = queue.SimpleQueue()
+        self._thread = None
+
+    def reset(self):
+        """
+        Start a new round, first finishing one in progress by staying.
+
+        returns:
+            (tuple):    observation of the first decision
+        """
+        # stay (or the first wager) until the round is settled
+        while self._phase != DONE or self._result is not None:
+            self.step(0)
+
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._table, daemon=True)
+            self._thread.start()
+
+        return self._wait(('round',))
+
+    def step(self, action):
+        """
+        args:
+            action (int):   index into wagers or ACTIONS
+
+        returns:
+            observation (tuple):    next decision, or the settled round
+            reward (float):         net result of the round, when done
+            done (bool):            True once the round is settled
+            info (dict):            legal actions & the round's hands
+        """
+        if self._phase == DONE:
+            if self._result is None:
+                raise RuntimeError('round is over, call reset()')
+            reward, self._result = self._result, None
+            return self._observe(), reward, True, self._info()
+
+        if action not in self.legal:
+            raise ValueError(f'illegal action {action!r}, expected one of '
+                             f'{list(self.legal)}')
+
+        observation = self._wait(('action', action))
+        if self._phase == DONE:
+            reward, self._result = self._result, None
+            return observation, reward, True, self._info()
+
+        return observation, 0.0, False, self._info()
+
+    def close(self):
+        if self._thread is not None:
+            self._to_table.put(('close',))
+            self._thread.join()
+            self._thread = None
+        return
+
+    def _wait(self, message):
+        """
+        Hand control to the engine's thread until it needs a decision
+        or finishes the round. Output is silenced while it runs; this
+        thread is blocked the whole time, so none of its output is lost.
+        """
+        with bj.quiet():
+            self._to_table.put(message)
+            reply = self._from_table.get()
+
+        if reply[0] == 'error':
+            self._thread = None
+            self._phase = DONE
+            raise reply[1]
+        if reply[0] == 'done':
+            self._phase = DONE
+            self._result = reply[1]
+            self.legal = ()
+        else:
+            self._phase, self._hand, self.options = reply[1:]
+            if self._phase == BET:
+                self.legal = tuple(range(len(self.wagers)))
+            else:
+                self.legal = tuple(ACTIONS.index(o) for o in self.options)
+
+        return self._observe()
+
+    def _ask(self, phase, hand, options):
+        """
+        Called by _EnvBot in the engine's thread.
+        """
+        self._from_table.put(('ask', phase, hand, options))
+        message = self._to_table.get()
+        if message[0] == 'close':
+            raise _Closed()
+        return message[1]
+
+    def _table(self):
+        """
+        The engine's thread: plays a round each time it's asked to.
+        """
+        try:
+            while True:
+                message = self._to_table.get()
+                if message[0] == 'close':
+                    return
+
+                deck = self.deck
+                if len(deck.cards) < self.rules.reshuffle_at(self.num_decks):
+                    deck.cards = []
+                    deck.create()
+                    deck.shuffle(shoe_seed(self.seed, self.shoes))
+                    self.shoes += 1
+
+                self.gambler.money = self.bankroll
+                start = self.gambler.cents
+                self._hand = None
+                bj.play_round(self.players, deck, self.rules)
+                self._from_table.put(
+                    ('done', bj.dollars(self.gambler.cents - start)))
+        except _Closed:
+            return
+        except Exception as e:
+            self._from_table.put(('error', e))
+        return
+
+    def _observe(self):
+        hand = self._hand if self._phase == PLAY else None
+        dealer = self.players[-1].hands
+        total = soft = pair = first = upcard = 0
+        if hand is not None:
+            values = hand.get_hand_value()
+            total, soft = values[-1], int(len(values) == 2)
+            first = int(hand.first_iter)
+            if len(hand.cards) == 2 and \
+                    hand.cards[0].rank == hand.cards[1].rank:
+                pair = hand.cards[0].value
+            upcard = dealer[0].cards[1].value
+
+        shoe = bj.shoe_state(self.deck, self.players if dealer else None)
+        row = (self._phase, total, soft, pair, first, upcard,
+               shoe['running_count'], shoe['cards_remaining'])
+        if self.composition:
+            counts = [0] * 10
+            for card in self.deck.cards:
+                counts[card.value - 1] += 1
+            if dealer and dealer[0].cards[0].hidden:
+                counts[dealer[0].cards[0].value - 1] += 1
+            row += tuple(counts)
+
+        return row
+
+    def _info(self):
+        return {'legal': self.legal, 'options': self.options,
+                'hands': len(self.gambler.hands)}
+
+
+class VectorEnv():
+    """
+    Many independent heads up tables stepped together. Every table's
+    state lives in numpy arrays (a row per table) and each reset() or
+    step() is one compiled kernel call over all of them, so no Python
+    runs per table. Finished tables start their next round on the
+    following step, so every call steps every table.
+
+    Shoes are shuffled one shoe ahead, by kernel.seeded_shuffle(): a
+    table that reaches the reshuffle point swaps in its next shoe inside
+    the step & the shoe after it is shuffled once the step returns.
+
+    args:
+        num_envs (int):         number of tables
+        num_decks (int):        number of decks in each shoe
+        seed (int):             base seed, table i deals shoes
+                                shoe_seed(seed, n * num_envs + i)
+        wagers (tuple):         wagers the agent can place
+        composition (bool):     add the unseen card counts to the
+                                observations
+        penetration (float):    fraction of the shoe dealt before a
+                                reshuffle, or None for the rules' cut
+                                card. A round that runs the shoe dry
+                                raises IndexError, like the engine
+        bankroll (int):         balance every round starts with (for
+                                whether a double is allowed)
+        rules (class):          TableRules() the tables play by
+    """
+
+    def __init__(self, num_envs, num_decks=6, seed=0, wagers=(10,),
+                 composition=False, penetration=None, bankroll=1000,
+                 rules=bj.RULES):
+        if np is None:
+            raise ImportError('VectorEnv needs numpy')
+        if penetration is not None and not 0 < penetration < 1:
+            raise ValueError('penetration must be between 0 & 1')
+
+        self.num_envs = num_envs
+        self.num_decks = num_decks
+        self.seed = seed
+        self.wagers = tuple(wagers)
+        self.composition = composition
+        self.bankroll = bankroll
+        self.rules = rules
+        self.width = len(FIELDS) + (10 if composition else 0)
+
+        self.shoe_size = 52 * num_decks
+        if penetration is None:
+            self.reshuffle_at = rules.reshuffle_at(num_decks)
+        else:
+            self.reshuffle_at = self.shoe_size * (1 - penetration)
+
+        deck = Deck(num_decks)
+        deck.create()
+        self._template = kernel.card_codes(deck.cards).astype(np.int8)
+        self._wagers = np.array(self.wagers, dtype=np.int64)
+        self._rules = np.array(kernel.rules_array(rules), dtype=np.int64)
+        self._hi_lo = np.array([0] + [bj.HI_LO[v] for v in range(1, 11)],
+                               dtype=np.int64)
+
+        n = num_envs
+        self.tables = np.zeros((n, _TABLE_FIELDS), dtype=np.int64)
+        self.hands = np.zeros((n, kernel.MAX_HANDS, _HAND_FIELDS),
+                              dtype=np.int64)
+        self.shoes = np.zeros((n, self.shoe_size), dtype=np.int8)
+        self.counts = np.zeros((n, 10), dtype=np.int64)
+        self.tables[:, _PHASE] = DONE
+
+        # each table's next shoe, shuffled ahead of time
+        self._next = np.zeros((n, self.shoe_size), dtype=np.int8)
+        self._state = np.zeros(kernel.MT_STATE, dtype=np.int64)
+        self._shuffle(np.arange(n))
+
+        self.observations = np.zeros(n * self.width, dtype=np.int32)
+        self.rewards = np.zeros(n, dtype=np.float64)
+        self.dones = np.zeros(n, dtype=np.int64)
+
+    @property
+    def phase(self):
+        return self.tables[:, _PHASE]
+
+    @property
+    def cursor(self):
+        return self.tables[:, _CURSOR]
+
+    def reset(self):
+        """
+        Start a round at every table.
+
+        returns:
+            (array):    num_envs rows of observations, flattened
+        """
+        _reset_tables(self.tables, self.hands, self.shoes, self._next,
+                      self.counts, self._wagers, self.bankroll,
+                      self.reshuffle_at, self._rules, self._hi_lo,
+                      self.observations, self.width, self.composition)
+        self._refill()
+        return self.observations
+
+    def step(self, actions):
+        """
+        args:
+            actions (array):    an action per table (see the phases)
+
+        returns:
+            observations (array):   num_envs rows, flattened
+            rewards (array):        net result of rounds settled this step
+            dones (array):          1 for tables whose round was settled
+        """
+        actions = np.asarray(actions, dtype=np.int64)
+        if actions.shape != (self.num_envs,):
+            raise ValueError(f'expected {self.num_envs} actions, got '
+                             f'{actions.shape}')
+
+        bad = _step_tables(actions, self.tables, self.hands, self.shoes,
+                           self._next, self.counts, self._wagers,
+                           self.bankroll, self.reshuffle_at, self._rules,
+                           self._hi_lo, self.observations, self.rewards,
+                           self.dones, self.width, self.composition)
+        if bad >= 0:
+            kind = 'wager' if self.phase[bad] == BET else 'action'
+            raise ValueError(f'table {bad}: illegal {kind} '
+                             f'{actions[bad]!r}')
+        self._refill()
+
+        return self.observations, self.rewards, self.dones
+
+    def legal(self):
+        """
+        returns:
+            (array):    num_envs rows of len(ACTIONS) flags, 1 where the
+                        action is legal at the table's current hand (all
+                        0 outside the PLAY phase)
+        """
+        mask = np.zeros((self.num_envs, len(ACTIONS)), dtype=np.int8)
+        _legal_mask(self.tables, self.hands, self.bankroll, self._rules,
+                    mask)
+        return mask
+
+    def _refill(self):
+        """
+        Shuffle the next shoe of every table that took its last one.
+        """
+        taken = np.flatnonzero(self.tables[:, _TAKEN])
+        if len(taken):
+            self.tables[taken, _TAKEN] = 0
+            self._shuffle(taken)
+        return
+
+    def _shuffle(self, rows):
+        """
+        Shuffle the next shoe of the given tables, seeded like a Deck()
+        shuffled with the table's next shoe seed.
+        """
+        keys = [kernel.seed_words(shoe_seed(
+                    self.seed, int(self.tables[i, _SHOE]) * self.num_envs +
+                    int(i))) for i in rows]
+        lengths = np.array([len(key) for key in keys], dtype=np.int64)
+        words = np.zeros((len(rows), lengths.max()), dtype=np.int64)
+        for r, key in enumerate(keys):
+            words[r, :len(key)] = key
+        _shuffle_rows(self._template, self._next, rows, words, lengths,
+                      self._state)
+        return
+
+
+# columns of VectorEnv.tables
+_PHASE = 0
+_CURSOR = 1
+_SHOE = 2           # number of the shoe in the table's next shoe
+_TAKEN = 3          # the next shoe was taken & needs shuffling
+_RUNNING_COUNT = 4
+_UP = 5
+_HOLE = 6
+_HANDS = 7          # hands the gambler holds this round
+_CURRENT = 8        # hand being played
+_RESULT = 9         # net result of the round, in cents
+_TABLE_FIELDS = 10
+
+# fields of each hand in VectorEnv.hands
+_FIRST_CARD = 0     # card codes of the first two cards
+_SECOND_CARD = 1
+_TOTAL = 2
+_ACES = 3
+_WAGER = 4
+_BLACKJACK = 5
+_FINISHED = 6
+_SURRENDERED = 7
+_FIRST_ITER = 8     # no card has been drawn to it since its second
+_HAND_FIELDS = 9
+
+
+@kernel.njit(cache=True)
+def _shuffle_rows(template, shoes, rows, keys, lengths, state):
+    """
+    kernel.seeded_shuffle() of the template into each of the given rows,
+    seeded from that row's seed words.
+    """
+    for r in range(len(rows)):
+        shoe = shoes[rows[r]]
+        shoe[:] = template
+        kernel.mt_seed(keys[r], lengths[r], state)
+        kernel.seeded_shuffle(shoe, state)
+    return
+
+
+@kernel.njit(cache=True, inline='always')
+def _draw(i, tables, shoes, counts, hi_lo):
+    """
+    kernel.draw() from table i's shoe, counting the card.
+    """
+    cursor = tables[i, _CURSOR]
+    if cursor <= 0:
+        # never deal from the next table's shoe
+        raise IndexError('the shoe ran out mid round')
+    card = shoes[i, cursor - 1]
+    tables[i, _CURSOR] = cursor - 1
+    value = kernel.card_value(card)
+    tables[i, _RUNNING_COUNT] += hi_lo[value]
+    counts[i, value - 1] -= 1
+    return card
+
+
+@kernel.njit(cache=True, inline='always')
+def _set_hand(hands, i, k, first, second, wager):
+    """
+    A hand of two cards, flagged a blackjack on a 2 card 21.
+    """
+    total = kernel.card_value(first) + kernel.card_value(second)
+    aces = first == 1 or second == 1
+    hands[i, k, _FIRST_CARD] = first
+    hands[i, k, _SECOND_CARD] = second
+    hands[i, k, _TOTAL] = total
+    hands[i, k, _ACES] = aces
+    hands[i, k, _WAGER] = wager
+    hands[i, k, _BLACKJACK] = kernel.hand_total(total, aces)[0] == 21
+    hands[i, k, _FINISHED] = 0
+    hands[i, k, _SURRENDERED] = 0
+    hands[i, k, _FIRST_ITER] = 1
+    return
+
+
+@kernel.njit(cache=True, inline='always')
+def _legal(i, action, tables, hands, bankroll, rules):
+    """
+    Whether play_hands() would offer the action for table i's hand.
+    """
+    if action == _STAY or action == _HIT:
+        return True
+    k = tables[i, _CURRENT]
+    if not hands[i, k, _FIRST_ITER]:
+        return False
+    splits = tables[i, _HANDS] - 1
+    if action == _DOUBLE_DOWN:
+        return bankroll >= 2 * hands[i, k, _WAGER] and \
+            (splits == 0 or rules[kernel.DOUBLE_AFTER_SPLIT] != 0)
+    if action == _SPLIT:
+        return hands[i, k, _FIRST_CARD] == hands[i, k, _SECOND_CARD] and \
+            splits < rules[kernel.MAX_SPLITS] and \
+            (splits == 0 or hands[i, k, _FIRST_CARD] != 1 or
+             rules[kernel.RESPLIT_ACES] != 0)
+    if action == _SURRENDER:
+        return splits == 0 and rules[kernel.SURRENDER] != 0
+    return False
+
+
+@kernel.njit(cache=True)
+def _legal_mask(tables, hands, bankroll, rules, mask):
+    for i in range(tables.shape[0]):
+        if tables[i, _PHASE] == PLAY:
+            for action in range(mask.shape[1]):
+                mask[i, action] = _legal(i, action, tables, hands, bankroll,
+                                         rules)
+    return
+
+
+@kernel.njit(cache=True, inline='always')
+def _settle_round(i, tables, hands, shoes, counts, rules, hi_lo):
+    """
+    Reveal the hole card, play out the dealer & pay every hand, like
+    determine_winners() & settle_up().
+    """
+    up = tables[i, _UP]
+    hole = tables[i, _HOLE]
+    dealer_blackjack = kernel.hand_total(up + hole,
+                                         up == 1 or hole == 1)[0] == 21
+    total = hole + up
+    aces = hole == 1 or up == 1
+    while True:
+        dealer, soft = kernel.hand_total(total, aces)
+        if kernel.dealer_stands(dealer, soft, rules[kernel.STAND_SOFT]):
+            break
+        card = kernel.card_value(_draw(i, tables, shoes, counts, hi_lo))
+        total += card
+        aces = aces or card == 1
+
+    result = 0
+    for k in range(tables[i, _HANDS]):
+        best = kernel.hand_total(hands[i, k, _TOTAL], hands[i, k, _ACES])[0]
+        result += kernel.settle(hands[i, k, _WAGER], best, hands[i, k, _BLACKJACK] != 0,
+                                hands[i, k, _SURRENDERED] != 0, dealer,
+                                dealer_blackjack, False, rules)
+    tables[i, _RESULT] = result
+    tables[i, _PHASE] = DONE
+    return
+
+
+@kernel.njit(cache=True, inline='always')
+def _next_hand(i, tables, hands, shoes, counts, rules, hi_lo):
+    """
+    Move to the first hand still to be played, from the current one, or
+    settle the round if there's none.
+    """
+    k = tables[i, _CURRENT]
+    while k < tables[i, _HANDS] and \
+            (hands[i, k, _BLACKJACK] or hands[i, k, _FINISHED]):
+        k += 1
+    tables[i, _CURRENT] = k
+    if k == tables[i, _HANDS]:
+        _settle_round(i, tables, hands, shoes, counts, rules, hi_lo)
+    else:
+        tables[i, _PHASE] = PLAY
+    return
+
+
+@kernel.njit(cache=True, inline='always')
+def _deal(i, wager, tables, hands, shoes, counts, rules, hi_lo):
+    """
+    Deal a round like deal() & check_dealer_for_blackjack(): a blackjack
+    on either side settles it at once.
+    """
+    p1 = _draw(i, tables, shoes, counts, hi_lo)
+    p2 = _draw(i, tables, shoes, counts, hi_lo)
+    hole = kernel.card_value(_draw(i, tables, shoes, counts, hi_lo))
+    up = kernel.card_value(_draw(i, tables, shoes, counts, hi_lo))
+    tables[i, _HOLE] = hole
+    tables[i, _UP] = up
+    tables[i, _HANDS] = 1
+    tables[i, _CURRENT] = 0
+    _set_hand(hands, i, 0, p1, p2, wager)
+
+    dealer = kernel.hand_total(hole + up, hole == 1 or up == 1)[0]
+    if hands[i, 0, _BLACKJACK] or dealer == 21:
+        _settle_round(i, tables, hands, shoes, counts, rules, hi_lo)
+    else:
+        tables[i, _PHASE] = PLAY
+    return
+
+
+@kernel.njit(cache=True, inline='always')
+def _new_round(i, tables, hands, shoes, next_shoes, counts, wagers,
+               bankroll, reshuffle_at, rules, hi_lo):
+    if tables[i, _CURSOR] < reshuffle_at:
+        shoes[i, :] = next_shoes[i]
+        tables[i, _CURSOR] = shoes.shape[1]
+        tables[i, _SHOE] += 1
+        tables[i, _TAKEN] = 1
+        tables[i, _RUNNING_COUNT] = 0
+        for value in range(1, 11):
+            counts[i, value - 1] = 4 * (shoes.shape[1] // 52)
+        counts[i, 9] *= 4
+    if len(wagers) == 1:
+        _deal(i, min(wagers[0], bankroll), tables, hands, shoes, counts,
+              rules, hi_lo)
+    else:
+        tables[i, _PHASE] = BET
+    return
+
+
+@kernel.njit(cache=True, inline='always')
+def _act(i, action, tables, hands, shoes, counts, rules, hi_lo):
+    """
+    Play an action on table i's current hand, like play_hands().
+    """
+    k = tables[i, _CURRENT]
+    if action == _STAY:
+        hands[i, k, _FINISHED] = 1
+    elif action == _SURRENDER:
+        hands[i, k, _SURRENDERED] = 1
+        hands[i, k, _FINISHED] = 1
+    elif action == _SPLIT:
+        # the second hand goes right after this one
+        count = tables[i, _HANDS]
+        for h in range(count, k + 1, -1):
+            for field in range(_HAND_FIELDS):
+                hands[i, h, field] = hands[i, h - 1, field]
+        tables[i, _HANDS] = count + 1
+        pair = hands[i, k, _FIRST_CARD]
+        wager = hands[i, k, _WAGER]
+        for h in range(k, k + 2):
+            card = _draw(i, tables, shoes, counts, hi_lo)
+            _set_hand(hands, i, h, pair, card, wager)
+            # split Aces may only get the one card
+            if pair == 1 and not rules[kernel.HIT_SPLIT_ACES]:
+                hands[i, h, _FINISHED] = 1
+    else:
+        card = kernel.card_value(_draw(i, tables, shoes, counts, hi_lo))
+        hands[i, k, _TOTAL] += card
+        if card == 1:
+            hands[i, k, _ACES] = 1
+        hands[i, k, _FIRST_ITER] = 0
+        if action == _DOUBLE_DOWN:
+            hands[i, k, _WAGER] *= 2
+            hands[i, k, _FINISHED] = 1
+        elif kernel.hand_total(hands[i, k, _TOTAL], hands[i, k, _ACES])[0] > 21:
+            hands[i, k, _FINISHED] = 1
+        else:
+            return
+    _next_hand(i, tables, hands, shoes, counts, rules, hi_lo)
+    return
+
+
+@kernel.njit(cache=True, inline='always')
+def _observe(i, tables, hands, counts, hi_lo, observations, width,
+             composition):
+    row = i * width
+    phase = tables[i, _PHASE]
+    observations[row] = phase
+    observations[row + 6] = tables[i, _RUNNING_COUNT]
+    observations[row + 7] = tables[i, _CURSOR]
+    for field in range(1, 6):
+        observations[row + field] = 0
+    hole = tables[i, _HOLE]
+    if phase == PLAY:
+        k = tables[i, _CURRENT]
+        best, soft = kernel.hand_total(hands[i, k, _TOTAL], hands[i, k, _ACES])
+        observations[row + 1] = best
+        observations[row + 2] = soft
+        if hands[i, k, _FIRST_ITER] != 0 and \
+                hands[i, k, _FIRST_CARD] == hands[i, k, _SECOND_CARD]:
+            observations[row + 3] = kernel.card_value(hands[i, k, _FIRST_CARD])
+        observations[row + 4] = hands[i, k, _FIRST_ITER]
+        observations[row + 5] = tables[i, _UP]
+        # the hole card isn't seen until the round is settled
+        observations[row + 6] -= hi_lo[hole]
+    if composition:
+        for value in range(10):
+            observations[row + 8 + value] = counts[i, value]
+        if phase == PLAY:
+            observations[row + 8 + hole - 1] += 1
+    return
+
+
+@kernel.njit(cache=True)
+def _reset_tables(tables, hands, shoes, next_shoes, counts, wagers,
+                  bankroll, reshuffle_at, rules, hi_lo, observations, width,
+                  composition):
+    for i in range(tables.shape[0]):
+        _new_round(i, tables, hands, shoes, next_shoes, counts, wagers,
+                   bankroll, reshuffle_at, rules, hi_lo)
+        _observe(i, tables, hands, counts, hi_lo, observations, width,
+                 composition)
+    return
+
+
+@kernel.njit(cache=True)
+def _step_tables(actions, tables, hands, shoes, next_shoes, counts, wagers,
+                 bankroll, reshuffle_at, rules, hi_lo, observations,
+                 rewards, dones, width, composition):
+    """
+    Step every table. Actions are all checked before any table moves.
+
+    returns:
+        (int):      the first table with an illegal action, or -1
+    """
+    n = tables.shape[0]
+    for i in range(n):
+        phase = tables[i, _PHASE]
+        action = actions[i]
+        if phase == BET:
+            if action < 0 or action >= len(wagers):
+                return i
+        elif phase == PLAY:
+            if not _legal(i, action, tables, hands, bankroll, rules):
+                return i
+
+    for i in range(n):
+        phase = tables[i, _PHASE]
+        if phase == BET:
+            _deal(i, wagers[actions[i]], tables, hands, shoes, counts,
+                  rules, hi_lo)
+        elif phase == PLAY:
+            _act(i, actions[i], tables, hands, shoes, counts, rules, hi_lo)
+
+        # a round settled by the deal is collected on the same step
+        if phase != DONE and tables[i, _PHASE] != DONE:
+            rewards[i] = 0.0
+            dones[i] = 0
+        else:
+            rewards[i] = tables[i, _RESULT] / 100
+            dones[i] = 1
+            _new_round(i, tables, hands, shoes, next_shoes, counts, wagers,
+                       bankroll, reshuffle_at, rules, hi_lo)
+        _observe(i, tables, hands, counts, hi_lo, observations, width,
+                 composition)
+
+    return -1
@@ -0,0 +1,358 @@
+#!/usr/bin/env python
+
+"""
+Invariant fuzzer for the blackjack.py round engine
+
+Plays randomized rounds through deal, play_hands,
+check_dealer_for_blackjack, determine_winners & settle_up with bots
+choosing random legal actions (favouring splits, with pair heavy shoes
+mixed in for deep resplits). After every round it checks that:
+
+- no cards were created or lost: cards dealt + cards left in the shoe
+  equals the shoe before the round
+- money is conserved: each gambler's balance moved by exactly what
+  their hands paid under the table's rules, & the house (as reported
+  by the settle events) moved by the opposite amount
+- every hand ends up with a final_value
+
+Every round is rebuilt from its seed alone, so a failure is shrunk to
+its seed plus the shortest action trace that still fails.
+"""
+
+__author__ = "Kyle Long"
+__email__ = "long.kyle@gmail.com"
+__date__ = "08/26/2019"
+__copyright__ = "Copyright 2019, Kyle Long"
+__python_version__ = "3.7.4"
+
+
+import os
+import random
+import argparse
+from multiprocessing import Pool
+
+import blackjack as bj
+from blackjack import Deck, Dealer, Gambler
+import strategy as st
+from rules import PRESETS
+
+# rounds handed to a worker process at a time
+CHUNK_ROUNDS = 10000
+
+# ranks a pair heavy shoe is built from
+PAIR_RANKS = ('Ace', 'Eight')
+
+
+class FuzzStrategy(st.Strategy):
+    """
+    Random legal decisions, splitting whenever it gets the chance half
+    the time. Every decision is recorded in .trace.
+
+    args:
+        rng (class):    random.Random() object
+    """
+    name = 'Fuzz'
+
+    def __init__(self, rng):
+        st.Strategy.__init__(self)
+        self.rng = rng
+        self.trace = []
+
+    def wager(self, money, shoe):
+        wager = self.rng.randint(1, min(100, money))
+        self.trace.append(wager)
+        return wager
+
+    def insurance(self, hand, money):
+        insurance = self.rng.random() < 0.5
+        self.trace.append(insurance)
+        return insurance
+
+    def action(self, hand, upcard, options, money, shoe):
+        if st.SPLIT in options and self.rng.random() < 0.5:
+            action = st.SPLIT
+        else:
+            action = self.rng.choice(options)
+        self.trace.append(action)
+        return action
+
+
+class ReplayStrategy(st.Strategy):
+    """
+    Replays a recorded trace. Once the trace runs out it plays the
+    simplest decisions: wager 1, no insurance, stay.
+
+    args:
+        trace (list):   decisions recorded by FuzzStrategy
+    """
+    name = 'Replay'
+
+    def __init__(self, trace):
+        st.Strategy.__init__(self)
+        self.trace = list(trace)
+
+    def _next(self, default):
+        return self.trace.pop(0) if self.trace else default
+
+    def wager(self, money, shoe):
+        return self._next(1)
+
+    def insurance(self, hand, money):
+        return self._next(False)
+
+    def action(self, hand, upcard, options, money, shoe):
+        action = self._next(st.STAY)
+        return action if action in options else st.STAY
+
+
+def build_round(seed, num_gamblers=None):
+    """
+    Rebuild a round's table & shoe from its seed.
+
+    args:
+        seed (int):         seed of the round
+        num_gamblers (int): overrides the seeded number of gamblers
+
+    returns:
+        rng (class):        random.Random() for the round's decisions
+        gamblers (int):     number of gamblers
+        deck (class):       Deck() object, cut to a random depth
+    """
+    rng = random.Random(seed)
+    num_decks = rng.randint(bj.MIN_DECKS, bj.MAX_DECKS)
+    gamblers = rng.randint(bj.MIN_PLAYERS, bj.MAX_PLAYERS)
+    if num_gamblers is not None:
+        gamblers = num_gamblers
+
+    pair_heavy = rng.random() < 0.2
+    if pair_heavy:
+        # an 8 deck shoe so endless resplits don't empty the shoe
+        num_decks = bj.MAX_DECKS
+
+    deck = Deck(num_decks)
+    deck.create()
+    if pair_heavy:
+        ids = [i for i, info in enumerate(bj.CARD_INFO)
+               if info[1] in PAIR_RANKS]
+        deck.load([ids[i % len(ids)] for i in range(len(deck.cards))])
+    deck.shuffle(rng.getrandbits(64))
+
+    # play from anywhere up to the reshuffle point
+    cut = rng.randint(0, len(deck.cards) // 2)
+    deck.cards = deck.cards[:len(deck.cards) - cut]
+
+    return rng, gamblers, deck
+
+
+def expected_result(hand, dealer_hand, rules=bj.RULES):
+    """
+    What a hand should pay, worked out from its cards rather than the
+    win/push flags determine_winners() sets.
+
+    args:
+        hand (class):           Hand() object
+        dealer_hand (class):    dealer's Hand() object
+        rules (class):          TableRules() the round was played under
+
+    returns:
+        (int):                  net result of the hand in cents
+    """
+    wager = hand.wager
+    result = 0
+    if hand.insurance:
+        insurance = wager * rules.insurance_cents
+        result += insurance if dealer_hand.blackjack else -insurance
+
+    player = hand.get_hand_value(include_hidden=True)[-1]
+    dealer = dealer_hand.get_hand_value(include_hidden=True)[-1]
+    if hand.blackjack:
+        result += wager * rules.blackjack_cents
+    elif hand.surrender:
+        result -= wager * 50
+    elif player > 21 or dealer_hand.blackjack:
+        result -= wager * 100
+    elif dealer > 21 or player > dealer:
+        result += wager * 100
+    elif player < dealer:
+        result -= wager * 100
+
+    return result
+
+
+def check_round(seed, traces=None, num_gamblers=None, rules=bj.RULES):
+    """
+    Play one round & check every invariant.
+
+    args:
+        seed (int):         seed of the round
+        traces (list):      optional decision trace per gambler to
+                            replay instead of random decisions
+        num_gamblers (int): overrides the seeded number of gamblers
+        rules (class):      TableRules() the round is played under
+
+    returns:
+        error (str):        broken invariant, None if the round is fine
+        traces (list):      decision trace of each gambler
+    """
+    rng, num_gamblers, deck = build_round(seed, num_gamblers)
+
+    players = []
+    for i in range(num_gamblers):
+        if traces is None:
+            bot = FuzzStrategy(random.Random(rng.getrandbits(64)))
+        else:
+            bot = ReplayStrategy(traces[i] if i < len(traces) else [])
+        gambler = Gambler(f'Player {i+1}', strategy=bot)
+        gambler.cents = 50000
+        players.append(gambler)
+    players.append(Dealer())
+
+    shoe_size = len(deck.cards)
+    start = 50000
+    # the house side comes from the settle events, independently of the
+    # gamblers' balances
+    house = []
+    error = None
+
+    def on_event(event, **data):
+        if event == 'settle':
+            house.append(-data['cents'])
+
+    bj.listeners.append(on_event)
+    try:
+        with bj.quiet():
+            bj.deal(players, deck)
+            bj.print_cards(players)
+            if not bj.check_dealer_for_blackjack(players, rules):
+                bj.play_hands(players, deck, rules)
+            bj.determine_winners(players, deck, rules)
+
+            dealt = sum(len(h.cards) for p in players for h in p.hands)
+            unfinished = [p.name for p in players for h in p.hands
+                          if h.final_value is None]
+            dealer_hand = players[-1].hands[0]
+            expected = [sum(expected_result(h, dealer_hand, rules)
+                            for h in p.hands) for p in players[:-1]]
+
+            bj.settle_up(players, rules)
+
+        if dealt + len(deck.cards) != shoe_size:
+            error = f'{dealt} cards dealt + {len(deck.cards)} in the ' \
+                    f'shoe != {shoe_size} before the round'
+        elif unfinished:
+            error = f'hands without a final_value: {unfinished}'
+        else:
+            for gambler, result in zip(players[:-1], expected):
+                change = gambler.cents - start
+                if change != result:
+                    error = f'{gambler.name} balance moved by ' \
+                            f'{bj.dollars(change)}, hands paid ' \
+                            f'{bj.dollars(result)}'
+                    break
+            if error is None and sum(house) != -sum(expected):
+                error = f'house moved by {bj.dollars(sum(house))}, ' \
+                        f'gamblers by {bj.dollars(sum(expected))}'
+
+    except Exception as e:
+        error = f'{type(e).__name__}: {e}'
+    finally:
+        bj.listeners.remove(on_event)
+
+    if traces is None:
+        traces = [p.strategy.trace for p in players[:-1]]
+
+    return error, traces
+
+
+def shrink(seed, traces, rules=bj.RULES):
+    """
+    Shrink a failing round to the fewest gamblers & shortest decision
+    traces that still break an invariant.
+
+    args:
+        seed (int):     seed of the failing round
+        traces (list):  decision trace of each gambler
+        rules (class):  TableRules() the round is played under
+
+    returns:
+        (dict):         seed, num_gamblers, traces & error
+    """
+    for num_gamblers in range(1, len(traces) + 1):
+        for length in range(max(len(t) for t in traces) + 1):
+            short = [t[:length] for t in traces[:num_gamblers]]
+            error, _ = check_round(seed, short, num_gamblers, rules)
+            if error:
+                return {'seed': seed, 'num_gamblers': num_gamblers,
+                        'traces': short, 'error': error}
+
+    error, _ = check_round(seed, traces, len(traces), rules)
+    return {'seed': seed, 'num_gamblers': len(traces),
+            'traces': traces, 'error': error}
+
+
+def _fuzz_chunk(args):
+    """
+    Worker for fuzz(). Checks a range of seeds.
+
+    returns:
+        (list):     shrunk failures, at most one per chunk
+    """
+    start, stop, rules = args
+    for seed in range(start, stop):
+        error, traces = check_round(seed, rules=rules)
+        if error:
+            return [shrink(seed, traces, rules)]
+
+    return []
+
+
+def fuzz(rounds, seed=0, processes=None, rules=bj.RULES):
+    """
+    Fuzz the round engine across all cores.
+
+    args:
+        rounds (int):       number of rounds
+        seed (int):         first round seed
+        processes (int):    worker processes (defaults to all cores)
+        rules (class):      TableRules() the rounds are played under
+
+    returns:
+        (list):             shrunk failures (empty if every round passed)
+    """
+    tasks = [(start, min(start + CHUNK_ROUNDS, seed + rounds), rules)
+             for start in range(seed, seed + rounds, CHUNK_ROUNDS)]
+
+    processes = processes or os.cpu_count() or 1
+    if processes == 1:
+        chunks = map(_fuzz_chunk, tasks)
+        return [f for chunk in chunks for f in chunk]
+
+    with Pool(processes) as pool:
+        chunks = pool.imap_unordered(_fuzz_chunk, tasks)
+        return sorted((f for chunk in chunks for f in chunk),
+                      key=lambda f: f['seed'])
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Fuzz the round engine')
+    parser.add_argument('--rounds', type=int, default=1000000)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--processes', type=int, default=None)
+    parser.add_argument('--rules', default='default',
+                        choices=sorted(PRESETS))
+    args = parser.parse_args()
+
+    failures = fuzz(args.rounds, args.seed, args.processes,
+                    PRESETS[args.rules])
+    for f in failures:
+        print(f'seed {f["seed"]} ({f["num_gamblers"]} gamblers): '
+              f'{f["error"]}')
+        print(f'    traces: {f["traces"]}')
+    if not failures:
+        print(f'{args.rounds} rounds passed')
+
+    return
+
+
+if __name__ == "__main__":
+    main()
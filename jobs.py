@@ -0,0 +1,493 @@
+#!/usr/bin/env python
+
+"""
+Simulation job queue for blackjack.py
+
+Jobs are submitted to a queue kept on disk and run through a worker
+pool, which reports progress as chunks finish & can be cancelled
+between chunks. There are two kinds of job:
+
+- simulate:     a bot plays a number of shoes under a set of rules,
+                like simulation.run_tournament()
+- solve:        the best action & EV of every two card hand against
+                every upcard (service.action_values())
+
+Results go in a cache keyed by a hash of the job's configuration. A
+simulation's shoe count is left out of its key & the running totals
+are kept at every chunk boundary, so resubmitting a configuration
+returns at once, a shorter run is read off the checkpoints, and a
+longer one picks up from the last checkpoint instead of starting over.
+
+Layout:
+    <root>/jobs/<id>.json       the job, its status & progress
+    <root>/jobs/<id>.cancel     asks the runner to cancel a running job
+    <root>/cache/<key>.json     checkpoints or the solved table
+"""
+
+__author__ = "Kyle Long"
+__email__ = "long.kyle@gmail.com"
+__date__ = "08/26/2019"
+__copyright__ = "Copyright 2019, Kyle Long"
+__python_version__ = "3.7.4"
+
+
+import os
+import json
+import hashlib
+import argparse
+from multiprocessing import Pool
+
+import blackjack as bj
+import simulation as sim
+import strategy as st
+import service
+from rules import PRESETS, TableRules
+
+# job statuses
+QUEUED = 'queued'
+RUNNING = 'running'
+DONE = 'done'
+CANCELLED = 'cancelled'
+FAILED = 'failed'
+
+# bots a job can name, with the keyword arguments they take
+BOTS = {
+    'flat': st.Strategy,
+    'basic': st.BasicStrategy,
+    'mimic': st.MimicDealerStrategy,
+    'random': st.RandomStrategy,
+    'counting': st.CountingStrategy,
+}
+
+
+def make_strategy(spec):
+    """
+    args:
+        spec (dict):    bot name & keyword arguments, i.e.
+                        {'name': 'counting', 'ramp': [10, 20, 40]}
+
+    returns:
+        (class):        a new Strategy() object
+    """
+    kwargs = dict(spec)
+    name = kwargs.pop('name')
+    if name not in BOTS:
+        raise ValueError(f'unknown bot {name!r}, expected one of '
+                         f'{sorted(BOTS)}')
+    return BOTS[name](**kwargs)
+
+
+def normalize(config):
+    """
+    Fill in defaults so equivalent configurations hash the same.
+
+    args:
+        config (dict):  kind ('simulate' or 'solve'), num_decks,
+                        rules (TableRules() arguments or object), and
+                        for a simulation: strategy (name or spec),
+                        shoes, seed & bankroll
+
+    returns:
+        (dict):         the full configuration
+    """
+    kind = config.get('kind', 'simulate')
+    num_decks = int(config.get('num_decks', 6))
+    if not bj.MIN_DECKS <= num_decks <= bj.MAX_DECKS:
+        raise ValueError(f'num_decks must be between {bj.MIN_DECKS} & '
+                         f'{bj.MAX_DECKS}')
+    rules = config.get('rules') or {}
+    if not isinstance(rules, TableRules):
+        rules = TableRules(**rules)
+    if kind == 'solve':
+        return {'kind': kind, 'num_decks': num_decks,
+                'rules': rules.settings()}
+    if kind != 'simulate':
+        raise ValueError(f'unknown job kind {kind!r}')
+
+    seed = int(config.get('seed', 0))
+    spec = config.get('strategy', 'basic')
+    if isinstance(spec, str):
+        spec = {'name': spec}
+    if spec.get('name') == 'random' and spec.get('seed') is None:
+        # an unseeded random bot can't be replayed, so cached results
+        # couldn't be extended. Seed it from the job instead
+        spec = dict(spec, seed=seed)
+    # fails early on a bad bot rather than in the pool
+    make_strategy(spec)
+
+    shoes = int(config['shoes'])
+    if shoes < 1:
+        raise ValueError('shoes must be at least 1')
+    bankroll = int(config.get('bankroll', 1000))
+    if bankroll < 1:
+        raise ValueError('bankroll must be at least 1')
+
+    return {'kind': kind,
+            'strategy': json.loads(json.dumps(spec)),
+            'shoes': shoes,
+            'num_decks': num_decks,
+            'seed': seed,
+            'bankroll': bankroll,
+            'rules': rules.settings()}
+
+
+def cache_key(config):
+    """
+    args:
+        config (dict):  normalize()d configuration
+
+    returns:
+        (str):          hash of everything but the shoe count
+    """
+    config = {k: v for k, v in config.items() if k != 'shoes'}
+    text = json.dumps(config, sort_keys=True, separators=(',', ':'))
+    return hashlib.sha256(text.encode('utf-8')).hexdigest()
+
+
+def _solve_upcard(args):
+    """
+    Worker for solve jobs. Solves every two card hand against one
+    upcard.
+
+    returns:
+        (tuple):    upcard, {'a,b': {'action': ..., 'ev': {...}}}
+    """
+    upcard, num_decks, rules = args
+    table = {}
+    for a in range(1, 11):
+        for b in range(a, 11):
+            values = service.action_values([a, b], upcard,
+                                           num_decks=num_decks, rules=rules)
+            table[f'{a},{b}'] = {'action': max(values, key=values.get),
+                                 'ev': values}
+    return upcard, table
+
+
+class JobQueue():
+    """
+    A job queue & result cache in a directory.
+
+    args:
+        root (str):         directory the queue & cache live in
+        chunk_shoes (int):  shoes per chunk, & so between checkpoints,
+                            for new cache entries
+    """
+
+    def __init__(self, root, chunk_shoes=sim.CHUNK_SHOES):
+        self.root = root
+        self.chunk_shoes = chunk_shoes
+        self.jobs_dir = os.path.join(root, 'jobs')
+        self.cache_dir = os.path.join(root, 'cache')
+        os.makedirs(self.jobs_dir, exist_ok=True)
+        os.makedirs(self.cache_dir, exist_ok=True)
+
+    def submit(self, config):
+        """
+        Queue a job, or finish it on the spot if the cache already
+        has its result.
+
+        args:
+            config (dict):  see normalize()
+
+        returns:
+            (str):          job id
+        """
+        config = normalize(config)
+        job = {'config': config, 'key': cache_key(config),
+               'status': QUEUED, 'done': 0, 'total': self._size(config),
+               'result': None, 'error': None}
+
+        # claim the next id, even with several processes submitting
+        number = len([name for name in os.listdir(self.jobs_dir)
+                      if name.endswith('.json')])
+        while True:
+            job['id'] = f'{number:06d}'
+            try:
+                fd = os.open(self._job_path(job['id']),
+                             os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+                break
+            except FileExistsError:
+                number += 1
+        os.close(fd)
+
+        result = self.cached(config)
+        if result is not None:
+            job.update(status=DONE, done=job['total'], result=result)
+        self._write(self._job_path(job['id']), job)
+
+        return job['id']
+
+    def status(self, job_id):
+        """
+        returns:
+            (dict):     the job: id, config, status, done & total
+                        (chunks of work) and its result or error
+        """
+        with open(self._job_path(job_id)) as f:
+            return json.load(f)
+
+    def jobs(self):
+        """
+        returns:
+            (list):     every job, oldest first
+        """
+        jobs = []
+        for name in sorted(os.listdir(self.jobs_dir)):
+            if not name.endswith('.json'):
+                continue
+            try:
+                jobs.append(self.status(name[:-5]))
+            except ValueError:
+                # claimed by submit() but not written yet
+                pass
+        return jobs
+
+    def cancel(self, job_id):
+        """
+        Cancel a queued job at once, or a running job once its current
+        chunk finishes. Chunks already finished stay in the cache.
+        """
+        job = self.status(job_id)
+        if job['status'] == QUEUED:
+            job['status'] = CANCELLED
+            self._write(self._job_path(job_id), job)
+        elif job['status'] == RUNNING:
+            open(self._cancel_path(job_id), 'w').close()
+        return
+
+    def cached(self, config):
+        """
+        args:
+            config (dict):  normalize()d configuration
+
+        returns:
+            (dict):         the result, or None if it would take any
+                            playing to produce
+        """
+        entry = self._entry(cache_key(config))
+        if entry is None:
+            return None
+        if config['kind'] == 'solve':
+            return entry['result']
+
+        shoes = config['shoes']
+        totals = entry['runs'].get(str(shoes))
+        if totals is None and shoes % entry['chunk_shoes'] == 0:
+            chunk = shoes // entry['chunk_shoes']
+            if chunk < len(entry['checkpoints']):
+                totals = entry['checkpoints'][chunk]
+        if totals is None:
+            return None
+        return self._summary(config, totals)
+
+    def run(self, processes=None, progress=None):
+        """
+        Run queued jobs, oldest first, until the queue is empty.
+
+        args:
+            processes (int):    worker processes (defaults to all cores)
+            progress (func):    called with the job after every chunk
+
+        returns:
+            (list):             ids of the jobs that were run
+        """
+        ran = []
+        while True:
+            queued = [job for job in self.jobs() if job['status'] == QUEUED]
+            if not queued:
+                break
+            job = queued[0]
+            job['status'] = RUNNING
+            self._write(self._job_path(job['id']), job)
+            try:
+                self._run(job, processes, progress)
+            except Exception as e:
+                job['status'] = FAILED
+                job['error'] = f'{type(e).__name__}: {e}'
+                self._write(self._job_path(job['id']), job)
+            ran.append(job['id'])
+
+        return ran
+
+    def _run(self, job, processes, progress):
+        config = job['config']
+        if config['kind'] == 'solve':
+            rules = TableRules(**config['rules'])
+            tasks = [(upcard, config['num_decks'], rules)
+                     for upcard in range(1, 11)]
+            worker = _solve_upcard
+        else:
+            entry = self._entry(job['key']) or \
+                {'config': {k: v for k, v in config.items() if k != 'shoes'},
+                 'chunk_shoes': self.chunk_shoes,
+                 'checkpoints': [[0, 0, 0]], 'runs': {}}
+            size = entry['chunk_shoes']
+            shoes = config['shoes']
+            # pick up from the last checkpoint at or before the target
+            first = min(len(entry['checkpoints']) - 1, shoes // size)
+            rules = TableRules(**config['rules'])
+            tasks = [(0, make_strategy(config['strategy']),
+                      config['num_decks'], config['seed'], start,
+                      min(start + size, shoes), config['bankroll'], None,
+                      rules)
+                     for start in range(first * size, shoes, size)]
+            totals = list(entry['checkpoints'][first])
+            worker = sim._play_chunk_cents
+
+            job['total'] = first + len(tasks)
+
+        job['done'] = job['total'] - len(tasks)
+        self._write(self._job_path(job['id']), job)
+
+        processes = processes or os.cpu_count() or 1
+        pool = Pool(processes) if processes > 1 and len(tasks) > 1 else None
+        results = pool.imap(worker, tasks) if pool else map(worker, tasks)
+        table = {}
+        try:
+            for task, result in zip(tasks, results):
+                if config['kind'] == 'solve':
+                    upcard, hands = result
+                    table[str(upcard)] = hands
+                else:
+                    _, rounds, total, total_sq = result
+                    totals = [totals[0] + rounds, totals[1] + total,
+                              totals[2] + total_sq]
+                    # only whole chunks are checkpoints
+                    if task[5] - task[4] == size:
+                        entry['checkpoints'].append(totals)
+                        self._write(self._cache_path(job['key']), entry)
+
+                job['done'] += 1
+                self._write(self._job_path(job['id']), job)
+                if progress:
+                    progress(job)
+
+                if os.path.exists(self._cancel_path(job['id'])):
+                    os.remove(self._cancel_path(job['id']))
+                    job['status'] = CANCELLED
+                    self._write(self._job_path(job['id']), job)
+                    return
+        finally:
+            if pool:
+                pool.terminate()
+                pool.join()
+
+        if config['kind'] == 'solve':
+            result = {'num_decks': config['num_decks'], 'table': table}
+            self._write(self._cache_path(job['key']),
+                        {'config': config, 'result': result})
+        else:
+            entry['runs'][str(shoes)] = totals
+            self._write(self._cache_path(job['key']), entry)
+            result = self._summary(config, totals)
+
+        # a cancel that came in as the last chunk finished is too late
+        if os.path.exists(self._cancel_path(job['id'])):
+            os.remove(self._cancel_path(job['id']))
+        job.update(status=DONE, result=result)
+        self._write(self._job_path(job['id']), job)
+
+        return
+
+    def _size(self, config):
+        """
+        Chunks of work in a job, for progress.
+        """
+        if config['kind'] == 'solve':
+            return 10
+        entry = self._entry(cache_key(config))
+        size = entry['chunk_shoes'] if entry else self.chunk_shoes
+        return -(-config['shoes'] // size)
+
+    @staticmethod
+    def _summary(config, totals):
+        rounds, total, total_sq = totals
+        result = sim.summarize(config['strategy']['name'], rounds,
+                               total / 100, total_sq / 10000)
+        result['shoes'] = config['shoes']
+        return result
+
+    def _entry(self, key):
+        try:
+            with open(self._cache_path(key)) as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return None
+
+    def _job_path(self, job_id):
+        return os.path.join(self.jobs_dir, f'{job_id}.json')
+
+    def _cancel_path(self, job_id):
+        return os.path.join(self.jobs_dir, f'{job_id}.cancel')
+
+    def _cache_path(self, key):
+        return os.path.join(self.cache_dir, f'{key}.json')
+
+    @staticmethod
+    def _write(path, data):
+        """
+        Write through a temporary file so readers never see half a
+        file.
+        """
+        tmp = f'{path}.tmp'
+        with open(tmp, 'w') as f:
+            json.dump(data, f)
+        os.replace(tmp, path)
+        return
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Simulation job queue')
+    parser.add_argument('--root', default='.jobs')
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    submit = commands.add_parser('submit', help='queue a job')
+    submit.add_argument('--kind', choices=('simulate', 'solve'),
+                        default='simulate')
+    submit.add_argument('--strategy', choices=sorted(BOTS), default='basic')
+    submit.add_argument('--shoes', type=int, default=1000)
+    submit.add_argument('--decks', type=int, default=6)
+    submit.add_argument('--seed', type=int, default=0)
+    submit.add_argument('--rules', choices=sorted(PRESETS),
+                        default='default')
+
+    run = commands.add_parser('run', help='run every queued job')
+    run.add_argument('--processes', type=int, default=None)
+
+    commands.add_parser('status', help='list every job')
+
+    cancel = commands.add_parser('cancel', help='cancel a job')
+    cancel.add_argument('job')
+
+    args = parser.parse_args()
+    queue = JobQueue(args.root)
+
+    if args.command == 'submit':
+        job_id = queue.submit({'kind': args.kind, 'strategy': args.strategy,
+                               'shoes': args.shoes, 'num_decks': args.decks,
+                               'seed': args.seed,
+                               'rules': PRESETS[args.rules]})
+        job = queue.status(job_id)
+        print(f'{job_id} {job["status"]}')
+
+    elif args.command == 'run':
+        def report(job):
+            print(f'{job["id"]} {job["done"]}/{job["total"]}', end='\r')
+        for job_id in queue.run(args.processes, report):
+            job = queue.status(job_id)
+            print(f'{job_id} {job["status"]}'
+                  f'{" " + job["error"] if job["error"] else ""}')
+
+    elif args.command == 'status':
+        for job in queue.jobs():
+            print(f'{job["id"]} {job["config"]["kind"]:<8} '
+                  f'{job["status"]:<9} {job["done"]}/{job["total"]}')
+
+    elif args.command == 'cancel':
+        queue.cancel(args.job)
+
+    return
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,576 @@
+#!/usr/bin/env python
+
+"""
+Simulation kernel for blackjack.py, compiled with Numba when installed
+
+The kernel works on plain integers: a shoe is an array of card codes
+(card_codes(), the value with Ten to King told apart) dealt from the
+end, like Deck.draw(), and a table's rules are an array made once by
+rules_array(). It covers:
+
+- seeded_shuffle()  blackjack.seeded_shuffle(), with the same
+                    Mersenne Twister random.Random() uses
+- draw()            Deck.draw()
+- card_value()      Card.value
+- hand_total()      Hand.get_hand_value()
+- dealer_stands()   the stand check in play_dealer_hand()
+- dealer_play()     play_dealer_hand()
+- settle()          hand_result(), in integer cents
+- simulate_shoe()   heads up rounds of a table driven strategy, splits
+                    included, dealt & played in the same order as
+                    play_round(). simulation.py plays BasicStrategy
+                    shoes through it when Numba is installed
+
+hand_total() & dealer_stands() are the one copy of those rules; rollouts,
+the strategy service & the vector environment call them too (through
+python() outside compiled code). Without Numba the same functions run as
+plain Python & give identical results.
+"""
+
+__author__ = "Kyle Long"
+__email__ = "long.kyle@gmail.com"
+__date__ = "08/26/2019"
+__copyright__ = "Copyright 2019, Kyle Long"
+__python_version__ = "3.7.4"
+
+
+import strategy as st
+
+try:
+    import numpy as np
+    from numba import njit
+    NUMBA = True
+except ImportError:
+    np = None
+    NUMBA = False
+
+    def njit(*args, **kwargs):
+        """
+        Stand in for numba.njit that leaves functions as plain Python.
+        """
+        if len(args) == 1 and callable(args[0]):
+            return args[0]
+        return lambda func: func
+
+# strategy table codes
+STAY = 0
+HIT = 1
+DOUBLE_DOWN = 2
+DOUBLE_OR_STAY = 3
+SPLIT = 4
+NO_SPLIT = -1
+
+_CODES = {st.STAY: STAY, st.HIT: HIT, st.DOUBLE_DOWN: DOUBLE_DOWN,
+          'Ds': DOUBLE_OR_STAY}
+_PAIR_CODES = {'y': SPLIT, 'n': NO_SPLIT, 's': STAY}
+
+# card codes: the value for Ace to Nine, then 10 to 13 for Ten to King,
+# so pairs can be told apart by rank like the engine
+RANK_CODES = {'Ace': 1, 'Two': 2, 'Three': 3, 'Four': 4, 'Five': 5,
+              'Six': 6, 'Seven': 7, 'Eight': 8, 'Nine': 9, 'Ten': 10,
+              'Jack': 11, 'Queen': 12, 'King': 13}
+
+# fields of a rules_array()
+STAND_SOFT = 0
+BLACKJACK_CENTS = 1
+INSURANCE_CENTS = 2
+SURRENDER = 3
+DOUBLE_AFTER_SPLIT = 4
+MAX_SPLITS = 5
+RESPLIT_ACES = 6
+HIT_SPLIT_ACES = 7
+
+# Mersenne Twister size, shift & the ints a generator's state takes
+_MT_N = 624
+_MT_M = 397
+MT_STATE = _MT_N + 1
+
+# an 8 deck shoe holds 32 cards of a rank, so no round splits to more
+# hands than this & unlimited resplits fit in fixed size arrays
+MAX_HANDS = 32
+
+
+def to_array(values):
+    """
+    args:
+        values (list):  ints, or a list of lists of ints
+
+    returns:
+        numpy array when Numba is in use, otherwise the list itself
+    """
+    if NUMBA:
+        return np.array(values, dtype=np.int64)
+    return values
+
+
+def results_array(size):
+    """
+    args:
+        size (int):     most rounds a shoe can hold
+
+    returns:
+        int array of zeros for simulate_shoe() results
+    """
+    if NUMBA:
+        return np.zeros(size, dtype=np.int64)
+    return [0] * size
+
+
+def rules_array(rules):
+    """
+    The rules the kernel plays by, as ints indexed by the field
+    constants above.
+
+    args:
+        rules (class):  TableRules() object
+
+    returns:
+        (array):        rules for the kernel functions
+    """
+    return to_array([rules.stand_values[1], rules.blackjack_cents,
+                     rules.insurance_cents, int(rules.late_surrender),
+                     int(rules.double_after_split),
+                     int(min(rules.max_splits, MAX_HANDS - 1)),
+                     int(rules.resplit_aces), int(rules.hit_split_aces)])
+
+
+def card_codes(cards):
+    """
+    args:
+        cards (list):   Card() objects, i.e. Deck.cards
+
+    returns:
+        (array):        their card codes, for a kernel shoe
+    """
+    return to_array([RANK_CODES[card.rank] for card in cards])
+
+
+def python(func):
+    """
+    args:
+        func (function):    kernel function
+
+    returns:
+        (function):         its plain Python version, which is quicker
+                            to call from Python than the compiled one
+    """
+    return getattr(func, 'py_func', func)
+
+
+def basic_tables():
+    """
+    The basic strategy tables as integer codes, indexed
+    [total][upcard] with upcard 1 (Ace) to 10.
+
+    returns:
+        hard (array):   hard totals 0-21
+        soft (array):   soft totals 0-21
+        pairs (array):  SPLIT, STAY or NO_SPLIT by pair value 0-10
+    """
+    hard = [[HIT] * 11 for _ in range(22)]
+    soft = [[HIT] * 11 for _ in range(22)]
+    pairs = [[NO_SPLIT] * 11 for _ in range(11)]
+    for pair, row in st.PAIR_TABLE.items():
+        for up, split in row.items():
+            pairs[pair][up] = _PAIR_CODES[split]
+    for total in range(22):
+        for up in range(1, 11):
+            if total >= 17:
+                hard[total][up] = STAY
+            elif total in st.HARD_TABLE:
+                hard[total][up] = _CODES[st.HARD_TABLE[total][up]]
+            if total >= 20:
+                soft[total][up] = STAY
+            elif total in st.SOFT_TABLE:
+                soft[total][up] = _CODES[st.SOFT_TABLE[total][up]]
+
+    return to_array(hard), to_array(soft), to_array(pairs)
+
+
+def seed_words(seed):
+    """
+    args:
+        seed (int):     seed for random.Random()
+
+    returns:
+        (list):         the 32 bit words random.Random() seeds its
+                        Mersenne Twister with, lowest first
+    """
+    seed = abs(seed)
+    words = []
+    while True:
+        words.append(seed & 0xffffffff)
+        seed >>= 32
+        if not seed:
+            return words
+
+
+@njit(cache=True)
+def mt_seed(key, length, state):
+    """
+    Seed a Mersenne Twister (MT19937) like random.Random(seed), from
+    seed_words(seed).
+
+    args:
+        key (array):    seed words
+        length (int):   number of words used
+        state (array):  MT_STATE ints, filled with the generator state
+    """
+    state[0] = 19650218
+    for i in range(1, _MT_N):
+        state[i] = (1812433253 * (state[i - 1] ^ (state[i - 1] >> 30)) +
+                    i) & 0xffffffff
+
+    i = 1
+    j = 0
+    for _ in range(max(_MT_N, length)):
+        state[i] = ((state[i] ^ ((state[i - 1] ^ (state[i - 1] >> 30)) *
+                                 1664525)) + key[j] + j) & 0xffffffff
+        i += 1
+        j += 1
+        if i >= _MT_N:
+            state[0] = state[_MT_N - 1]
+            i = 1
+        if j >= length:
+            j = 0
+    for _ in range(_MT_N - 1):
+        state[i] = ((state[i] ^ ((state[i - 1] ^ (state[i - 1] >> 30)) *
+                                 1566083941)) - i) & 0xffffffff
+        i += 1
+        if i >= _MT_N:
+            state[0] = state[_MT_N - 1]
+            i = 1
+    state[0] = 0x80000000
+    state[_MT_N] = _MT_N
+    return
+
+
+@njit(cache=True)
+def _mt_next(state):
+    """
+    returns:
+        (int):      the generator's next 32 bit output
+    """
+    if state[_MT_N] >= _MT_N:
+        for k in range(_MT_N):
+            y = (state[k] & 0x80000000) | (state[(k + 1) % _MT_N] &
+                                           0x7fffffff)
+            state[k] = state[(k + _MT_M) % _MT_N] ^ (y >> 1)
+            if y & 1:
+                state[k] ^= 0x9908b0df
+        state[_MT_N] = 0
+
+    y = state[state[_MT_N]]
+    state[_MT_N] += 1
+    y ^= y >> 11
+    y ^= (y << 7) & 0x9d2c5680
+    y ^= (y << 15) & 0xefc60000
+    y ^= y >> 18
+    return y
+
+
+@njit(cache=True)
+def mt_random(state):
+    """
+    returns:
+        (float):    next random.Random.random() of a mt_seed() state
+    """
+    a = _mt_next(state) >> 5
+    b = _mt_next(state) >> 6
+    return (a * 67108864.0 + b) * (1.0 / 9007199254740992.0)
+
+
+@njit(cache=True)
+def seeded_shuffle(shoe, state):
+    """
+    In place blackjack.seeded_shuffle() of a shoe, drawing from a
+    mt_seed() state seeded with the same seed.
+    """
+    for i in range(len(shoe) - 1, 0, -1):
+        j = min(int(mt_random(state) * (i + 1)), i)
+        shoe[i], shoe[j] = shoe[j], shoe[i]
+    return
+
+
+@njit(cache=True)
+def draw(shoe, cursor):
+    """
+    args:
+        shoe (array):   card codes, dealt from the end
+        cursor (int):   cards left in the shoe
+
+    returns:
+        card (int):     card code
+        cursor (int):   cards left after the draw
+
+    raises:
+        IndexError:     the shoe is empty, like Deck.draw()
+    """
+    if cursor <= 0:
+        raise IndexError('draw from an empty shoe')
+    return shoe[cursor - 1], cursor - 1
+
+
+@njit(cache=True)
+def card_value(card):
+    """
+    args:
+        card (int):     card code (see card_codes())
+
+    returns:
+        (int):          the card's value, Ace is 1
+    """
+    if card > 10:
+        return 10
+    return card
+
+
+@njit(cache=True)
+def hand_total(total, aces):
+    """
+    Best total of a hand, matching Hand.get_hand_value()[-1].
+
+    args:
+        total (int):    sum of card values, Aces counted as 1
+        aces (bool):    True if the hand holds an Ace
+
+    returns:
+        best (int):     best total
+        soft (bool):    True if an Ace is being counted as 11
+    """
+    if aces and total + 10 <= 21:
+        return total + 10, True
+    return total, False
+
+
+@njit(cache=True)
+def dealer_stands(best, soft, stand_soft):
+    """
+    Whether the dealer stands, like play_dealer_hand().
+
+    args:
+        best (int):         dealer's best total (hand_total())
+        soft (bool):        the total is soft
+        stand_soft (int):   soft total the dealer stands on, 18 when
+                            hitting a soft 17 (TableRules.stand_values)
+
+    returns:
+        (bool):             True if the dealer stands
+    """
+    if soft:
+        return best >= stand_soft
+    return best >= 17
+
+
+@njit(cache=True)
+def dealer_play(shoe, cursor, hole, up, rules):
+    """
+    Play the dealer's hand.
+
+    args:
+        shoe (array):   card codes, dealt from the end
+        cursor (int):   cards left in the shoe
+        hole (int):     value of the hole card
+        up (int):       value of the upcard
+        rules (array):  rules_array()
+
+    returns:
+        best (int):     dealer's final total
+        cursor (int):   cards left in the shoe
+    """
+    total = hole + up
+    aces = hole == 1 or up == 1
+    while True:
+        best, soft = hand_total(total, aces)
+        if dealer_stands(best, soft, rules[STAND_SOFT]):
+            return best, cursor
+        card, cursor = draw(shoe, cursor)
+        total += card_value(card)
+        aces = aces or card == 1
+
+
+@njit(cache=True)
+def settle(wager, player, blackjack, surrender, dealer, dealer_blackjack,
+           insurance, rules):
+    """
+    Net result of a hand, paid like hand_result().
+
+    args:
+        wager (int):                hand's wager
+        player (int):               hand's final total
+        blackjack (bool):           hand is a blackjack
+        surrender (bool):           hand was surrendered
+        dealer (int):               dealer's final total
+        dealer_blackjack (bool):    dealer has a blackjack
+        insurance (bool):           hand took insurance
+        rules (array):              rules_array()
+
+    returns:
+        (int):                      net result in cents
+    """
+    cents = 0
+    if insurance:
+        if dealer_blackjack:
+            cents += wager * rules[INSURANCE_CENTS]
+        else:
+            cents -= wager * rules[INSURANCE_CENTS]
+
+    if blackjack:
+        cents += wager * rules[BLACKJACK_CENTS]
+    elif surrender:
+        cents -= wager * 50
+    elif player <= 21 and (dealer > 21 or player > dealer):
+        cents += wager * 100
+    elif player > 21 or player < dealer:
+        cents -= wager * 100
+
+    return cents
+
+
+@njit(cache=True)
+def simulate_shoe(shoe, wager, bankroll, hard, soft, pairs, reshuffle,
+                  rules, results):
+    """
+    Play heads up rounds with table driven strategies until fewer than
+    `reshuffle` cards are left, like simulation.play_shoe(). Splits,
+    resplits & doubles are offered exactly as play_hands() offers them;
+    insurance & surrender aren't, as the tables never take them.
+
+    args:
+        shoe (array):       card codes (card_codes()), dealt from the end
+        wager (int):        wager on every round
+        bankroll (int):     balance every round starts with (for whether
+                            a double is allowed)
+        hard (array):       strategy codes for hard totals
+        soft (array):       strategy codes for soft totals
+        pairs (array):      pair codes, indexed [pair value][upcard]
+        reshuffle (float):  reshuffle point, TableRules.reshuffle_at()
+        rules (array):      rules_array()
+        results (array):    filled with the net result of each round,
+                            in cents
+
+    returns:
+        (int):              number of rounds played
+    """
+    # every hand of the round, in play_hands() order. Splits are
+    # inserted after the hand they came from
+    first = [0] * MAX_HANDS
+    second = [0] * MAX_HANDS
+    totals = [0] * MAX_HANDS
+    aces = [False] * MAX_HANDS
+    bets = [0] * MAX_HANDS
+    blackjacks = [False] * MAX_HANDS
+    finished = [False] * MAX_HANDS
+
+    cursor = len(shoe)
+    rounds = 0
+    while cursor >= reshuffle:
+        p1, cursor = draw(shoe, cursor)
+        p2, cursor = draw(shoe, cursor)
+        hole, cursor = draw(shoe, cursor)
+        up, cursor = draw(shoe, cursor)
+        hole = card_value(hole)
+        up = card_value(up)
+
+        first[0] = p1
+        second[0] = p2
+        totals[0] = card_value(p1) + card_value(p2)
+        aces[0] = p1 == 1 or p2 == 1
+        bets[0] = wager
+        blackjacks[0] = hand_total(totals[0], aces[0])[0] == 21
+        finished[0] = False
+        hands = 1
+
+        dealer_blackjack = hand_total(hole + up, hole == 1 or up == 1)[0] \
+            == 21
+
+        i = 0
+        while i < hands and not dealer_blackjack:
+            if blackjacks[i] or finished[i]:
+                i += 1
+                continue
+
+            split = False
+            first_iter = True
+            while True:
+                best, is_soft = hand_total(totals[i], aces[i])
+                splits = hands - 1
+
+                code = NO_SPLIT
+                if first_iter and first[i] == second[i] and \
+                        splits < rules[MAX_SPLITS] and \
+                        (splits == 0 or first[i] != 1 or
+                         rules[RESPLIT_ACES]):
+                    code = pairs[card_value(first[i])][up]
+                if code == NO_SPLIT:
+                    if is_soft:
+                        code = soft[best][up]
+                    else:
+                        code = hard[best][up]
+
+                can_double = first_iter and \
+                    bankroll >= 2 * bets[i] and \
+                    (splits == 0 or rules[DOUBLE_AFTER_SPLIT])
+                if code == DOUBLE_OR_STAY:
+                    code = DOUBLE_DOWN if can_double else STAY
+                elif code == DOUBLE_DOWN and not can_double:
+                    code = HIT
+
+                if code == STAY:
+                    finished[i] = True
+                    break
+
+                if code == SPLIT:
+                    # make room for the second hand right after this one
+                    for k in range(hands, i + 1, -1):
+                        first[k] = first[k - 1]
+                        second[k] = second[k - 1]
+                        totals[k] = totals[k - 1]
+                        aces[k] = aces[k - 1]
+                        bets[k] = bets[k - 1]
+                        blackjacks[k] = blackjacks[k - 1]
+                        finished[k] = finished[k - 1]
+                    hands += 1
+
+                    first[i + 1] = second[i]
+                    for k in range(i, i + 2):
+                        card, cursor = draw(shoe, cursor)
+                        second[k] = card
+                        totals[k] = card_value(first[k]) + card_value(card)
+                        aces[k] = first[k] == 1 or card == 1
+                        bets[k] = bets[i]
+                        # a split hand's 2 card 21 is a blackjack
+                        blackjacks[k] = \
+                            hand_total(totals[k], aces[k])[0] == 21
+                        # split Aces may only get the one card
+                        finished[k] = first[k] == 1 and \
+                            not rules[HIT_SPLIT_ACES]
+                    split = True
+                    break
+
+                card, cursor = draw(shoe, cursor)
+                totals[i] += card_value(card)
+                aces[i] = aces[i] or card == 1
+                first_iter = False
+                if code == DOUBLE_DOWN:
+                    bets[i] *= 2
+                    finished[i] = True
+                    break
+                if hand_total(totals[i], aces[i])[0] > 21:
+                    finished[i] = True
+                    break
+
+            # split hands are played from the first of them
+            if not split:
+                i += 1
+
+        dealer, cursor = dealer_play(shoe, cursor, hole, up, rules)
+        result = 0
+        for k in range(hands):
+            best = hand_total(totals[k], aces[k])[0]
+            result += settle(bets[k], best, blackjacks[k], False, dealer,
+                             dealer_blackjack, False, rules)
+        results[rounds] = result
+        rounds += 1
+
+    return rounds
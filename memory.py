@@ -0,0 +1,199 @@
+#!/usr/bin/env python
+
+"""
+Opt-in memory profiling for long running blackjack.py tables
+
+Every N rounds a MemoryMonitor takes a tracemalloc snapshot, counts the
+live Card, Hand & Player objects along with the players/hands list
+sizes, and warns (MemoryGrowthWarning) when memory keeps growing across
+the session.
+"""
+
+__author__ = "Kyle Long"
+__email__ = "long.kyle@gmail.com"
+__date__ = "08/26/2019"
+__copyright__ = "Copyright 2019, Kyle Long"
+__python_version__ = "3.7.4"
+
+
+import gc
+import argparse
+import tracemalloc
+import warnings
+
+import blackjack as bj
+from blackjack import Card, Hand, Player
+
+
+class MemoryGrowthWarning(UserWarning):
+    """
+    Memory kept growing across a session. A UserWarning, so it is shown
+    under Python's default warning filters (unlike ResourceWarning).
+    """
+
+
+class MemoryMonitor():
+    """
+    Samples memory use of a table every `every` rounds.
+
+    args:
+        every (int):        rounds between samples
+        window (int):       samples a growth trend is judged over
+        threshold (int):    bytes per round of steady growth that
+                            raises an alert
+        top (int):          allocation sites kept per sample
+        alert (function):   called with a message when growth is
+                            detected (defaults to a
+                            MemoryGrowthWarning)
+    """
+
+    def __init__(self, every=100, window=10, threshold=64, top=5,
+                 alert=None):
+        self.every = every
+        self.window = window
+        self.threshold = threshold
+        self.top = top
+        self.alert = alert or self._warn
+        self.rounds = 0
+        self.samples = []
+        self._snapshot = None
+        self._started_tracemalloc = False
+
+    def start(self):
+        """
+        Start tracing allocations & listening for finished rounds.
+        """
+        if not tracemalloc.is_tracing():
+            tracemalloc.start()
+            self._started_tracemalloc = True
+        bj.listeners.append(self.on_event)
+
+        return
+
+    def stop(self):
+        """
+        Stop listening, and stop tracing if start() turned it on.
+        """
+        if self.on_event in bj.listeners:
+            bj.listeners.remove(self.on_event)
+        if self._started_tracemalloc:
+            tracemalloc.stop()
+            self._started_tracemalloc = False
+
+        return
+
+    def on_event(self, event, players=None, **data):
+        if event != 'round_end':
+            return
+
+        self.rounds += 1
+        if self.rounds % self.every == 0:
+            self.sample(players)
+
+        return
+
+    def sample(self, players):
+        """
+        Record the table's memory use & check for growth.
+
+        args:
+            players (list):     list of all players
+
+        returns:
+            (dict):             the new sample
+        """
+        snapshot = tracemalloc.take_snapshot()
+        current, peak = tracemalloc.get_traced_memory()
+
+        top = []
+        if self._snapshot is not None:
+            stats = snapshot.compare_to(self._snapshot, 'lineno')
+            top = [str(stat) for stat in stats[:self.top]]
+        self._snapshot = snapshot
+
+        counts = {Card: 0, Hand: 0, Player: 0}
+        for obj in gc.get_objects():
+            for cls in counts:
+                if isinstance(obj, cls):
+                    counts[cls] += 1
+
+        sample = {'round': self.rounds,
+                  'traced': current,
+                  'peak': peak,
+                  'cards': counts[Card],
+                  'hands': counts[Hand],
+                  'players': counts[Player],
+                  'table_players': len(players),
+                  'table_hands': sum(len(p.hands) for p in players),
+                  'top': top}
+        self.samples.append(sample)
+        self.check()
+
+        return sample
+
+    def trend(self):
+        """
+        Least squares slope of traced memory over the last `window`
+        samples.
+
+        returns:
+            (float):    bytes of growth per round
+        """
+        samples = self.samples[-self.window:]
+        if len(samples) < 2:
+            return 0.0
+
+        xs = [s['round'] for s in samples]
+        ys = [s['traced'] for s in samples]
+        x_mean = sum(xs) / len(xs)
+        y_mean = sum(ys) / len(ys)
+        num = sum((x - x_mean) * (y - y_mean) for x, y in zip(xs, ys))
+        den = sum((x - x_mean) ** 2 for x in xs)
+
+        return num / den
+
+    def check(self):
+        """
+        Alert if memory grew steadily over a full window of samples.
+
+        returns:
+            (bool):     True if an alert was raised
+        """
+        if len(self.samples) < self.window:
+            return False
+
+        slope = self.trend()
+        if slope < self.threshold:
+            return False
+
+        last = self.samples[-1]
+        self.alert(f'Memory grew {slope:.0f} bytes/round over the last '
+                   f'{self.window} samples: {last["traced"]} bytes traced, '
+                   f'{last["cards"]} Cards, {last["hands"]} Hands, '
+                   f'{last["players"]} Players alive. Top growth: '
+                   f'{last["top"][:1]}')
+
+        return True
+
+    def _warn(self, message):
+        warnings.warn(message, MemoryGrowthWarning, stacklevel=2)
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description='Play blackjack with memory profiling')
+    parser.add_argument('--every', type=int, default=100)
+    args = parser.parse_args()
+
+    monitor = MemoryMonitor(every=args.every, alert=print)
+    monitor.start()
+    try:
+        bj.run()
+    finally:
+        monitor.stop()
+
+    return
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,310 @@
+#!/usr/bin/env python
+
+"""
+Runtime metrics for live blackjack.py tables
+
+TableMetrics listens to table events and keeps plain counters; the game
+loop only ever adds to them. Exporters read the counters on their own
+schedule:
+
+- PrometheusExporter serves the text exposition format on localhost
+  from a background thread
+- StatsdClient sends everything that changed as one UDP packet every
+  N rounds
+"""
+
+__author__ = "Kyle Long"
+__email__ = "long.kyle@gmail.com"
+__date__ = "08/26/2019"
+__copyright__ = "Copyright 2019, Kyle Long"
+__python_version__ = "3.7.4"
+
+
+import time
+import socket
+import argparse
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import blackjack as bj
+
+# timing samples kept for StatsD between flushes, extras are dropped
+MAX_TIMINGS = 1000
+
+COUNTERS = ('rounds', 'hands', 'reshuffles', 'splits', 'doubles',
+            'prompts', 'prompt_seconds', 'timeouts', 'dealer_hands',
+            'dealer_seconds')
+
+
+class TableMetrics():
+    """
+    Counters for one table, fed by blackjack.emit() events.
+
+    args:
+        table (str):    name of the table, used as a label
+    """
+
+    def __init__(self, table='table'):
+        self.table = table
+        for name in COUNTERS:
+            setattr(self, name, 0)
+        self.house_cents = 0
+        self.started = time.monotonic()
+        self.timings = []
+
+    def start(self):
+        bj.listeners.append(self.on_event)
+        return
+
+    def stop(self):
+        if self.on_event in bj.listeners:
+            bj.listeners.remove(self.on_event)
+        return
+
+    def on_event(self, event, **data):
+        if event == 'round_end':
+            self.rounds += 1
+            for player in data['players'][:-1]:
+                self.hands += len(player.hands)
+                # a player sitting out has no hands
+                self.splits += max(len(player.hands) - 1, 0)
+                for hand in player.hands:
+                    self.doubles += hand.double_down
+
+        elif event == 'settle':
+            self.house_cents -= data['cents']
+
+        elif event == 'prompt':
+            self.prompts += 1
+            self.prompt_seconds += data['seconds']
+            self.timeouts += data.get('timed_out', False)
+            if len(self.timings) < MAX_TIMINGS:
+                self.timings.append(('prompt', data['seconds']))
+
+        elif event == 'dealer_done':
+            self.dealer_hands += 1
+            self.dealer_seconds += data['seconds']
+            if len(self.timings) < MAX_TIMINGS:
+                self.timings.append(('dealer', data['seconds']))
+
+        elif event == 'shuffle':
+            self.reshuffles += 1
+
+        return
+
+    def snapshot(self):
+        """
+        returns:
+            (dict):     every counter, the house P&L & rounds per second
+        """
+        values = {name: getattr(self, name) for name in COUNTERS}
+        values['house_pnl'] = bj.dollars(self.house_cents)
+        elapsed = time.monotonic() - self.started
+        values['rounds_per_second'] = self.rounds / elapsed if elapsed else 0
+        values['rounds_per_hour'] = values['rounds_per_second'] * 3600
+        values['prompt_seconds_mean'] = \
+            self.prompt_seconds / self.prompts if self.prompts else 0
+        return values
+
+    def prometheus(self):
+        """
+        returns:
+            (str):      metrics in the Prometheus text exposition format
+        """
+        values = self.snapshot()
+        label = f'{{table="{self.table}"}}'
+        lines = []
+
+        def add(name, kind, value, help_str):
+            lines.append(f'# HELP blackjack_{name} {help_str}')
+            lines.append(f'# TYPE blackjack_{name} {kind}')
+            lines.append(f'blackjack_{name}{label} {value}')
+
+        def summary(name, total, count, help_str):
+            lines.append(f'# HELP blackjack_{name} {help_str}')
+            lines.append(f'# TYPE blackjack_{name} summary')
+            lines.append(f'blackjack_{name}_sum{label} {total}')
+            lines.append(f'blackjack_{name}_count{label} {count}')
+
+        add('rounds_total', 'counter', values['rounds'], 'Rounds played')
+        add('hands_total', 'counter', values['hands'], 'Hands dealt')
+        add('reshuffles_total', 'counter', values['reshuffles'],
+            'Shoe reshuffles')
+        add('splits_total', 'counter', values['splits'], 'Hands split')
+        add('doubles_total', 'counter', values['doubles'],
+            'Hands doubled down')
+        summary('prompt_seconds', values['prompt_seconds'],
+                values['prompts'], 'Seconds spent answering prompts')
+        add('prompt_timeouts_total', 'counter', values['timeouts'],
+            'Prompts answered by default when the player ran out of time')
+        summary('dealer_seconds', values['dealer_seconds'],
+                values['dealer_hands'],
+                'Seconds spent playing the dealer\'s hand')
+        add('house_pnl_dollars', 'gauge', values['house_pnl'],
+            'House profit & loss')
+        add('rounds_per_second', 'gauge', values['rounds_per_second'],
+            'Rounds per second since the table opened')
+        add('rounds_per_hour', 'gauge', values['rounds_per_hour'],
+            'Rounds per hour since the table opened')
+
+        return '\n'.join(lines) + '\n'
+
+
+class PrometheusExporter():
+    """
+    Serves /metrics for a table on localhost from a daemon thread.
+
+    args:
+        metrics (class):    TableMetrics() object
+        host (str):         address to bind
+        port (int):         port to bind, 0 picks a free port
+    """
+
+    def __init__(self, metrics, host='127.0.0.1', port=9464):
+        self.metrics = metrics
+        exporter = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path != '/metrics':
+                    self.send_error(404)
+                    return
+                body = exporter.metrics.prometheus().encode('utf-8')
+                self.send_response(200)
+                self.send_header('Content-Type',
+                                 'text/plain; version=0.0.4')
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                return
+
+        self.server = ThreadingHTTPServer((host, port), Handler)
+        self.port = self.server.server_address[1]
+        self._thread = None
+
+    def start(self):
+        self._thread = threading.Thread(target=self.server.serve_forever,
+                                        daemon=True)
+        self._thread.start()
+        return
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+        return
+
+
+class StatsdClient():
+    """
+    Sends a table's metrics to StatsD over UDP, batched into a single
+    packet every `every` rounds. Counters are sent as the change since
+    the last flush, timings as individual samples.
+
+    args:
+        metrics (class):    TableMetrics() object
+        host (str):         StatsD host
+        port (int):         StatsD port
+        prefix (str):       metric name prefix
+        every (int):        rounds between flushes
+    """
+
+    def __init__(self, metrics, host='127.0.0.1', port=8125,
+                 prefix='blackjack', every=10):
+        self.metrics = metrics
+        self.address = (host, port)
+        self.prefix = f'{prefix}.{metrics.table}'
+        self.every = every
+        self.sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self.sock.setblocking(False)
+        self._last = dict.fromkeys(COUNTERS, 0)
+
+    def start(self):
+        bj.listeners.append(self.on_event)
+        return
+
+    def stop(self):
+        if self.on_event in bj.listeners:
+            bj.listeners.remove(self.on_event)
+        self.flush()
+        self.sock.close()
+        return
+
+    def on_event(self, event, **data):
+        if event == 'round_end' and self.metrics.rounds % self.every == 0:
+            self.flush()
+        return
+
+    def flush(self):
+        """
+        Send everything that changed since the last flush.
+
+        returns:
+            (bytes):    the packet sent
+        """
+        metrics = self.metrics
+        lines = []
+        for name in ('rounds', 'hands', 'reshuffles', 'splits', 'doubles',
+                     'timeouts'):
+            value = getattr(metrics, name)
+            if value != self._last[name]:
+                lines.append(f'{self.prefix}.{name}:'
+                             f'{value - self._last[name]}|c')
+                self._last[name] = value
+
+        timings, metrics.timings = metrics.timings, []
+        for name, seconds in timings:
+            lines.append(f'{self.prefix}.{name}_ms:{seconds * 1000:.3f}|ms')
+
+        house_pnl = bj.dollars(metrics.house_cents)
+        lines.append(f'{self.prefix}.house_pnl:{house_pnl}|g')
+
+        packet = '\n'.join(lines).encode('utf-8')
+        try:
+            self.sock.sendto(packet, self.address)
+        except OSError:
+            # metrics must never slow down or break the table
+            pass
+
+        return packet
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description='Play blackjack with metrics exported')
+    parser.add_argument('--table', default='table')
+    parser.add_argument('--port', type=int, default=9464,
+                        help='Prometheus port on localhost')
+    parser.add_argument('--statsd', default=None,
+                        help='StatsD host:port')
+    parser.add_argument('--timeout', type=float, default=None,
+                        help='seconds to answer each prompt before the '
+                             'default answer is taken')
+    args = parser.parse_args()
+    bj.TIMEOUTS.update(dict.fromkeys(bj.TIMEOUTS, args.timeout))
+
+    table_metrics = TableMetrics(args.table)
+    table_metrics.start()
+    exporter = PrometheusExporter(table_metrics, port=args.port)
+    exporter.start()
+
+    statsd = None
+    if args.statsd:
+        host, port = args.statsd.rsplit(':', 1)
+        statsd = StatsdClient(table_metrics, host, int(port))
+        statsd.start()
+
+    try:
+        bj.run()
+    finally:
+        if statsd:
+            statsd.stop()
+        exporter.stop()
+        table_metrics.stop()
+
+    return
+
+
+if __name__ == "__main__":
+    main()
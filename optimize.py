@@ -0,0 +1,201 @@
+#!/usr/bin/env python
+
+"""
+Bet spread optimizer for blackjack.py
+
+Searches over bet ramps (wager as a function of the hi-lo true count)
+played by CountingStrategy bots through the game's own rules &
+penetration. Candidates are compared on the same shoes and thinned by
+successive halving: every rung plays more shoes and only the best
+share of the candidates moves on, so poor spreads are dropped after a
+few shoes instead of a full simulation.
+"""
+
+__author__ = "Kyle Long"
+__email__ = "long.kyle@gmail.com"
+__date__ = "08/26/2019"
+__copyright__ = "Copyright 2019, Kyle Long"
+__python_version__ = "3.7.4"
+
+
+import math
+import argparse
+
+import blackjack as bj
+import simulation as sim
+import strategy as st
+from rules import PRESETS
+
+OBJECTIVES = ('di', 'ev_per_hour')
+
+
+def candidate_ramps(min_bet=10, spreads=(1, 2, 4, 8, 12, 16),
+                    starts=(1, 2, 3), levels=6):
+    """
+    Bet ramps that start at min_bet, double per true count from a
+    starting count, and top out at min_bet * spread.
+
+    args:
+        min_bet (int):      wager at a true count of 0 or less
+        spreads (tuple):    largest wager as a multiple of min_bet
+        starts (tuple):     true count the ramp starts raising at
+        levels (int):       true counts covered by the ramp
+
+    returns:
+        (list):             unique ramps (tuples of wagers)
+    """
+    ramps = []
+    for spread in spreads:
+        for start in starts:
+            ramp = tuple(min_bet * min(spread, 2 ** max(tc - start + 1, 0))
+                         for tc in range(levels))
+            if ramp not in ramps:
+                ramps.append(ramp)
+
+    return ramps
+
+
+def score(summary, rounds_per_hour=100, bankroll=10000):
+    """
+    Score a bet spread from its per round results.
+
+    args:
+        summary (dict):         simulation.summarize() of the spread
+        rounds_per_hour (int):  rounds played per hour
+        bankroll (int):         bankroll used for the risk of ruin
+
+    returns:
+        (dict):                 summary plus ev_per_hour, sd_per_hour,
+                                risk_of_ruin, n0 (rounds to overcome one
+                                standard deviation) & di (ev / sd)
+    """
+    ev = summary['mean']
+    variance = summary['std'] ** 2
+
+    scored = dict(summary)
+    scored['ev_per_hour'] = ev * rounds_per_hour
+    scored['sd_per_hour'] = summary['std'] * math.sqrt(rounds_per_hour)
+    if ev > 0 and variance:
+        scored['risk_of_ruin'] = math.exp(-2 * ev * bankroll / variance)
+        scored['n0'] = variance / ev ** 2
+    else:
+        scored['risk_of_ruin'] = 1.0
+        scored['n0'] = math.inf
+    scored['di'] = ev / summary['std'] if summary['std'] else 0.0
+
+    return scored
+
+
+def optimize_spread(ramps, shoes=50, num_decks=6, seed=0, eta=2,
+                    max_shoes=None, objective='di', max_ror=None,
+                    rounds_per_hour=100, bankroll=10000, processes=None,
+                    rules=bj.RULES):
+    """
+    Find the best bet ramps by successive halving.
+
+    args:
+        ramps (list):           candidate ramps (tuples of wagers)
+        shoes (int):            shoes played by every candidate on the
+                                first rung
+        num_decks (int):        number of decks in the shoe
+        seed (int):             base seed for the shoe sequence
+        eta (int):              1 / eta of the candidates survive each
+                                rung, which plays eta times more shoes
+                                (at least 2)
+        max_shoes (int):        stop once candidates have played this
+                                many shoes (defaults to no limit)
+        objective (str):        'di' or 'ev_per_hour'
+        max_ror (float):        drop spreads whose risk of ruin is
+                                higher than this
+        rounds_per_hour (int):  rounds played per hour
+        bankroll (int):         balance the bots bet from each round,
+                                also used for the risk of ruin
+        processes (int):        worker processes (defaults to all cores)
+        rules (class):          TableRules() the shoes are played under,
+                                penetration included
+
+    returns:
+        (list):                 score() dicts of the final candidates,
+                                best first, each with the ramp & the
+                                shoes it played
+    """
+    if objective not in OBJECTIVES:
+        raise ValueError(f'objective must be one of {OBJECTIVES}')
+    if eta < 2:
+        raise ValueError('eta must be at least 2')
+
+    bots = [st.CountingStrategy(ramp) for ramp in ramps]
+    totals = [[0, 0, 0] for _ in bots]
+    alive = list(range(len(bots)))
+    played = 0
+    rung_shoes = shoes
+
+    while True:
+        stop = played + rung_shoes
+        if max_shoes:
+            stop = min(stop, max_shoes)
+
+        # every surviving candidate plays the same new shoes
+        new = sim.play_shoes([bots[i] for i in alive], played, stop,
+                             num_decks, seed, processes, bankroll,
+                             rules=rules)
+        for i, t in zip(alive, new):
+            totals[i] = [a + b for a, b in zip(totals[i], t)]
+        played = stop
+
+        scores = {}
+        for i in alive:
+            scored = score(sim.summarize(bots[i].name, *totals[i]),
+                           rounds_per_hour, bankroll)
+            scored['ramp'] = bots[i].ramp
+            scored['shoes'] = played
+            scores[i] = scored
+
+        alive.sort(key=lambda i: scores[i][objective], reverse=True)
+        if max_ror is not None:
+            safe = [i for i in alive if scores[i]['risk_of_ruin'] <= max_ror]
+            alive = safe or alive[:1]
+
+        if len(alive) == 1 or (max_shoes and played >= max_shoes):
+            return [scores[i] for i in alive]
+
+        alive = alive[:math.ceil(len(alive) / eta)]
+        if len(alive) == 1:
+            return [scores[alive[0]]]
+        rung_shoes *= eta
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Optimize a bet spread')
+    parser.add_argument('--min-bet', type=int, default=10)
+    parser.add_argument('--shoes', type=int, default=50)
+    parser.add_argument('--max-shoes', type=int, default=None)
+    parser.add_argument('--decks', type=int, default=6)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--objective', default='di', choices=OBJECTIVES)
+    parser.add_argument('--max-ror', type=float, default=None)
+    parser.add_argument('--bankroll', type=int, default=10000)
+    parser.add_argument('--processes', type=int, default=None)
+    parser.add_argument('--rules', default='default',
+                        choices=sorted(PRESETS))
+    args = parser.parse_args()
+
+    results = optimize_spread(candidate_ramps(args.min_bet), args.shoes,
+                              args.decks, args.seed,
+                              max_shoes=args.max_shoes,
+                              objective=args.objective,
+                              max_ror=args.max_ror,
+                              bankroll=args.bankroll,
+                              processes=args.processes,
+                              rules=PRESETS[args.rules])
+    for r in results:
+        print(f'{r["name"]}: EV/hour {r["ev_per_hour"]:.2f}, '
+              f'SD/hour {r["sd_per_hour"]:.2f}, '
+              f'RoR {r["risk_of_ruin"]:.4f}, N0 {r["n0"]:.0f}, '
+              f'DI {r["di"]:.4f} ({r["shoes"]} shoes)')
+
+    return
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,399 @@
+#!/usr/bin/env python
+
+"""
+Deterministic session replay for blackjack.py
+
+A SessionRecorder logs a live session as the seed of every shoe plus
+the ordered answers given at each prompt, a few bytes per round, with a
+table snapshot (snapshot.py) every N rounds. A SessionLog rebuilds the
+exact deal, play, dealer & settle results of any round from that log at
+full speed, starting from the nearest checkpoint instead of round 1.
+
+Gamblers played by Strategy() bots answer no prompts, so their
+decisions are not logged; pass the same (deterministic) bots back in
+to replay them.
+
+Layout (little endian):
+    header:     magic (4s), version (B)
+    records:    kind (B), then
+        TABLE:      length (H), json (utf-8) of the table's
+                    TableRules.settings() & the name of its shuffle
+                    (shuffles.PRESETS) or null for a uniform shuffle
+        ROUND:      has seed (B), [seed (Q)], answers length (H),
+                    answers (space separated, utf-8)
+        CHECKPOINT: round (I), snapshot length (I), snapshot.dumps()
+        END:        answers length (H), answers
+
+A ROUND record holds the answers given from the end of the previous
+round (play again? buy in?) through the end of this one. Answers given
+before the table opened (players, buy ins, decks) are not logged; the
+first checkpoint already holds the table they set up. A shoe shuffled by
+a shuffles.Procedure depends on the shoe before it, which checkpoints
+keep (see snapshot.py). A checkpoint is the table at the end of its
+round, before play_again().
+"""
+
+__author__ = "Kyle Long"
+__email__ = "long.kyle@gmail.com"
+__date__ = "08/26/2019"
+__copyright__ = "Copyright 2019, Kyle Long"
+__python_version__ = "3.7.4"
+
+
+import json
+import struct
+import argparse
+from contextlib import contextmanager
+
+import blackjack as bj
+import shuffles
+import snapshot as snap
+
+MAGIC = b'BJLG'
+VERSION = 2
+
+HEADER = struct.Struct('<4sB')
+SEED = struct.Struct('<Q')
+LENGTH = struct.Struct('<H')
+CHECKPOINT = struct.Struct('<II')
+
+# record kinds
+ROUND = 1
+CHECKPOINT_RECORD = 2
+END = 3
+TABLE = 4
+
+
+class SessionRecorder():
+    """
+    Logs a live table through blackjack.emit() events.
+
+    args:
+        path (str):         log file, overwritten
+        every (int):        rounds between checkpoints
+    """
+
+    def __init__(self, path, every=100):
+        self.path = path
+        self.every = every
+        self.rounds = 0
+        self.seed = None
+        self.answers = []
+        self._file = None
+
+    def start(self):
+        self._file = open(self.path, 'wb')
+        self._file.write(HEADER.pack(MAGIC, VERSION))
+        bj.listeners.append(self.on_event)
+        return
+
+    def stop(self):
+        """
+        Log the answers given after the last round & close the log.
+        """
+        if self.on_event in bj.listeners:
+            bj.listeners.remove(self.on_event)
+        if self._file is not None:
+            answers = self._answers()
+            self._file.write(bytes([END]) + LENGTH.pack(len(answers)) +
+                             answers)
+            self._file.close()
+            self._file = None
+        return
+
+    def on_event(self, event, **data):
+        if event == 'table_open':
+            # setup answers are already part of the first checkpoint
+            self.answers = []
+            shuffler = data['deck'].shuffler
+            name = None
+            if shuffler is not None:
+                name = shuffler.name
+                if shuffles.PRESETS.get(name) is not shuffler:
+                    raise ValueError('only shuffles.PRESETS shuffles can '
+                                     'be recorded')
+            table = json.dumps({'rules': data['rules'].settings(),
+                                'shuffle': name}).encode('utf-8')
+            self._file.write(bytes([TABLE]) + LENGTH.pack(len(table)) +
+                             table)
+            self._checkpoint(data['players'], data['deck'])
+
+        elif event == 'prompt':
+            self.answers.append(str(data['answer']))
+
+        elif event == 'shuffle':
+            self.seed = data['seed']
+
+        elif event == 'round_end':
+            self.rounds += 1
+            record = [bytes([ROUND, self.seed is not None])]
+            if self.seed is not None:
+                record.append(SEED.pack(self.seed))
+            answers = self._answers()
+            record.append(LENGTH.pack(len(answers)))
+            record.append(answers)
+            self._file.write(b''.join(record))
+            self.seed = None
+
+            if self.rounds % self.every == 0:
+                self._checkpoint(data['players'], data['deck'])
+            # a crash mid session keeps every finished round
+            self._file.flush()
+
+        return
+
+    def _answers(self):
+        answers = ' '.join(self.answers).encode('utf-8')
+        self.answers = []
+        return answers
+
+    def _checkpoint(self, players, deck):
+        data = snap.dumps(players, deck, snap.BETWEEN_ROUNDS, hands=False)
+        self._file.write(bytes([CHECKPOINT_RECORD]) +
+                         CHECKPOINT.pack(self.rounds, len(data)) + data)
+        return
+
+
+class SessionLog():
+    """
+    Reads a SessionRecorder log & replays it.
+
+    args:
+        path (str):     log file
+        bots (dict):    gambler name -> Strategy() bot, for gamblers
+                        that were played by bots
+    """
+
+    def __init__(self, path, bots=None):
+        with open(path, 'rb') as f:
+            data = f.read()
+
+        magic, version = HEADER.unpack_from(data)
+        if magic != MAGIC:
+            raise ValueError('not a session log')
+        if version != VERSION:
+            raise ValueError(f'log version {version}, expected {VERSION}')
+
+        self.bots = bots or {}
+        self.rules = bj.RULES
+        self.shuffler = None
+        self.records = []
+        self.checkpoints = {}
+        # answers given after the last round (i.e. leaving the table)
+        self.end = None
+
+        offset = HEADER.size
+        while offset < len(data):
+            kind = data[offset]
+            offset += 1
+            if kind == ROUND:
+                seed = None
+                if data[offset]:
+                    seed, = SEED.unpack_from(data, offset + 1)
+                    offset += SEED.size
+                offset += 1
+                answers, offset = self._read_answers(data, offset)
+                self.records.append((seed, answers))
+            elif kind == CHECKPOINT_RECORD:
+                round_num, length = CHECKPOINT.unpack_from(data, offset)
+                offset += CHECKPOINT.size
+                self.checkpoints[round_num] = data[offset:offset + length]
+                offset += length
+            elif kind == TABLE:
+                length, = LENGTH.unpack_from(data, offset)
+                offset += LENGTH.size
+                table = json.loads(data[offset:offset + length])
+                self.rules = bj.TableRules(**table['rules'])
+                if table['shuffle'] is not None:
+                    self.shuffler = shuffles.PRESETS[table['shuffle']]
+                offset += length
+            elif kind == END:
+                self.end, offset = self._read_answers(data, offset)
+            else:
+                raise ValueError(f'unknown record kind {kind} at {offset - 1}')
+
+    @staticmethod
+    def _read_answers(data, offset):
+        length, = LENGTH.unpack_from(data, offset)
+        offset += LENGTH.size
+        answers = data[offset:offset + length].decode('utf-8').split()
+        return answers, offset + length
+
+    @property
+    def rounds(self):
+        return len(self.records)
+
+    def replay(self, start=1, stop=None, render=False):
+        """
+        Replay rounds start through stop (inclusive), jumping straight
+        to the nearest checkpoint before start.
+
+        args:
+            start (int):        first round returned
+            stop (int):         last round, defaults to the end of the log
+            render (bool):      print the rounds as a live table would
+                                (print_cards() etc.)
+
+        yields:
+            (dict):             round, dealer's cards & value, and each
+                                gambler's hands (cards, wager, value,
+                                winnings) & balance
+        """
+        stop = self.rounds if stop is None else min(stop, self.rounds)
+        players, deck = self.table(start - 1)
+
+        for round_num in range(start, stop + 1):
+            seed, answers = self.records[round_num - 1]
+            yield self._play(round_num, players, deck, seed, answers, render)
+
+        return
+
+    def table(self, round_num):
+        """
+        Rebuild the table at the end of a round (before play_again()),
+        replaying from the nearest checkpoint.
+
+        args:
+            round_num (int):    round, 0 for the table before the first
+
+        returns:
+            players (list):     list of all players
+            deck (class):       Deck() object
+        """
+        first = max(c for c in self.checkpoints if c <= round_num)
+        players, deck, _ = snap.loads(self.checkpoints[first])
+        deck.shuffler = self.shuffler
+        for player in players[:-1]:
+            player.strategy = self.bots.get(player.name)
+
+        for round_num in range(first + 1, round_num + 1):
+            seed, answers = self.records[round_num - 1]
+            self._play(round_num, players, deck, seed, answers, False)
+
+        return players, deck
+
+    def _play(self, round_num, players, deck, seed, answers, render):
+        """
+        Replay one round exactly as play() played it.
+        """
+        winnings = {}
+
+        def on_event(event, **data):
+            if event == 'settle':
+                winnings[id(data['hand'])] = data['winnings']
+            elif event == 'round_end':
+                summary.update(_summarize(players, winnings))
+
+        summary = {'round': round_num}
+        bj.input_queue.clear()
+        bj.input_queue.extend(answers)
+        bj.input_player = None
+        bj.listeners.append(on_event)
+        try:
+            with _replaying(round_num, render):
+                if round_num > 1:
+                    bj.play_again(players, deck)
+                if seed is not None:
+                    deck.cards = []
+                    deck.create()
+                    deck.shuffle(seed)
+                bj.play_round(players, deck, self.rules)
+        finally:
+            bj.listeners.remove(on_event)
+
+        if bj.input_queue:
+            unused = list(bj.input_queue)
+            bj.input_queue.clear()
+            raise ValueError(f'round {round_num} left answers unused: '
+                             f'{unused}')
+
+        return summary
+
+
+def _summarize(players, winnings):
+    dealer_hand = players[-1].hands[0]
+    gamblers = []
+    for gambler in players[:-1]:
+        hands = [{'cards': [_card_str(c) for c in hand.cards],
+                  'wager': hand.wager,
+                  'value': hand.final_value,
+                  'winnings': winnings.get(id(hand), 0)}
+                 for hand in gambler.hands]
+        gamblers.append({'name': gambler.name, 'hands': hands,
+                         'money': gambler.money})
+
+    return {'dealer': [_card_str(c) for c in dealer_hand.cards],
+            'dealer_value': dealer_hand.final_value,
+            'gamblers': gamblers}
+
+
+def _card_str(card):
+    return f'{card.rank} of {card.suit}'
+
+
+@contextmanager
+def _replaying(round_num, render):
+    """
+    Replay at full speed, silenced unless rendering. A prompt with no
+    logged answer means the log doesn't match the engine, so it raises
+    rather than waiting on input().
+    """
+    def no_input(question):
+        raise ValueError(f'round {round_num} ran out of logged answers '
+                         f'at: {question!r}')
+
+    delay = bj.DELAY
+    timeouts = dict(bj.TIMEOUTS)
+    bj.DELAY = 0
+    # timed out answers were logged like any other
+    bj.TIMEOUTS.update(dict.fromkeys(timeouts))
+    bj.input = no_input
+    try:
+        if render:
+            yield
+        else:
+            with bj.quiet():
+                yield
+    finally:
+        del bj.input
+        bj.DELAY = delay
+        bj.TIMEOUTS.update(timeouts)
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description='Record or replay a blackjack session')
+    parser.add_argument('log')
+    parser.add_argument('--record', action='store_true',
+                        help='play a live session & record it')
+    parser.add_argument('--every', type=int, default=100,
+                        help='rounds between checkpoints when recording')
+    parser.add_argument('--shuffle', default=None,
+                        choices=sorted(shuffles.PRESETS),
+                        help='shuffle the recorded shoe the way a dealer '
+                             'would')
+    parser.add_argument('--round', type=int, default=None,
+                        help='replay from this round')
+    parser.add_argument('--stop', type=int, default=None)
+    args = parser.parse_args()
+
+    if args.record:
+        recorder = SessionRecorder(args.log, args.every)
+        recorder.start()
+        try:
+            bj.run(shuffler=shuffles.PRESETS.get(args.shuffle))
+        finally:
+            recorder.stop()
+        return
+
+    log = SessionLog(args.log)
+    start = args.round or 1
+    stop = args.stop if args.stop is not None else args.round
+    for _ in log.replay(start, stop, render=True):
+        pass
+
+    return
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,311 @@
+#!/usr/bin/env python
+
+"""
+Monte Carlo rollouts for blackjack.py decisions
+
+From a decision point in play_hands(), the round is forked into many
+branches. Each branch plays the decision out with a policy, then plays
+the dealer's hand, and the results of every legal action are averaged.
+The legal actions, the dealer's play & the payouts all come from the
+table's rules (TableRules()), surrender included.
+
+Branches never copy the shoe or its Card() objects. The unseen cards
+are kept once as a shared tuple of values, and each Fork draws from it
+with a lazy Fisher-Yates shuffle that only records the positions it
+swapped (copy-on-write). All actions of a branch see the same cards
+(common random numbers), so their differences are sharp.
+
+Other gamblers' remaining decisions are not played out; the cards they
+would take are treated as unseen.
+"""
+
+__author__ = "Kyle Long"
+__email__ = "long.kyle@gmail.com"
+__date__ = "08/26/2019"
+__copyright__ = "Copyright 2019, Kyle Long"
+__python_version__ = "3.7.4"
+
+
+import math
+import random
+
+import blackjack as bj
+import kernel
+import strategy as st
+
+# the kernel's rules, called from plain Python
+_hand_total = kernel.python(kernel.hand_total)
+_dealer_stands = kernel.python(kernel.dealer_stands)
+
+
+class Fork():
+    """
+    One branch of a round. Cards are drawn without replacement from the
+    shared pool of unseen card values without copying it.
+
+    args:
+        pool (tuple):       values of all unseen cards (shared)
+        rng (class):        random.Random() object
+        hole (int):         dealer's hole card value if known
+        no_hole (int):      hole card value ruled out because the dealer
+                            already checked for blackjack
+    """
+    __slots__ = ('pool', 'remaining', 'swapped', 'drawn', 'rng', 'hole')
+
+    def __init__(self, pool, rng, hole=None, no_hole=None):
+        self.pool = pool
+        self.remaining = len(pool)
+        self.swapped = {}
+        self.drawn = []
+        self.rng = rng
+
+        if hole is None:
+            # rejection sample the hole card, then remove it from the pool
+            while True:
+                r = int(rng.random() * self.remaining)
+                if pool[r] != no_hole:
+                    break
+            self.hole = self._take(r)
+        else:
+            self.hole = hole
+
+    def _take(self, r):
+        m = self.remaining - 1
+        swapped = self.swapped
+        value = swapped.get(r, self.pool[r])
+        swapped[r] = swapped.get(m, self.pool[m])
+        self.remaining = m
+        return value
+
+    def card(self, i):
+        """
+        args:
+            i (int):    position of the card in this branch's draw order
+
+        returns:
+            (int):      card value
+        """
+        drawn = self.drawn
+        while len(drawn) <= i:
+            drawn.append(self._take(int(self.rng.random() * self.remaining)))
+        return drawn[i]
+
+
+def _play_hand(fork, cursor, total, aces, pair, dealer, options,
+               policy, action, splits, can_double, rules):
+    """
+    Play one hand of a branch to completion. Split hands are offered
+    what play_hands() would offer them: a double only if can_double (the
+    gambler has the money) & the rules double after a split, a resplit
+    only while the rules allow another.
+
+    args:
+        splits (int):   splits the gambler has made this round
+
+    returns:
+        hands (list):   (final total, wager multiple, blackjack) of each
+                        hand the hand ended up as (more than one on
+                        splits). A surrender is a bust of half the wager
+        cursor (int):   next card position in the fork
+    """
+    first = True
+    while True:
+        best, soft = _hand_total(total, aces)
+        if best > 21:
+            return [(best, 1, False)], cursor
+
+        if action is None:
+            if not first:
+                options = [st.STAY, st.HIT]
+            action = policy(best, soft, dealer, options,
+                            pair if first else None)
+
+        if action == st.STAY:
+            return [(best, 1, False)], cursor
+
+        # a surrendered hand loses half its wager whatever the dealer
+        # has, so it's settled like a bust of half the wager
+        if action == st.SURRENDER:
+            return [(22, 0.5, False)], cursor
+
+        if action == st.DOUBLE_DOWN:
+            card = fork.card(cursor)
+            best, soft = _hand_total(total + card, aces or card == 1)
+            return [(best, 2, False)], cursor + 1
+
+        if action == st.SPLIT:
+            # like play_hands(), both hands get their second card first
+            cards = (fork.card(cursor), fork.card(cursor + 1))
+            cursor += 2
+            splits += 1
+            hands = []
+            for card in cards:
+                split_total = pair + card
+                split_aces = pair == 1 or card == 1
+                split_best = _hand_total(split_total, split_aces)[0]
+
+                # split hands are new hands, so 2 card 21 is a blackjack
+                if split_best == 21:
+                    hands.append((21, 1, True))
+                    continue
+                if pair == 1 and not rules.hit_split_aces:
+                    hands.append((split_best, 1, False))
+                    continue
+
+                split_options = [st.STAY, st.HIT]
+                if can_double and rules.double_after_split:
+                    split_options.append(st.DOUBLE_DOWN)
+                split_pair = None
+                if card == pair and splits < rules.max_splits and \
+                        (pair != 1 or rules.resplit_aces):
+                    split_options.append(st.SPLIT)
+                    split_pair = pair
+
+                played, cursor = _play_hand(fork, cursor, split_total,
+                                            split_aces, split_pair, dealer,
+                                            split_options, policy, None,
+                                            splits, can_double, rules)
+                hands.extend(played)
+                splits += len(played) - 1
+            return hands, cursor
+
+        # hit
+        card = fork.card(cursor)
+        cursor += 1
+        total += card
+        aces = aces or card == 1
+        first = False
+        action = None
+
+
+def _play_dealer(fork, cursor, upcard, stand_soft):
+    """
+    Dealer plays by the table's rules, like play_dealer_hand().
+
+    returns:
+        (int):      dealer's final total
+    """
+    total = upcard + fork.hole
+    aces = upcard == 1 or fork.hole == 1
+    while True:
+        best, soft = _hand_total(total, aces)
+        if _dealer_stands(best, soft, stand_soft):
+            return best
+        card = fork.card(cursor)
+        cursor += 1
+        total += card
+        aces = aces or card == 1
+
+
+def _result(hands, dealer_total, blackjack_pays):
+    """
+    Net result in units of the hand's wager, settled like
+    determine_winners() & hand_result().
+    """
+    result = 0
+    for total, multiple, blackjack in hands:
+        if blackjack:
+            result += blackjack_pays
+        elif total > 21:
+            result -= multiple
+        elif dealer_total > 21 or total > dealer_total:
+            result += multiple
+        elif total < dealer_total:
+            result -= multiple
+    return result
+
+
+def evaluate(players, deck, player, hand, rollouts=10000,
+             policy=st.basic_action, hole_known=False, seed=None,
+             rules=bj.RULES):
+    """
+    Estimate the expected result of each legal action for a hand at a
+    decision point in play_hands().
+
+    args:
+        players (list):     list of all players
+        deck (class):       Deck() object
+        player (class):     Gambler() object who owns the hand
+        hand (class):       Hand() object being decided
+        rollouts (int):     branches played for every action
+        policy (function):  plays the rest of the hand, with the same
+                            arguments as strategy.basic_action()
+        hole_known (bool):  use the dealer's actual hole card instead of
+                            treating it as unseen
+        seed (int):         optional seed for repeatable rollouts
+        rules (class):      TableRules() the table plays by
+
+    returns:
+        (dict):             action -> (mean result in units of the
+                            hand's wager, standard error)
+    """
+    dealer_cards = players[-1].hands[0].cards
+    upcard = dealer_cards[1].value
+    hole = dealer_cards[0].value
+
+    pool = tuple(card.value for card in deck.cards)
+    no_hole = None
+    if hole_known:
+        fixed_hole = hole
+    else:
+        fixed_hole = None
+        pool += (hole,)
+        # the dealer already checked for blackjack
+        no_hole = {1: 10, 10: 1}.get(upcard)
+
+    # the actions play_hands() offers
+    options = [st.STAY, st.HIT]
+    pair = None
+    splits = len(player.hands) - 1
+    can_double = player.money >= hand.wager * 2
+    if hand.first_iter:
+        if can_double and (not splits or rules.double_after_split):
+            options.append(st.DOUBLE_DOWN)
+        if hand.cards[0].rank == hand.cards[1].rank and \
+                rules.can_split(hand.cards[0].rank, splits):
+            options.append(st.SPLIT)
+            pair = hand.cards[0].value
+        if rules.late_surrender and not splits:
+            options.append(st.SURRENDER)
+
+    total = sum(card.value for card in hand.cards)
+    aces = any(card.value == 1 for card in hand.cards)
+
+    stand_soft = rules.stand_values[1]
+    blackjack_pays = rules.blackjack_cents / 100
+    rng = random.Random(seed)
+    sums = dict.fromkeys(options, 0.0)
+    squares = dict.fromkeys(options, 0.0)
+    for _ in range(rollouts):
+        fork = Fork(pool, rng, fixed_hole, no_hole)
+        for action in options:
+            hands, cursor = _play_hand(fork, 0, total, aces, pair, upcard,
+                                       options, policy, action, splits,
+                                       can_double, rules)
+            if all(t > 21 for t, m, blackjack in hands):
+                dealer_total = 0
+            else:
+                dealer_total = _play_dealer(fork, cursor, upcard,
+                                            stand_soft)
+            result = _result(hands, dealer_total, blackjack_pays)
+            sums[action] += result
+            squares[action] += result * result
+
+    results = {}
+    for action in options:
+        mean = sums[action] / rollouts
+        variance = max(squares[action] / rollouts - mean * mean, 0)
+        results[action] = (mean, math.sqrt(variance / rollouts))
+
+    return results
+
+
+def best_action(results):
+    """
+    args:
+        results (dict):     output of evaluate()
+
+    returns:
+        (str):              action with the highest mean result
+    """
+    return max(results, key=lambda action: results[action][0])
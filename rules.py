@@ -0,0 +1,148 @@
+#!/usr/bin/env python
+
+"""
+Table rule variants for blackjack.py
+
+A TableRules object is built once per rule set. Everything the engine
+needs is worked out up front (the dealer's stand totals, payouts, the
+reshuffle point per shoe size, which actions are offered to a split
+hand), so playing a round only looks values up instead of checking
+rules card by card.
+"""
+
+__author__ = "Kyle Long"
+__email__ = "long.kyle@gmail.com"
+__date__ = "08/26/2019"
+__copyright__ = "Copyright 2019, Kyle Long"
+__python_version__ = "3.7.4"
+
+
+# cards always left in the shoe when a round starts, so the round can't
+# run it dry however the cut card is placed: a base plus a few cards for
+# every seat at the table (dealer included). A full table of 5 rarely
+# takes more than 32 cards in a round, & a heads up round 16
+RESERVE_CARDS = 12
+RESERVE_PER_SEAT = 5
+
+
+class TableRules():
+    """
+    args:
+        hit_soft_17 (bool):         dealer hits a soft 17 (H17), otherwise
+                                    stands on all 17s (S17)
+        blackjack_pays (float):     blackjack payout, 1.5 for 3:2 or 1.2
+                                    for 6:5 (to the cent per dollar)
+        late_surrender (bool):      surrender the first 2 cards for half
+                                    the wager once the dealer has checked
+                                    for blackjack
+        double_after_split (bool):  split hands may double down
+        max_hands (int):            most hands a gambler can split to,
+                                    None for unlimited resplits
+        resplit_aces (bool):        split Aces may be split again
+        hit_split_aces (bool):      split Aces are played out, otherwise
+                                    they get one card each
+        insurance (bool):           insurance is offered on a dealer Ace
+        insurance_bet (float):      insurance bet, as a fraction of the
+                                    wager
+        penetration (float):        fraction of the shoe dealt before a
+                                    reshuffle
+    """
+
+    def __init__(self, hit_soft_17=True, blackjack_pays=1.5,
+                 late_surrender=False, double_after_split=True,
+                 max_hands=None, resplit_aces=True, hit_split_aces=True,
+                 insurance=True, insurance_bet=0.5, penetration=0.5):
+        if blackjack_pays <= 0:
+            raise ValueError('blackjack_pays must be positive')
+        if max_hands is not None and max_hands < 1:
+            raise ValueError('max_hands must be at least 1')
+        if not 0 < penetration < 1:
+            raise ValueError('penetration must be between 0 & 1')
+
+        self.hit_soft_17 = hit_soft_17
+        self.blackjack_pays = blackjack_pays
+        self.late_surrender = late_surrender
+        self.double_after_split = double_after_split
+        self.max_hands = max_hands
+        self.resplit_aces = resplit_aces
+        self.hit_split_aces = hit_split_aces
+        self.insurance = insurance
+        self.insurance_bet = insurance_bet
+        self.penetration = penetration
+
+        # payouts in cents per dollar wagered, so settling is integer math
+        self.blackjack_cents = round(blackjack_pays * 100)
+        self.insurance_cents = round(insurance_bet * 100)
+
+        # dealer stands at or above stand_values[soft]
+        self.stand_values = (17, 18 if hit_soft_17 else 17)
+
+        # most splits, so the split check is a single comparison
+        self.max_splits = float('inf') if max_hands is None \
+            else max_hands - 1
+
+        self._reshuffle_at = {}
+
+    def reshuffle_at(self, num_decks, seats=2):
+        """
+        args:
+            num_decks (int):    number of decks in the shoe
+            seats (int):        players at the table, dealer included
+
+        returns:
+            (float):            reshuffle once fewer cards than this are
+                                left in the shoe: at the cut card, or
+                                sooner if the cut card leaves less than
+                                the reserve a round at the table needs
+        """
+        cards = self._reshuffle_at.get((num_decks, seats))
+        if cards is None:
+            cards = max(52 * num_decks * (1 - self.penetration),
+                        RESERVE_CARDS + RESERVE_PER_SEAT * seats)
+            self._reshuffle_at[num_decks, seats] = cards
+        return cards
+
+    def can_split(self, rank, splits):
+        """
+        args:
+            rank (str):     rank of the pair
+            splits (int):   times the gambler has already split this round
+
+        returns:
+            (bool):         True if the pair may be split
+        """
+        if splits >= self.max_splits:
+            return False
+        return splits == 0 or rank != 'Ace' or self.resplit_aces
+
+    def settings(self):
+        """
+        returns:
+            (dict):     the arguments the rules were built with, so
+                        TableRules(**rules.settings()) is the same table
+        """
+        return {name: value for name, value in vars(self).items()
+                if not name.startswith('_') and
+                name not in ('stand_values', 'max_splits',
+                             'blackjack_cents', 'insurance_cents')}
+
+    def __repr__(self):
+        fields = ', '.join(f'{name}={value!r}'
+                           for name, value in self.settings().items())
+        return f'TableRules({fields})'
+
+
+# a few common rule sets
+PRESETS = {
+    'default': TableRules(),
+    'vegas_strip': TableRules(hit_soft_17=False, late_surrender=True,
+                              max_hands=4, resplit_aces=False,
+                              hit_split_aces=False, penetration=0.75),
+    'downtown': TableRules(max_hands=4, resplit_aces=False,
+                           hit_split_aces=False, penetration=0.75),
+    'six_to_five': TableRules(blackjack_pays=1.2, max_hands=4,
+                              hit_split_aces=False),
+    'european': TableRules(hit_soft_17=False, double_after_split=False,
+                           max_hands=2, hit_split_aces=False,
+                           penetration=0.6),
+}
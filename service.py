@@ -0,0 +1,481 @@
+#!/usr/bin/env python
+
+"""
+Local HTTP/JSON strategy service for blackjack.py
+
+Answers two kinds of queries for front-ends & bots that shouldn't embed
+the solver themselves:
+
+- action:   expected value of every legal action for a hand against a
+            dealer upcard, & the best one
+- dealer:   probabilities of the dealer finishing on 17-21, busting or
+            having blackjack
+
+POST /query takes a single query object, or a list of them answered in
+one call. GET /stats reports the cache. Answers are cached in a shared
+LRU cache keyed by the canonical form of the query. A query whose shoe
+can't cover the dealer's draws, or whose options aren't legal for the
+hand, gets a 400.
+
+Card values follow Card.value (Ace is 1, tens & faces are 10). A shoe
+composition is the count of each value left in the shoe, Aces first:
+[aces, twos, ..., nines, tens]. Without one, a full shoe less the cards
+on the table is used.
+
+Answers follow the service's TableRules: the dealer's hand is solved
+exactly for the composition (with the kernel's stand check, like
+play_dealer_hand()), and blackjack payouts, surrender, doubling after a
+split & one card split Aces are the table's. The player's draws use the
+composition at the decision point without removing each card drawn, and
+split hands are played out once (no resplits). Like the engine, a 2 card
+21 after a split pays as a blackjack, and a dealer with an Ace or ten up
+has already checked for blackjack. Queries only carry card values, so a
+split is offered for any two cards of the same value (i.e. a Ten & a
+King) where the engine (TableRules.can_split()) only splits the same
+rank; pass options to ask about a hand the engine can't split.
+"""
+
+__author__ = "Kyle Long"
+__email__ = "long.kyle@gmail.com"
+__date__ = "08/26/2019"
+__copyright__ = "Copyright 2019, Kyle Long"
+__python_version__ = "3.7.4"
+
+
+import json
+import argparse
+import threading
+from functools import lru_cache
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import blackjack as bj
+import kernel
+import strategy as st
+from rules import PRESETS
+
+# dealer outcomes, in the order _dealer() returns them
+OUTCOMES = ('17', '18', '19', '20', '21', 'bust')
+
+# most queries in a single batch
+MAX_BATCH = 1000
+
+
+def full_shoe(num_decks=6):
+    """
+    returns:
+        (tuple):    count of each value (Ace first) in a full shoe
+    """
+    return (4 * num_decks,) * 9 + (16 * num_decks,)
+
+
+# the kernel's rules, called from plain Python
+_hand_total = kernel.python(kernel.hand_total)
+_dealer_stands = kernel.python(kernel.dealer_stands)
+
+
+def _remove(counts, values):
+    counts = list(counts)
+    for value in values:
+        if not counts[value - 1]:
+            raise ValueError(f'no {value} left in the shoe')
+        counts[value - 1] -= 1
+    return tuple(counts)
+
+
+@lru_cache(maxsize=1 << 16)
+def _dealer(total, aces, counts, stand_soft):
+    """
+    Outcome probabilities of a dealer hand, drawing without replacement.
+
+    args:
+        stand_soft (int):   soft total the dealer stands on
+                            (TableRules.stand_values)
+
+    returns:
+        (tuple):    probability of each of OUTCOMES
+    """
+    best, soft = _hand_total(total, aces)
+    if best > 21:
+        return (0.0,) * 5 + (1.0,)
+    if _dealer_stands(best, soft, stand_soft):
+        return tuple(float(best == 17 + i) for i in range(5)) + (0.0,)
+
+    cards = sum(counts)
+    if not cards:
+        raise ValueError('the shoe runs out before the dealer finishes')
+    probs = [0.0] * 6
+    for value in range(1, 11):
+        count = counts[value - 1]
+        if not count:
+            continue
+        sub = _dealer(total + value, aces or value == 1,
+                      counts[:value - 1] + (count - 1,) + counts[value:],
+                      stand_soft)
+        weight = count / cards
+        for i in range(6):
+            probs[i] += weight * sub[i]
+
+    return tuple(probs)
+
+
+def dealer_probabilities(upcard, shoe=None, num_decks=6, peek=True,
+                         rules=bj.RULES):
+    """
+    args:
+        upcard (int):       dealer's upcard value
+        shoe (list):        count of each value left in the shoe, the
+                            hole card is drawn from it
+        num_decks (int):    shoe size when no composition is given
+        peek (bool):        the dealer already checked for blackjack
+        rules (class):      TableRules() the dealer plays by
+
+    returns:
+        (dict):             probability of each of OUTCOMES & 'blackjack'
+    """
+    counts = tuple(shoe) if shoe is not None else \
+        _remove(full_shoe(num_decks), [upcard])
+
+    # a hole card that would make blackjack is ruled out by the peek
+    natural = {1: 10, 10: 1}.get(upcard)
+    cards = sum(counts)
+    if peek and natural:
+        cards -= counts[natural - 1]
+    if not cards:
+        raise ValueError('the shoe has no hole card for the dealer')
+
+    probs = [0.0] * 6
+    blackjack = 0.0
+    for hole in range(1, 11):
+        count = counts[hole - 1]
+        if not count:
+            continue
+        if hole == natural:
+            if not peek:
+                blackjack += count / cards
+            continue
+        sub = _dealer(upcard + hole, upcard == 1 or hole == 1,
+                      _remove(counts, [hole]), rules.stand_values[1])
+        for i in range(6):
+            probs[i] += count / cards * sub[i]
+
+    results = dict(zip(OUTCOMES, probs))
+    results['blackjack'] = blackjack
+    return results
+
+
+def action_values(cards, upcard, shoe=None, num_decks=6, options=None,
+                  rules=bj.RULES):
+    """
+    Expected value of each legal action, in units of the hand's wager.
+
+    args:
+        cards (list):       values of the hand's cards
+        upcard (int):       dealer's upcard value
+        shoe (list):        count of each value left in the shoe
+        num_decks (int):    shoe size when no composition is given
+        options (list):     legal actions, defaults to every action the
+                            cards & rules allow (a split for any two
+                            cards of the same value, unlike the engine's
+                            same rank)
+        rules (class):      TableRules() of the table
+
+    returns:
+        (dict):             action -> expected value
+    """
+    counts = tuple(shoe) if shoe is not None else \
+        _remove(full_shoe(num_decks), list(cards) + [upcard])
+
+    if options is None:
+        options = legal_options(cards, rules)
+
+    dealer = dealer_probabilities(upcard, counts, rules=rules)
+    totals = [dealer[o] for o in OUTCOMES[:5]]
+    bust = dealer['bust']
+    draws = [(value, counts[value - 1] / sum(counts))
+             for value in range(1, 11) if counts[value - 1]]
+
+    def stand(total):
+        if total > 21:
+            return -1.0
+        ev = bust
+        for i, p in enumerate(totals):
+            dealer_total = 17 + i
+            if total > dealer_total:
+                ev += p
+            elif total < dealer_total:
+                ev -= p
+        return ev
+
+    memo = {}
+
+    def play(total, aces):
+        """
+        Best of stand & hit for a hand that can no longer double.
+        """
+        key = (total, aces)
+        if key not in memo:
+            best = _hand_total(total, aces)[0]
+            if best > 21:
+                memo[key] = -1.0
+            else:
+                memo[key] = max(stand(best), hit(total, aces))
+        return memo[key]
+
+    def hit(total, aces):
+        return sum(p * play(total + v, aces or v == 1) for v, p in draws)
+
+    def double(total, aces):
+        return 2 * sum(p * stand(_hand_total(total + v, aces or v == 1)[0])
+                       for v, p in draws)
+
+    blackjack_pays = rules.blackjack_cents / 100
+
+    total = sum(cards)
+    aces = 1 in cards
+    values = {}
+    for action in options:
+        if action == st.STAY:
+            values[action] = stand(_hand_total(total, aces)[0])
+        elif action == st.HIT:
+            values[action] = hit(total, aces)
+        elif action == st.DOUBLE_DOWN:
+            values[action] = double(total, aces)
+        elif action == st.SURRENDER:
+            values[action] = -0.5
+        elif action == st.SPLIT:
+            pair = cards[0]
+            hand = 0.0
+            for v, p in draws:
+                split_total, split_aces = pair + v, pair == 1 or v == 1
+                best = _hand_total(split_total, split_aces)[0]
+                if best == 21:
+                    hand += p * blackjack_pays
+                elif pair == 1 and not rules.hit_split_aces:
+                    hand += p * stand(best)
+                elif rules.double_after_split:
+                    hand += p * max(play(split_total, split_aces),
+                                    double(split_total, split_aces))
+                else:
+                    hand += p * play(split_total, split_aces)
+            values[action] = 2 * hand
+
+    return values
+
+
+def legal_options(cards, rules=bj.RULES):
+    """
+    args:
+        cards (list):       values of the hand's cards
+        rules (class):      TableRules() of the table
+
+    returns:
+        (list):             every action the cards & rules allow before
+                            any split
+    """
+    options = [st.STAY, st.HIT]
+    if len(cards) == 2:
+        options.append(st.DOUBLE_DOWN)
+        if cards[0] == cards[1] and rules.max_splits >= 1:
+            options.append(st.SPLIT)
+        if rules.late_surrender:
+            options.append(st.SURRENDER)
+    return options
+
+
+class StrategyService():
+    """
+    Serves strategy queries on localhost from a daemon thread.
+
+    args:
+        host (str):         address to bind
+        port (int):         port to bind, 0 picks a free port
+        cache_size (int):   answers kept in the LRU cache
+        num_decks (int):    shoe size for queries without a composition
+        rules (class):      TableRules() every answer is for
+    """
+
+    def __init__(self, host='127.0.0.1', port=8421, cache_size=100000,
+                 num_decks=6, rules=bj.RULES):
+        self.num_decks = num_decks
+        self.rules = rules
+        self.answer = lru_cache(maxsize=cache_size)(self._answer)
+        service = self
+
+        class Handler(BaseHTTPRequestHandler):
+            # keep connections open so clients aren't paying for a
+            # handshake on every request, & don't hold small replies
+            # back waiting for an ACK
+            protocol_version = 'HTTP/1.1'
+            disable_nagle_algorithm = True
+
+            def do_GET(self):
+                if self.path != '/stats':
+                    self.send_error(404)
+                    return
+                self._reply(200, service.stats())
+
+            def do_POST(self):
+                if self.path != '/query':
+                    self.send_error(404)
+                    return
+                length = int(self.headers.get('Content-Length', 0))
+                try:
+                    body = json.loads(self.rfile.read(length))
+                    self._reply(200, service.query(body))
+                except (ValueError, TypeError, KeyError) as e:
+                    self._reply(400, {'error': str(e)})
+
+            def _reply(self, status, data):
+                body = json.dumps(data).encode('utf-8')
+                self.send_response(status)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                return
+
+        self.server = ThreadingHTTPServer((host, port), Handler)
+        self.server.daemon_threads = True
+        self.port = self.server.server_address[1]
+        self._thread = None
+
+    def start(self):
+        self._thread = threading.Thread(target=self.server.serve_forever,
+                                        daemon=True)
+        self._thread.start()
+        return
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+        return
+
+    def query(self, body):
+        """
+        args:
+            body (dict):    a query, or a list of queries
+
+        returns:
+            answer, or list of answers in the same order
+        """
+        if isinstance(body, list):
+            if len(body) > MAX_BATCH:
+                raise ValueError(f'more than {MAX_BATCH} queries')
+            return [self.query_one(q) for q in body]
+        return self.query_one(body)
+
+    def query_one(self, query):
+        """
+        Canonicalize a query so equivalent queries share a cache entry.
+
+        args:
+            query (dict):   type ('action' or 'dealer'), upcard, cards,
+                            optional shoe & options
+
+        returns:
+            (dict):         the answer
+        """
+        if not isinstance(query, dict):
+            raise ValueError('a query must be a JSON object')
+        kind = query.get('type', 'action')
+        upcard = _value(query['upcard'])
+        shoe = query.get('shoe')
+        if shoe is not None:
+            if not isinstance(shoe, list):
+                raise ValueError('shoe must be a list of 10 counts')
+            shoe = tuple(int(c) for c in shoe)
+            if len(shoe) != 10 or min(shoe) < 0:
+                raise ValueError('shoe must be 10 counts, Aces first')
+            if not sum(shoe):
+                raise ValueError('shoe has no cards left')
+
+        if kind == 'dealer':
+            return self.answer('dealer', (), upcard, shoe,
+                               bool(query.get('peek', True)))
+        if kind != 'action':
+            raise ValueError(f'unknown query type {kind!r}')
+
+        cards = [_value(c) for c in query['cards']]
+        if len(cards) < 2:
+            raise ValueError('a hand has at least 2 cards')
+        # order doesn't matter past the pair check
+        cards = tuple(cards) if len(cards) == 2 else tuple(sorted(cards))
+        options = query.get('options')
+        if options is not None:
+            if not isinstance(options, list) or not options:
+                raise ValueError('options must be a non-empty list')
+            illegal = set(options) - set(legal_options(cards, self.rules))
+            if illegal:
+                raise ValueError(f'options {sorted(illegal)} are not legal '
+                                 f'for this hand')
+            options = tuple(sorted(set(options)))
+
+        return self.answer('action', cards, upcard, shoe, options)
+
+    def _answer(self, kind, cards, upcard, shoe, extra):
+        if kind == 'dealer':
+            return dealer_probabilities(upcard, shoe, self.num_decks,
+                                        peek=extra, rules=self.rules)
+
+        if _hand_total(sum(cards), 1 in cards)[0] == 21 and len(cards) == 2:
+            return {'action': st.STAY,
+                    'ev': {st.STAY: self.rules.blackjack_cents / 100}}
+
+        values = action_values(list(cards), upcard, shoe, self.num_decks,
+                               None if extra is None else list(extra),
+                               self.rules)
+        return {'action': max(values, key=values.get), 'ev': values}
+
+    def stats(self):
+        """
+        returns:
+            (dict):     LRU cache hits, misses & size
+        """
+        info = self.answer.cache_info()
+        return {'hits': info.hits, 'misses': info.misses,
+                'size': info.currsize, 'max_size': info.maxsize}
+
+
+def _value(card):
+    """
+    args:
+        card:       card value (1-10), or 'A'
+
+    returns:
+        (int):      card value
+    """
+    if card in ('A', 'a'):
+        return 1
+    value = int(card)
+    if not 1 <= value <= 10:
+        raise ValueError(f'card value {card!r} not between 1 & 10')
+    return value
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Strategy service')
+    parser.add_argument('--port', type=int, default=8421)
+    parser.add_argument('--decks', type=int, default=6)
+    parser.add_argument('--cache', type=int, default=100000)
+    parser.add_argument('--rules', default='default',
+                        choices=sorted(PRESETS))
+    args = parser.parse_args()
+
+    service = StrategyService(port=args.port, cache_size=args.cache,
+                              num_decks=args.decks,
+                              rules=PRESETS[args.rules])
+    print(f'Serving on http://127.0.0.1:{service.port}/query')
+    try:
+        service.server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        service.server.server_close()
+
+    return
+
+
+if __name__ == "__main__":
+    main()
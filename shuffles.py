@@ -0,0 +1,626 @@
+#!/usr/bin/env python
+
+"""
+Physical shuffle models for blackjack.py
+
+Deck.shuffle() is an ideal uniform shuffle by default. A Procedure is a
+sequence of the shuffles a dealer actually does (GSR riffles, strip cuts,
+grab & riffle passes over a shoe, a final cut) and can be handed to
+Deck(shuffler=...) or to corpus.write_corpus(). A shoe shuffled this way
+starts from the previous shoe's discards, so some of its order survives
+the reshuffle; survival() measures how much.
+
+Every step works on plain lists (bottom card first, the next card dealt
+last) with a random.Random() passed in, so a seed replays the same shoe.
+With numpy installed, every step also has a batched version working on a
+(shoes x cards) array with a numpy Generator, which shoe_orders() uses to
+shuffle thousands of shoes at once.
+"""
+
+__author__ = "Kyle Long"
+__email__ = "long.kyle@gmail.com"
+__date__ = "08/26/2019"
+__copyright__ = "Copyright 2019, Kyle Long"
+__python_version__ = "3.7.4"
+
+
+import time
+import random
+import argparse
+from functools import partial
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+# shoes shuffled side by side by shoe_orders()
+STREAMS = 1024
+
+
+def uniform(items, rng):
+    """
+    Ideal shuffle, every order equally likely.
+
+    args:
+        items (list):   cards, bottom first
+        rng (class):    random.Random() object
+
+    returns:
+        (list):         shuffled cards
+    """
+    items = list(items)
+    rng.shuffle(items)
+    return items
+
+
+def riffle(items, rng):
+    """
+    Gilbert-Shannon-Reeds riffle: the cut is binomial & every interleaving
+    of the two packets is equally likely. Both come from one n bit random
+    number (bit i says which packet card i falls from), so no per card
+    draws are needed.
+
+    args:
+        items (list):   cards, bottom first
+        rng (class):    random.Random() object
+
+    returns:
+        (list):         riffled cards
+    """
+    n = len(items)
+    if n < 2:
+        return list(items)
+    mask = format(rng.getrandbits(n), f'0{n}b')
+    cut = mask.count('0')
+    left = iter(items[:cut])
+    right = iter(items[cut:])
+    return [next(left) if bit == '0' else next(right) for bit in mask]
+
+
+def strip(items, rng, packets=5):
+    """
+    Strip cut: packets are pulled off the top onto a new pile, which
+    reverses the order of the packets but not the cards inside them.
+    Packet sizes vary by up to half a packet.
+
+    args:
+        items (list):   cards, bottom first
+        rng (class):    random.Random() object
+        packets (int):  number of packets
+
+    returns:
+        (list):         stripped cards
+    """
+    n = len(items)
+    size = n / packets
+    cuts = [0]
+    for i in range(1, packets):
+        cut = round(i * size + rng.uniform(-size, size) / 4)
+        cuts.append(min(max(cut, cuts[-1]), n))
+    cuts.append(n)
+
+    result = []
+    for i in range(packets, 0, -1):
+        result.extend(items[cuts[i - 1]:cuts[i]])
+    return result
+
+
+def cut(items, rng, low=0.25, high=0.75):
+    """
+    Cut the cards once, somewhere between low & high of the way down.
+
+    args:
+        items (list):   cards, bottom first
+        rng (class):    random.Random() object
+        low (float):    shallowest cut, as a fraction of the cards
+        high (float):   deepest cut, as a fraction of the cards
+
+    returns:
+        (list):         cut cards
+    """
+    n = len(items)
+    k = rng.randint(int(n * low), int(n * high)) if n else 0
+    return items[k:] + items[:k]
+
+
+def grab_riffle(items, rng, grab=52, riffles=1):
+    """
+    Shoe shuffle: the stack is split in two, then a grab of about one deck
+    (give or take an eighth, evenly either way) is taken off the top of
+    each half, riffled together & dropped on the new stack until both
+    halves are used up.
+
+    args:
+        items (list):   cards, bottom first
+        rng (class):    random.Random() object
+        grab (int):     cards taken from each half at a time
+        riffles (int):  riffles given to each pair of grabs
+
+    returns:
+        (list):         shuffled cards
+    """
+    half = len(items) // 2
+    left = items[:half]
+    right = items[half:]
+    spread = grab // 8
+
+    result = []
+    while left or right:
+        size = max(1, grab + rng.randint(-spread, spread))
+        cards = left[-size:] + right[-size:]
+        del left[-size:]
+        del right[-size:]
+        for _ in range(riffles):
+            cards = riffle(cards, rng)
+        result.extend(cards)
+    return result
+
+
+def uniform_batch(orders, rng):
+    """
+    uniform() for many shoes at once.
+
+    args:
+        orders (array):     (shoes x cards) cards, bottom first
+        rng (class):        numpy.random.Generator() object
+
+    returns:
+        (array):            shuffled cards
+    """
+    return rng.permuted(orders, axis=1)
+
+
+def _take(orders, source):
+    """
+    args:
+        orders (array):     (shoes x cards) cards
+        source (array):     (shoes x cards) index each card comes from
+
+    returns:
+        (array):            orders[row, source[row]] of every row
+    """
+    rows, n = orders.shape
+    flat = source + np.arange(rows)[:, None] * n
+    return orders.ravel()[flat]
+
+
+def _put(orders, target):
+    """
+    args:
+        orders (array):     (shoes x cards) cards
+        target (array):     (shoes x cards) index each card goes to
+
+    returns:
+        (array):            cards moved to their targets in every row
+    """
+    rows, n = orders.shape
+    result = np.empty_like(orders)
+    flat = target + np.arange(rows)[:, None] * n
+    result.ravel()[flat.ravel()] = orders.ravel()
+    return result
+
+
+def _counts(marks, width):
+    """
+    args:
+        marks (array):      (shoes x k) marks from 0 to width
+        width (int):        positions in a row
+
+    returns:
+        (array):            (shoes x width) marks at or below each
+                            position of each row
+    """
+    rows = len(marks)
+    flat = marks + np.arange(0, rows * (width + 1), width + 1)[:, None]
+    counts = np.bincount(flat.ravel(), minlength=rows * (width + 1))
+    return np.cumsum(counts.reshape(rows, width + 1)[:, :width], axis=1,
+                     dtype=np.int16)
+
+
+def _riffle_segments(orders, rng, segment):
+    """
+    GSR riffle of every run of positions with the same segment number,
+    in every row at once. The cards of a segment go, in order, first to
+    its positions whose random bit is clear (the left packet) & then to
+    the rest, which a stable sort of the positions by (segment, bit)
+    lists in one pass.
+
+    args:
+        orders (array):     (shoes x cards) cards, bottom first
+        rng (class):        numpy.random.Generator() object
+        segment (array):    (shoes x cards) int16 segment of each
+                            position, not decreasing along a row
+
+    returns:
+        (array):            riffled cards
+    """
+    right = rng.integers(0, 2, size=orders.shape, dtype=np.int16)
+    target = np.argsort(segment * 2 + right, axis=1, kind='stable')
+    return _put(orders, target)
+
+
+def riffle_batch(orders, rng):
+    """
+    riffle() for many shoes at once.
+
+    args:
+        orders (array):     (shoes x cards) cards, bottom first
+        rng (class):        numpy.random.Generator() object
+
+    returns:
+        (array):            riffled cards
+    """
+    return _riffle_segments(orders, rng,
+                            np.zeros(orders.shape, dtype=np.int16))
+
+
+def strip_batch(orders, rng, packets=5):
+    """
+    strip() for many shoes at once.
+
+    args:
+        orders (array):     (shoes x cards) cards, bottom first
+        rng (class):        numpy.random.Generator() object
+        packets (int):      number of packets
+
+    returns:
+        (array):            stripped cards
+    """
+    rows, n = orders.shape
+    size = n / packets
+    jitter = rng.uniform(-size, size, size=(rows, packets - 1)) / 4
+    cuts = np.rint(np.arange(1, packets) * size + jitter).astype(np.int64)
+    cuts = np.minimum(np.maximum.accumulate(np.maximum(cuts, 0), axis=1), n)
+
+    # packets in reverse, each in order
+    packet = _counts(cuts, n)
+    source = np.argsort(packets - packet, axis=1, kind='stable')
+    return _take(orders, source)
+
+
+def cut_batch(orders, rng, low=0.25, high=0.75):
+    """
+    cut() for many shoes at once.
+
+    args:
+        orders (array):     (shoes x cards) cards, bottom first
+        rng (class):        numpy.random.Generator() object
+        low (float):        shallowest cut, as a fraction of the cards
+        high (float):       deepest cut, as a fraction of the cards
+
+    returns:
+        (array):            cut cards
+    """
+    rows, n = orders.shape
+    if not n:
+        return orders
+    k = rng.integers(int(n * low), int(n * high) + 1, size=(rows, 1))
+    source = np.arange(n) + k
+    source[source >= n] -= n
+    return _take(orders, source)
+
+
+def grab_riffle_batch(orders, rng, grab=52, riffles=1):
+    """
+    grab_riffle() for many shoes at once. Every shoe draws as many grab
+    sizes as the smallest grabs could need; those drawn after both
+    halves run out take nothing.
+
+    args:
+        orders (array):     (shoes x cards) cards, bottom first
+        rng (class):        numpy.random.Generator() object
+        grab (int):         cards taken from each half at a time
+        riffles (int):      riffles given to each pair of grabs
+
+    returns:
+        (array):            shuffled cards
+    """
+    rows, n = orders.shape
+    half = n // 2
+    spread = grab // 8
+    grabs = max(1, -(-(n - half) // max(1, grab - spread)))
+    sizes = np.maximum(1, grab + rng.integers(-spread, spread + 1,
+                                              size=(rows, grabs)))
+    taken = np.cumsum(sizes, axis=1)
+    # cards taken off each half once each grab is done
+    left = np.minimum(taken, half)
+    right = np.minimum(taken, n - half)
+
+    # grab each card is taken in, from its depth under the top of its half
+    grab_of = np.empty((rows, n), dtype=np.int16)
+    grab_of[:, :half] = _counts(left, half)[:, ::-1]
+    grab_of[:, half:] = _counts(right, n - half)[:, ::-1]
+    side = np.arange(n) >= half
+    orders = _take(orders, np.argsort(grab_of * 2 + side, axis=1,
+                                      kind='stable'))
+
+    segment = _counts(left + right, n)
+    for _ in range(riffles):
+        orders = _riffle_segments(orders, rng, segment)
+    return orders
+
+
+def gather(order, remaining):
+    """
+    Stack a shoe is reshuffled from: the discards, in the order they were
+    dealt, with the cards behind the cut card put on top of them.
+
+    args:
+        order (list):       shoe as it was shuffled, bottom first
+        remaining (int):    cards that were never dealt
+
+    returns:
+        (list):             cards, bottom first
+    """
+    return order[remaining:][::-1] + order[:remaining]
+
+
+def gather_batch(orders, remaining):
+    """
+    gather() for many shoes at once.
+
+    args:
+        orders (array):     (shoes x cards) shoes as they were shuffled
+        remaining (int):    cards that were never dealt
+
+    returns:
+        (array):            cards, bottom first
+    """
+    return np.concatenate((orders[:, remaining:][:, ::-1],
+                           orders[:, :remaining]), axis=1)
+
+
+# batched version of each step, for Procedure.apply_batch()
+BATCHED = {uniform: uniform_batch, riffle: riffle_batch,
+           strip: strip_batch, cut: cut_batch,
+           grab_riffle: grab_riffle_batch}
+
+
+class Procedure():
+    """
+    A shuffle made of steps done one after another. Any function taking
+    (items, rng) & returning the new order is a step; functools.partial
+    fills in a step's other arguments.
+
+    args:
+        steps (functions):  shuffle steps, in order
+        name (str):         name shown in reports
+    """
+
+    def __init__(self, *steps, name='procedure'):
+        if not steps:
+            raise ValueError('a procedure needs at least one step')
+        self.steps = steps
+        self.name = name
+
+    def apply(self, items, rng):
+        """
+        args:
+            items (list):   cards, bottom first
+            rng (class):    random.Random() object
+
+        returns:
+            (list):         shuffled cards
+        """
+        for step in self.steps:
+            items = step(items, rng)
+        return items
+
+    def apply_batch(self, orders, rng):
+        """
+        Shuffle many shoes at once. Steps without a batched version are
+        done one shoe at a time, seeded from rng.
+
+        args:
+            orders (array):     (shoes x cards) cards, bottom first
+            rng (class):        numpy.random.Generator() object
+
+        returns:
+            (array):            shuffled cards
+        """
+        for step in self.steps:
+            func, args, kwargs = step, (), {}
+            if isinstance(step, partial):
+                func, args, kwargs = step.func, step.args, step.keywords
+            batched = BATCHED.get(func)
+            if batched is not None:
+                orders = batched(orders, rng, *args, **kwargs)
+                continue
+            seeds = rng.integers(1 << 63, size=len(orders))
+            orders = np.array([step(row, random.Random(int(seed)))
+                               for row, seed in zip(orders.tolist(), seeds)],
+                              dtype=orders.dtype)
+        return orders
+
+    def __call__(self, items, seed=None):
+        """
+        Shuffle with a seed, the way Deck.shuffle() calls its shuffler.
+
+        args:
+            items (list):   cards, bottom first
+            seed (int):     optional seed so the shuffle can be replayed
+
+        returns:
+            (list):         shuffled cards
+        """
+        return self.apply(list(items), random.Random(seed))
+
+    def __repr__(self):
+        return f'Procedure({self.name!r})'
+
+
+# common procedures. casino is the usual riffle, strip, riffle & cut shoe
+# shuffle; riffle7 is the seven riffles that mix a single deck
+PRESETS = {
+    'uniform': Procedure(uniform, name='uniform'),
+    'riffle7': Procedure(*[riffle] * 7, name='riffle7'),
+    'hand': Procedure(riffle, riffle, strip, riffle, cut, name='hand'),
+    'casino': Procedure(grab_riffle, strip, partial(grab_riffle, riffles=2),
+                        cut, name='casino'),
+    'quick': Procedure(grab_riffle, cut, name='quick'),
+}
+
+
+def shoe_batches(procedure, shoes, num_decks=6, seed=0, penetration=0.5,
+                 streams=STREAMS):
+    """
+    shoe_orders() as (shoes x cards) arrays of card ids, a batch of
+    streams shoes shuffled at once. Needs numpy.
+
+    returns:
+        (generator):            arrays of card ids, one shoe per row
+    """
+    rng = np.random.default_rng(seed)
+    orders = uniform_batch(np.tile(np.arange(52, dtype=np.uint8),
+                                   (streams, num_decks)), rng)
+    n = orders.shape[1]
+    remaining = n - int(n * penetration)
+    for start in range(0, shoes, streams):
+        orders = procedure.apply_batch(gather_batch(orders, remaining), rng)
+        yield orders[:shoes - start]
+
+
+def shoe_orders(procedure, shoes, num_decks=6, seed=0, penetration=0.5,
+                streams=STREAMS):
+    """
+    Orders of runs of shoes shuffled one after another. The first shoes
+    start from uniformly washed decks, every later one from the shoe
+    dealt streams shoes before it, gathered after penetration of it was
+    dealt. With numpy, the streams runs are shuffled side by side in
+    batches (shoe_batches()); without it, one shoe at a time by the
+    list steps with random.Random(), so the orders differ.
+
+    args:
+        procedure (class):      Procedure() object
+        shoes (int):            number of shoes
+        num_decks (int):        number of decks in the shoe
+        seed (int):             seed for the run
+        penetration (float):    fraction of each shoe dealt
+        streams (int):          runs of shoes shuffled side by side
+
+    returns:
+        (generator):            card ids of each shoe, bottom first
+                                (i.e. Deck.card_ids())
+    """
+    if np is not None:
+        for batch in shoe_batches(procedure, shoes, num_decks, seed,
+                                  penetration, streams):
+            for order in batch:
+                yield order.tobytes()
+        return
+
+    rng = random.Random(seed)
+    n = 52 * num_decks
+    remaining = n - int(n * penetration)
+    orders = [uniform(list(range(52)) * num_decks, rng)
+              for _ in range(min(streams, shoes))]
+    for shoe in range(shoes):
+        order = procedure.apply(gather(orders[shoe % streams], remaining),
+                                rng)
+        orders[shoe % streams] = order
+        yield bytes(order)
+
+
+def rising_sequences(perm):
+    """
+    Number of rising sequences (runs of consecutive labels left in
+    order). A riffle at most doubles them, a uniform shuffle of n cards
+    averages (n + 1) / 2.
+
+    args:
+        perm (list):    labels 0 to n - 1 in their shuffled order
+
+    returns:
+        (int):          rising sequences
+    """
+    position = [0] * len(perm)
+    for i, label in enumerate(perm):
+        position[label] = i
+    return 1 + sum(position[label + 1] < position[label]
+                   for label in range(len(perm) - 1))
+
+
+def adjacent_pairs(perm):
+    """
+    args:
+        perm (list):    labels 0 to n - 1 in their shuffled order
+
+    returns:
+        (int):          cards still directly followed by the card that
+                        followed them before the shuffle
+    """
+    return sum(b == a + 1 for a, b in zip(perm, perm[1:]))
+
+
+def survival(procedure, num_decks=6, trials=100, seed=0):
+    """
+    How much of the pre-shuffle order a procedure leaves behind, next to
+    what a uniform shuffle would. retained is 1 when the order is
+    untouched & 0 at the rising sequences of a uniform shuffle.
+
+    args:
+        procedure (class):  Procedure() object
+        num_decks (int):    number of decks in the shoe
+        trials (int):       shuffles to average over
+        seed (int):         seed for the shuffles
+
+    returns:
+        (dict):             mean rising sequences & adjacent pairs, their
+                            uniform expectations, retained & the
+                            milliseconds taken per shuffle
+    """
+    n = 52 * num_decks
+    labels = list(range(n))
+    rising = 0
+    pairs = 0
+    start = time.perf_counter()
+    if np is not None:
+        perms = procedure.apply_batch(np.tile(np.arange(n), (trials, 1)),
+                                      np.random.default_rng(seed))
+        ms = (time.perf_counter() - start) * 1000 / trials
+        position = np.argsort(perms, axis=1)
+        rising = trials + int((position[:, 1:] < position[:, :-1]).sum())
+        pairs = int((perms[:, 1:] == perms[:, :-1] + 1).sum())
+    else:
+        rng = random.Random(seed)
+        for _ in range(trials):
+            perm = procedure.apply(labels, rng)
+            rising += rising_sequences(perm)
+            pairs += adjacent_pairs(perm)
+        ms = (time.perf_counter() - start) * 1000 / trials
+
+    uniform_rising = (n + 1) / 2
+    rising /= trials
+    return {'name': procedure.name,
+            'rising_sequences': rising,
+            'uniform_rising_sequences': uniform_rising,
+            'adjacent_pairs': pairs / trials,
+            'uniform_adjacent_pairs': (n - 1) / n,
+            'retained': max(uniform_rising - rising, 0) /
+            (uniform_rising - 1),
+            'ms': ms}
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Compare shuffle models')
+    parser.add_argument('--decks', type=int, default=6)
+    parser.add_argument('--trials', type=int, default=100)
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    print(f'{"Shuffle":<10}{"Rising":>10}{"Pairs":>10}{"Retained":>10}'
+          f'{"ms":>8}')
+    for procedure in PRESETS.values():
+        r = survival(procedure, args.decks, args.trials, args.seed)
+        print(f'{r["name"]:<10}{r["rising_sequences"]:>10.1f}'
+              f'{r["adjacent_pairs"]:>10.1f}{r["retained"]:>10.3f}'
+              f'{r["ms"]:>8.2f}')
+    print(f'{"(uniform)":<10}{r["uniform_rising_sequences"]:>10.1f}'
+          f'{r["uniform_adjacent_pairs"]:>10.1f}{0:>10.3f}')
+
+    return
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,902 @@
+#!/usr/bin/env python
+
+"""
+Headless simulations for blackjack.py
+
+Bots play through the exact same functions a live table uses
+(deal, play_hands, determine_winners, settle_up, ...), with all
+output and pauses silenced. With Numba installed, basic strategy shoes
+are played by kernel.simulate_shoe() instead, with identical results.
+"""
+
+__author__ = "Kyle Long"
+__email__ = "long.kyle@gmail.com"
+__date__ = "08/26/2019"
+__copyright__ = "Copyright 2019, Kyle Long"
+__python_version__ = "3.7.4"
+
+
+import math
+import os
+import argparse
+from statistics import NormalDist
+from multiprocessing import Pool
+
+import blackjack as bj
+from blackjack import Deck, Dealer, Gambler
+import kernel
+import strategy as st
+from corpus import ShoeCorpus, shoe_seed
+
+# z-score for 95% confidence intervals
+Z_95 = 1.959963984540054
+
+# shoes handed to a worker process at a time
+CHUNK_SHOES = 100
+
+# penetration levels a sweep reports by default
+SWEEP_LEVELS = (0.5, 0.55, 0.6, 0.65, 0.7, 0.75, 0.8, 0.85, 0.9)
+
+# fewest cards a sweep leaves behind its deepest cut card, so a heads up
+# round can't run the shoe dry
+SWEEP_RESERVE = 26
+
+
+def play_shoe(strategy, deck, seed, bankroll=1000, antithetic=False,
+              rules=bj.RULES, cents=False):
+    """
+    Play a single bot heads up against the dealer until the shoe
+    reaches the reshuffle point.
+
+    args:
+        strategy (class):   Strategy() object
+        deck (class):       Deck() object
+        seed (int):         seed for Deck.shuffle(), or card ids of a
+                            precomputed shoe (i.e. ShoeCorpus.shoe())
+        bankroll (int):     balance restored before every round so
+                            each round's result is independent
+        antithetic (bool):  play the seed's antithetic shoe order
+        rules (class):      TableRules() the shoe is played under
+        cents (bool):       return results in integer cents rather than
+                            dollars
+
+    returns:
+        results (list):     net result of each round
+    """
+    gambler = Gambler(strategy.name, strategy=strategy)
+    players = [gambler, Dealer()]
+
+    if isinstance(seed, int):
+        deck.cards = []
+        deck.create()
+        deck.shuffle(seed, antithetic)
+    else:
+        deck.load(seed)
+
+    results = []
+    start = round(bankroll * 100)
+    reshuffle_at = rules.reshuffle_at(deck.num_decks)
+    while len(deck.cards) >= reshuffle_at:
+        gambler.cents = start
+        bj.play_round(players, deck, rules)
+        results.append(gambler.cents - start)
+
+    if cents:
+        return results
+    return [bj.dollars(result) for result in results]
+
+
+def _play_chunk(args):
+    """
+    Worker for run_tournament(). Plays a range of shoes for one bot.
+
+    returns:
+        (tuple):    bot index, rounds, sum & sum of squares of results
+    """
+    index, rounds, total, total_sq = _play_chunk_cents(args)
+    return index, rounds, total / 100, total_sq / 10000
+
+
+def _play_chunk_cents(args):
+    """
+    Same as _play_chunk(), with the sums kept in integer cents so they
+    are exact no matter how many rounds are played.
+    """
+    index, strategy, num_decks, seed, start, stop, bankroll, corpus, \
+        rules = args
+    if kernel.NUMBA and not corpus and type(strategy) is st.BasicStrategy:
+        sums = _kernel_sums(strategy, num_decks, seed, start, stop,
+                            bankroll, rules)
+        if sums is not None:
+            return (index,) + sums
+
+    deck = Deck(num_decks)
+    rounds = 0
+    total = 0
+    total_sq = 0
+
+    shoes = ShoeCorpus(corpus) if corpus else None
+    with bj.quiet():
+        for shoe in range(start, stop):
+            strategy.new_shoe(shoe_seed(seed, shoe))
+            if shoes:
+                with shoes.shoe(shoe) as order:
+                    results = play_shoe(strategy, deck, order, bankroll,
+                                        rules=rules, cents=True)
+            else:
+                results = play_shoe(strategy, deck, shoe_seed(seed, shoe),
+                                    bankroll, rules=rules, cents=True)
+            for result in results:
+                rounds += 1
+                total += result
+                total_sq += result * result
+
+    if shoes:
+        shoes.close()
+
+    return index, rounds, total, total_sq
+
+
+def _kernel_sums(strategy, num_decks, seed, start, stop, bankroll, rules):
+    """
+    The fast path of _play_chunk_cents(): plays the shoes with
+    kernel.simulate_shoe(), dealt in the same order as play_shoe().
+
+    returns:
+        (tuple):    rounds, sum & sum of squares of results in cents, or
+                    None if the wager isn't a whole number of dollars
+    """
+    wager = strategy.wager(bankroll, None)
+    if not (isinstance(wager, int) and isinstance(bankroll, int) and
+            1 <= wager <= bankroll):
+        return None
+
+    deck = Deck(num_decks)
+    deck.create()
+    codes = [kernel.RANK_CODES[card.rank] for card in deck.cards]
+    hard, soft, pairs = kernel.basic_tables()
+    reshuffle_at = rules.reshuffle_at(num_decks)
+    table_rules = kernel.rules_array(rules)
+    results = kernel.results_array(13 * num_decks + 1)
+
+    rounds = 0
+    total = 0
+    total_sq = 0
+    for shoe in range(start, stop):
+        strategy.new_shoe(shoe_seed(seed, shoe))
+        order = list(codes)
+        bj.seeded_shuffle(order, shoe_seed(seed, shoe))
+        played = kernel.simulate_shoe(kernel.to_array(order), wager,
+                                      bankroll, hard, soft, pairs,
+                                      reshuffle_at, table_rules, results)
+        shoe_results = results[:played]
+        rounds += played
+        total += int(shoe_results.sum())
+        total_sq += int((shoe_results * shoe_results).sum())
+
+    return rounds, total, total_sq
+
+
+def summarize(name, rounds, total, total_sq):
+    """
+    Mean, standard deviation & 95% confidence interval of a bot's
+    per-round results.
+
+    returns:
+        (dict):     summary of the bot's results
+    """
+    mean = total / rounds if rounds else 0.0
+    variance = 0.0
+    if rounds > 1:
+        variance = max(total_sq - rounds * mean * mean, 0) / (rounds - 1)
+    std = math.sqrt(variance)
+    half_width = Z_95 * std / math.sqrt(rounds) if rounds else 0.0
+
+    return {'name': name,
+            'rounds': rounds,
+            'mean': mean,
+            'std': std,
+            'ci_low': mean - half_width,
+            'ci_high': mean + half_width}
+
+
+def play_shoes(strategies, start, stop, num_decks=6, seed=0,
+               processes=None, bankroll=1000, corpus=None, rules=bj.RULES):
+    """
+    Play every bot through shoes start to stop - 1 of a sequence,
+    spread across all cores.
+
+    args:
+        strategies (list):  Strategy() objects
+        start (int):        index of the first shoe
+        stop (int):         index after the last shoe
+        num_decks (int):    number of decks in the shoe
+        seed (int):         base seed for the shoe sequence
+        processes (int):    worker processes (defaults to all cores)
+        bankroll (int):     balance each bot starts every round with
+        corpus (str):       optional ShoeCorpus file to read shoes from
+                            instead of shuffling (num_decks comes from
+                            the corpus; seed then only reseeds the
+                            strategies each shoe)
+        rules (class):      TableRules() the shoes are played under
+
+    returns:
+        totals (list):      [rounds, sum, sum of squares] of the
+                            results of each bot
+    """
+    if corpus:
+        with ShoeCorpus(corpus) as shoe_corpus:
+            num_decks = shoe_corpus.num_decks
+            if stop > len(shoe_corpus):
+                raise ValueError(f'{corpus} only has '
+                                 f'{len(shoe_corpus)} shoes')
+
+    tasks = []
+    for index, strategy in enumerate(strategies):
+        for chunk in range(start, stop, CHUNK_SHOES):
+            tasks.append((index, strategy, num_decks, seed, chunk,
+                          min(chunk + CHUNK_SHOES, stop), bankroll, corpus,
+                          rules))
+
+    totals = [[0, 0, 0] for _ in strategies]
+    processes = processes or os.cpu_count() or 1
+
+    if processes == 1:
+        chunks = map(_play_chunk, tasks)
+        for index, rounds, total, total_sq in chunks:
+            totals[index][0] += rounds
+            totals[index][1] += total
+            totals[index][2] += total_sq
+    else:
+        with Pool(processes) as pool:
+            chunks = pool.imap_unordered(_play_chunk, tasks)
+            for index, rounds, total, total_sq in chunks:
+                totals[index][0] += rounds
+                totals[index][1] += total
+                totals[index][2] += total_sq
+
+    return totals
+
+
+def run_tournament(strategies, shoes, num_decks=6, seed=0,
+                   processes=None, bankroll=1000, corpus=None,
+                   rules=bj.RULES):
+    """
+    Play every bot through the same sequence of shoes, spread across
+    all cores, and rank them by average result per round.
+
+    args:
+        strategies (list):  Strategy() objects
+        shoes (int):        number of shoes each bot plays
+        num_decks (int):    number of decks in the shoe
+        seed (int):         base seed for the shoe sequence
+        processes (int):    worker processes (defaults to all cores)
+        bankroll (int):     balance each bot starts every round with
+        corpus (str):       optional ShoeCorpus file to read shoes from
+                            instead of shuffling (num_decks comes from
+                            the corpus; seed then only reseeds the
+                            strategies each shoe)
+        rules (class):      TableRules() the shoes are played under
+
+    returns:
+        (list):             summarize() dicts, best bot first
+    """
+    totals = play_shoes(strategies, 0, shoes, num_decks, seed,
+                        processes, bankroll, corpus, rules)
+    results = [summarize(strategy.name, *totals[i])
+               for i, strategy in enumerate(strategies)]
+
+    return sorted(results, key=lambda r: r['mean'], reverse=True)
+
+
+class RunningStats():
+    """
+    Streaming mean & variance (Welford), mergeable across workers
+    (Chan et al.) without keeping individual results.
+    """
+
+    def __init__(self, count=0, mean=0.0, m2=0.0):
+        self.count = count
+        self.mean = mean
+        self.m2 = m2
+
+    @classmethod
+    def from_sums(cls, count, total, total_sq):
+        """
+        Build from a count, sum & sum of squares (i.e. _play_chunk()).
+        """
+        if not count:
+            return cls()
+        mean = total / count
+        return cls(count, mean, max(total_sq - total * mean, 0.0))
+
+    def add(self, x):
+        self.count += 1
+        delta = x - self.mean
+        self.mean += delta / self.count
+        self.m2 += delta * (x - self.mean)
+        return
+
+    def merge(self, other):
+        count = self.count + other.count
+        if not count:
+            return
+        delta = other.mean - self.mean
+        self.mean += delta * other.count / count
+        self.m2 += other.m2 + delta * delta * self.count * other.count / count
+        self.count = count
+        return
+
+    @property
+    def variance(self):
+        return self.m2 / (self.count - 1) if self.count > 1 else 0.0
+
+    def half_width(self, confidence=0.95):
+        """
+        returns:
+            (float):    half width of the confidence interval of the mean
+        """
+        if self.count < 2:
+            return math.inf
+        z = NormalDist().inv_cdf(0.5 + confidence / 2)
+        return z * math.sqrt(self.variance / self.count)
+
+
+def simulate_until(strategy, precision, confidence=0.95, num_decks=6,
+                   seed=0, processes=None, bankroll=1000, chunk_shoes=20,
+                   min_rounds=1000, max_shoes=None, rules=bj.RULES):
+    """
+    Play shoes until the bot's EV is known to the target precision,
+    instead of a fixed number of rounds.
+
+    Chunks of shoes are played across all cores and merged in shoe
+    order, so the stopping point (and every result) is the same no
+    matter how the workers are scheduled.
+
+    args:
+        strategy (class):   Strategy() object
+        precision (float):  target half width of the confidence interval
+                            of the EV, as a fraction of the bot's unit
+                            wager (i.e. 0.0001 for +/- 0.01%)
+        confidence (float): confidence level of the interval
+        num_decks (int):    number of decks in the shoe
+        seed (int):         base seed for the shoe sequence
+        processes (int):    worker processes (defaults to all cores)
+        bankroll (int):     balance the bot starts every round with
+        chunk_shoes (int):  shoes per unit of work
+        min_rounds (int):   rounds played before the interval is trusted
+        max_shoes (int):    give up after this many shoes
+        rules (class):      TableRules() the shoes are played under
+
+    returns:
+        (dict):             rounds & shoes used, ev & its confidence
+                            interval (fractions of the unit wager),
+                            mean & std per round, converged
+    """
+    processes = processes or os.cpu_count() or 1
+    stats = RunningStats()
+    target = precision * strategy.unit
+
+    def task(chunk):
+        start = chunk * chunk_shoes
+        return (0, strategy, num_decks, seed, start, start + chunk_shoes,
+                bankroll, None, rules)
+
+    def converged():
+        return stats.count >= min_rounds and \
+            stats.half_width(confidence) <= target
+
+    def exhausted(chunks):
+        return max_shoes and chunks * chunk_shoes >= max_shoes
+
+    merged = 0
+    if processes == 1:
+        while not converged() and not exhausted(merged):
+            stats.merge(RunningStats.from_sums(*_play_chunk(task(merged))[1:]))
+            merged += 1
+    else:
+        with Pool(processes) as pool:
+            pending = {}
+            sent = 0
+            while not converged() and not exhausted(merged):
+                # keep every worker busy, a couple of chunks ahead
+                while len(pending) < processes * 2 and not exhausted(sent):
+                    pending[sent] = pool.apply_async(_play_chunk,
+                                                     (task(sent),))
+                    sent += 1
+                result = pending.pop(merged).get()
+                stats.merge(RunningStats.from_sums(*result[1:]))
+                merged += 1
+            pool.terminate()
+
+    half_width = stats.half_width(confidence)
+    unit = strategy.unit
+    return {'name': strategy.name,
+            'rounds': stats.count,
+            'shoes': merged * chunk_shoes,
+            'mean': stats.mean,
+            'std': math.sqrt(stats.variance),
+            'ev': stats.mean / unit,
+            'ci_low': (stats.mean - half_width) / unit,
+            'ci_high': (stats.mean + half_width) / unit,
+            'converged': converged()}
+
+
+def _shoe_sums(strategy, deck, seed, bankroll, antithetic=False,
+               rules=bj.RULES):
+    """
+    Net result in cents & number of rounds of a bot over one shoe,
+    reseeding the bot for the shoe first.
+    """
+    strategy.new_shoe(seed)
+    results = play_shoe(strategy, deck, seed, bankroll, antithetic, rules,
+                        cents=True)
+    return sum(results), len(results)
+
+
+def _compare_chunk(args):
+    """
+    Worker for compare(). Plays a range of shoes (or antithetic shoe
+    pairs) for both bots & the control bot.
+
+    returns:
+        units (list):   (a, b, control) net results in cents & rounds
+                        played over each shoe or antithetic pair, then
+                        a & b over the pair's first shoe alone, as
+                        (total, rounds) pairs
+    """
+    (strategy_a, strategy_b, control, num_decks, seed,
+     start, stop, crn, antithetic, bankroll, rules) = args
+    deck = Deck(num_decks)
+    flips = (False, True) if antithetic else (False,)
+
+    units = []
+    with bj.quiet():
+        for shoe in range(start, stop):
+            seed_a = shoe_seed(seed, shoe)
+            seed_b = seed_a if crn else shoe_seed(seed + 1, shoe)
+            a, b, c = [], [], []
+            for flip in flips:
+                a.append(_shoe_sums(strategy_a, deck, seed_a, bankroll, flip,
+                                    rules))
+                b.append(_shoe_sums(strategy_b, deck, seed_b, bankroll, flip,
+                                    rules))
+                c.append(_shoe_sums(control, deck, seed_a, bankroll, flip,
+                                    rules) if control else (0, 0))
+            units.append(tuple(tuple(map(sum, zip(*sums)))
+                               for sums in (a, b, c)) + (a[0], b[0]))
+
+    return units
+
+
+def _variance(xs, mean):
+    return sum((x - mean) ** 2 for x in xs) / (len(xs) - 1)
+
+
+def _covariance(xs, x_mean, ys, y_mean):
+    return sum((x - x_mean) * (y - y_mean)
+               for x, y in zip(xs, ys)) / (len(xs) - 1)
+
+
+def _ratio(sums):
+    """
+    Ratio estimate of the average result per round over many shoes,
+    with the linearized contribution of each shoe to its error.
+
+    args:
+        sums (list):    (total, rounds) of each shoe
+
+    returns:
+        mean (float):       total / rounds over every shoe
+        residuals (list):   (total - mean * rounds) / average rounds per
+                            shoe, whose variance / shoes is the mean's
+                            variance to first order
+    """
+    total = sum(t for t, _ in sums)
+    rounds = sum(n for _, n in sums)
+    mean = total / rounds
+    per_shoe = rounds / len(sums)
+    return mean, [(t - mean * n) / per_shoe for t, n in sums]
+
+
+def compare(strategy_a, strategy_b, shoes, num_decks=6, seed=0,
+            crn=True, antithetic=False, control=None, control_ev=None,
+            processes=None, bankroll=1000, rules=bj.RULES):
+    """
+    Estimate the difference in average result per round between two
+    bots, using variance reduction:
+
+    - common random numbers (crn): both bots play the exact same shoe
+      orders instead of independent shuffles
+    - antithetic: every shoe is paired with its antithetic shoe
+    - control variate: a control bot with a known EV per round
+      (i.e. BasicStrategy) plays the same shoes and the difference is
+      corrected by how far the control strayed from its known EV
+
+    Each bot's average is its total result over all rounds played
+    divided by the number of rounds (a ratio estimator), so a shoe
+    counts in proportion to the rounds dealt from it, and its error
+    comes from the spread of each shoe's (total - average * rounds).
+
+    The achieved variance reduction is reported against independent
+    shoe streams for the same number of shoes played.
+
+    args:
+        strategy_a (class):     Strategy() object
+        strategy_b (class):     Strategy() object
+        shoes (int):            number of shoes (or antithetic pairs)
+        num_decks (int):        number of decks in the shoe
+        seed (int):             base seed for the shoe sequence
+        crn (bool):             use common random numbers
+        antithetic (bool):      use antithetic shoe pairs
+        control (class):        optional control Strategy() object
+        control_ev (float):     known average result per round of
+                                the control bot, in dollars
+        processes (int):        worker processes (defaults to all cores)
+        bankroll (int):         balance each bot starts every round with
+        rules (class):          TableRules() the shoes are played under
+
+    returns:
+        (dict):                 difference (a - b) per round, its
+                                std_error, 95% confidence interval,
+                                shoes & variance_reduction
+    """
+    if control and control_ev is None:
+        raise ValueError('control_ev is required with a control bot')
+    if shoes < 2:
+        raise ValueError('at least 2 shoes are needed to compare bots')
+
+    tasks = []
+    for start in range(0, shoes, CHUNK_SHOES):
+        stop = min(start + CHUNK_SHOES, shoes)
+        tasks.append((strategy_a, strategy_b, control, num_decks, seed,
+                      start, stop, crn, antithetic, bankroll, rules))
+
+    processes = processes or os.cpu_count() or 1
+    if processes == 1:
+        chunks = list(map(_compare_chunk, tasks))
+    else:
+        with Pool(processes) as pool:
+            chunks = pool.map(_compare_chunk, tasks)
+    units = [unit for chunk in chunks for unit in chunk]
+
+    # everything below is in cents until the results are reported
+    a_mean, a = _ratio([u[0] for u in units])
+    b_mean, b = _ratio([u[1] for u in units])
+    d_mean = a_mean - b_mean
+    d = [x - y for x, y in zip(a, b)]
+    variance = _variance(d, 0)
+
+    if control:
+        c_mean, c = _ratio([u[2] for u in units])
+        c_variance = _variance(c, 0)
+        if c_variance:
+            beta = _covariance(d, 0, c, 0) / c_variance
+            d_mean -= beta * (c_mean - control_ev * 100)
+            d = [x - beta * y for x, y in zip(d, c)]
+            variance = _variance(d, 0)
+
+    # independent streams of single shoes: var(a) + var(b) per shoe.
+    # An antithetic pair costs two shoes of each bot
+    baseline = (_variance(_ratio([u[3] for u in units])[1], 0)
+                + _variance(_ratio([u[4] for u in units])[1], 0))
+    if antithetic:
+        baseline /= 2
+
+    std_error = math.sqrt(variance / shoes) / 100
+    d_mean /= 100
+
+    return {'difference': d_mean,
+            'std_error': std_error,
+            'ci_low': d_mean - Z_95 * std_error,
+            'ci_high': d_mean + Z_95 * std_error,
+            'shoes': shoes,
+            'variance_reduction': baseline / variance if variance else None}
+
+
+def play_shoe_tagged(strategy, deck, seed, depth, bankroll=1000,
+                     rules=bj.RULES):
+    """
+    Play a single bot through a shoe to the deepest penetration of a
+    sweep, tagging every round with where in the shoe it started. A
+    shallower cut card only removes rounds from the end of the shoe, so
+    the rounds starting with at least rules.reshuffle_at() cards left
+    are exactly the ones play_shoe() would play at that penetration.
+
+    args:
+        strategy (class):   Strategy() object
+        deck (class):       Deck() object
+        seed (int):         seed for Deck.shuffle(), or card ids of a
+                            precomputed shoe (i.e. ShoeCorpus.shoe())
+        depth (float):      deepest penetration to play to, leaving at
+                            least SWEEP_RESERVE cards
+        bankroll (int):     balance restored before every round
+        rules (class):      TableRules() the shoe is played under
+
+    returns:
+        results (list):     (cards left, true count, net result in
+                            cents) of each round
+    """
+    deepest = bj.TableRules(**dict(rules.settings(), penetration=depth))
+    if deepest.reshuffle_at(deck.num_decks) < SWEEP_RESERVE:
+        raise ValueError(f'a {depth:.0%} cut card leaves fewer than '
+                         f'{SWEEP_RESERVE} cards in a {deck.num_decks} '
+                         f'deck shoe')
+    gambler = Gambler(strategy.name, strategy=strategy)
+    players = [gambler, Dealer()]
+
+    if isinstance(seed, int):
+        deck.cards = []
+        deck.create()
+        deck.shuffle(seed)
+    else:
+        deck.load(seed)
+
+    results = []
+    start = round(bankroll * 100)
+    reshuffle_at = deepest.reshuffle_at(deck.num_decks)
+    while len(deck.cards) >= reshuffle_at:
+        shoe = bj.shoe_state(deck, None)
+        gambler.cents = start
+        bj.play_round(players, deck, rules)
+        results.append((shoe['cards_remaining'], int(shoe['true_count']),
+                        gambler.cents - start))
+
+    return results
+
+
+def _sweep_chunk(args):
+    """
+    Worker for penetration_sweep(). Plays a range of shoes to the
+    deepest penetration.
+
+    returns:
+        (tuple):    [rounds, sum, sum of squares] of the results in cents
+                    by cards left at the start of the round, & the
+                    number of rounds by (cards left, true count)
+    """
+    strategy, num_decks, seed, start, stop, bankroll, corpus, rules, \
+        depth = args
+    deck = Deck(num_decks)
+    sums = {}
+    counts = {}
+
+    shoes = ShoeCorpus(corpus) if corpus else None
+    with bj.quiet():
+        for shoe in range(start, stop):
+            strategy.new_shoe(shoe_seed(seed, shoe))
+            if shoes:
+                with shoes.shoe(shoe) as order:
+                    results = play_shoe_tagged(strategy, deck, order, depth,
+                                               bankroll, rules)
+            else:
+                results = play_shoe_tagged(strategy, deck,
+                                           shoe_seed(seed, shoe), depth,
+                                           bankroll, rules)
+            for cards_left, true_count, result in results:
+                total = sums.setdefault(cards_left, [0, 0, 0])
+                total[0] += 1
+                total[1] += result
+                total[2] += result * result
+                key = (cards_left, true_count)
+                counts[key] = counts.get(key, 0) + 1
+
+    if shoes:
+        shoes.close()
+
+    return sums, counts
+
+
+def penetration_sweep(strategy, shoes, levels=SWEEP_LEVELS, num_decks=6,
+                      seed=0, processes=None, bankroll=1000, corpus=None,
+                      rules=bj.RULES):
+    """
+    EV, variance & true count frequencies of a bot at every penetration
+    level from a single pass over the shoes. Each shoe is played once to
+    the deepest level, and each level keeps the rounds dealt before its
+    cut card, so the results for a level are the same as
+    run_tournament() played under that penetration.
+
+    args:
+        strategy (class):   Strategy() object
+        shoes (int):        number of shoes
+        levels (tuple):     penetrations to report, each leaving at
+                            least SWEEP_RESERVE cards
+        num_decks (int):    number of decks in the shoe
+        seed (int):         base seed for the shoe sequence
+        processes (int):    worker processes (defaults to all cores)
+        bankroll (int):     balance the bot starts every round with
+        corpus (str):       optional ShoeCorpus file to read shoes from
+                            instead of shuffling (num_decks comes from
+                            the corpus; seed then only reseeds the
+                            strategies each shoe)
+        rules (class):      TableRules() the shoes are played under,
+                            other than their penetration
+
+    returns:
+        (list):             summarize() dicts for each level, shallowest
+                            first, with the penetration, rounds_per_shoe
+                            & true_counts (fraction of rounds starting at
+                            each true count)
+    """
+    levels = sorted(levels)
+    tables = [bj.TableRules(**dict(rules.settings(), penetration=level))
+              for level in levels]
+
+    if corpus:
+        with ShoeCorpus(corpus) as shoe_corpus:
+            num_decks = shoe_corpus.num_decks
+            if shoes > len(shoe_corpus):
+                raise ValueError(f'{corpus} only has '
+                                 f'{len(shoe_corpus)} shoes')
+    if tables[-1].reshuffle_at(num_decks) < SWEEP_RESERVE:
+        raise ValueError(f'a {levels[-1]:.0%} cut card leaves fewer than '
+                         f'{SWEEP_RESERVE} cards in a {num_decks} deck shoe')
+
+    tasks = [(strategy, num_decks, seed, chunk,
+              min(chunk + CHUNK_SHOES, shoes), bankroll, corpus, rules,
+              levels[-1])
+             for chunk in range(0, shoes, CHUNK_SHOES)]
+
+    sums = {}
+    counts = {}
+    processes = processes or os.cpu_count() or 1
+    if processes == 1:
+        chunks = map(_sweep_chunk, tasks)
+        for chunk_sums, chunk_counts in chunks:
+            _merge_sweep(sums, counts, chunk_sums, chunk_counts)
+    else:
+        with Pool(processes) as pool:
+            chunks = pool.imap_unordered(_sweep_chunk, tasks)
+            for chunk_sums, chunk_counts in chunks:
+                _merge_sweep(sums, counts, chunk_sums, chunk_counts)
+
+    results = []
+    for level, table in zip(levels, tables):
+        reshuffle_at = table.reshuffle_at(num_decks)
+        rounds = total = total_sq = 0
+        for cards_left, (n, s, sq) in sums.items():
+            if cards_left >= reshuffle_at:
+                rounds += n
+                total += s
+                total_sq += sq
+
+        true_counts = {}
+        for (cards_left, true_count), n in counts.items():
+            if cards_left >= reshuffle_at:
+                true_counts[true_count] = true_counts.get(true_count, 0) + n
+
+        result = summarize(strategy.name, rounds, total / 100,
+                           total_sq / 10000)
+        result['penetration'] = level
+        result['rounds_per_shoe'] = rounds / shoes if shoes else 0.0
+        result['true_counts'] = {tc: n / rounds for tc, n in
+                                 sorted(true_counts.items())}
+        results.append(result)
+
+    return results
+
+
+def sweep_levels(num_decks, levels=SWEEP_LEVELS):
+    """
+    args:
+        num_decks (int):    number of decks in the shoe
+        levels (tuple):     penetrations to choose from
+
+    returns:
+        (list):             the levels whose cut card leaves at least
+                            SWEEP_RESERVE cards in the shoe
+    """
+    return [level for level in levels
+            if 52 * num_decks * (1 - level) >= SWEEP_RESERVE]
+
+
+def _merge_sweep(sums, counts, chunk_sums, chunk_counts):
+    for cards_left, (n, s, sq) in chunk_sums.items():
+        total = sums.setdefault(cards_left, [0, 0, 0])
+        total[0] += n
+        total[1] += s
+        total[2] += sq
+    for key, n in chunk_counts.items():
+        counts[key] = counts.get(key, 0) + n
+
+    return
+
+
+def print_results(results):
+    """
+    Prints ranked tournament results
+
+    args:
+        results (list):     output of run_tournament()
+    """
+    print(f'{"Rank":<6}{"Bot":<20}{"Rounds":>10}{"Mean":>10}'
+          f'{"95% CI":>22}')
+    for rank, r in enumerate(results, 1):
+        ci = f'({r["ci_low"]:.4f}, {r["ci_high"]:.4f})'
+        print(f'{rank:<6}{r["name"]:<20}{r["rounds"]:>10}'
+              f'{r["mean"]:>10.4f}{ci:>22}')
+
+    return
+
+
+def print_sweep(results):
+    """
+    Print a penetration_sweep() report, one row per level.
+
+    args:
+        results (list):     penetration_sweep() dicts
+    """
+    print(f'{"Pen.":<6}{"Rounds":>10}{"Per shoe":>10}{"Mean":>10}'
+          f'{"Std":>10}{"95% CI":>22}{"TC>=+2":>9}')
+    for r in results:
+        ci = f'({r["ci_low"]:.4f}, {r["ci_high"]:.4f})'
+        high = sum(f for tc, f in r['true_counts'].items() if tc >= 2)
+        print(f'{r["penetration"]:<6.0%}{r["rounds"]:>10}'
+              f'{r["rounds_per_shoe"]:>10.1f}{r["mean"]:>10.4f}'
+              f'{r["std"]:>10.4f}{ci:>22}{high:>9.2%}')
+
+    return
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Blackjack bot tournament')
+    parser.add_argument('--shoes', type=int, default=1000)
+    parser.add_argument('--decks', type=int, default=6)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--processes', type=int, default=None)
+    parser.add_argument('--corpus', default=None)
+    parser.add_argument('--precision', type=float, default=None,
+                        help='play each bot until its EV is known to '
+                             '+/- this fraction of a unit wager')
+    parser.add_argument('--sweep', action='store_true',
+                        help='report basic strategy at every penetration '
+                             'level from one pass over the shoes')
+    parser.add_argument('--levels', type=float, nargs='+', default=None,
+                        help='penetration levels a sweep reports '
+                             '(defaults to those the shoe can reach '
+                             'from 50%% to 90%%)')
+    args = parser.parse_args()
+
+    if args.sweep:
+        levels = args.levels
+        if levels is None:
+            num_decks = args.decks
+            if args.corpus:
+                with ShoeCorpus(args.corpus) as shoe_corpus:
+                    num_decks = shoe_corpus.num_decks
+            levels = sweep_levels(num_decks)
+            if len(levels) < len(SWEEP_LEVELS):
+                print(f'Leaving out levels past {levels[-1]:.0%}, which '
+                      f'leave fewer than {SWEEP_RESERVE} cards in a '
+                      f'{num_decks} deck shoe')
+        results = penetration_sweep(st.BasicStrategy(), args.shoes,
+                                    levels=levels,
+                                    num_decks=args.decks, seed=args.seed,
+                                    processes=args.processes,
+                                    corpus=args.corpus)
+        print_sweep(results)
+        return
+
+    bots = [st.BasicStrategy(), st.MimicDealerStrategy(),
+            st.Strategy(), st.RandomStrategy(seed=args.seed)]
+    if args.precision:
+        for bot in bots:
+            r = simulate_until(bot, args.precision, num_decks=args.decks,
+                               seed=args.seed, processes=args.processes)
+            print(f'{r["name"]:<20} EV {r["ev"]:+.4%} '
+                  f'[{r["ci_low"]:+.4%}, {r["ci_high"]:+.4%}] after '
+                  f'{r["rounds"]} rounds'
+                  f'{"" if r["converged"] else " (not converged)"}')
+        return
+
+    results = run_tournament(bots, args.shoes, args.decks,
+                             args.seed, args.processes,
+                             corpus=args.corpus)
+    print_results(results)
+
+    return
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,234 @@
+#!/usr/bin/env python
+
+"""
+Compact, versioned snapshots of a blackjack.py table
+
+A snapshot holds the shoe (cards & running count), every player with
+their balance & hands, and each hand's cards & flags, packed with
+struct rather than pickled. A round can be resumed from any phase.
+
+Layout (little endian):
+    header:     magic (4s), version (B), phase (B), running_count (h),
+                num_decks (B), cards in shoe (H), players (B)
+    shoe:       Deck.card_ids()
+    shuffler:   cards in the last shuffled order (H, 0 = none), cards
+                left of it when the shoe was last dealt from (H), the
+                order's card ids, so a Deck(shuffler=...) gathers the
+                same discards after a restore
+    player:     dealer (B), name length (H), name (utf-8),
+                has money (B), money in cents (q),
+                last wager (i, -1 = None), timeouts in a row (H),
+                hands (B)
+    hand:       flags (B), wager (i, -1 = None),
+                final_value (h, -1 = None), cards (B)
+    card:       card id | hidden << 7 (B)
+"""
+
+__author__ = "Kyle Long"
+__email__ = "long.kyle@gmail.com"
+__date__ = "08/26/2019"
+__copyright__ = "Copyright 2019, Kyle Long"
+__python_version__ = "3.7.4"
+
+
+import struct
+
+import blackjack as bj
+from blackjack import Card, Deck, Hand, Dealer, Gambler
+
+MAGIC = b'BJST'
+VERSION = 3
+
+HEADER = struct.Struct('<4sBBhBHB')
+ORDER = struct.Struct('<HH')
+PLAYER = struct.Struct('<BH')
+BALANCE = struct.Struct('<Bqih')
+HAND = struct.Struct('<BihB')
+
+# Round phases, in the order play_round() moves through them
+BETWEEN_ROUNDS = 0      # no hands dealt
+DEALT = 1               # cards dealt, dealer not checked for blackjack
+PLAYING = 2             # gamblers playing their hands
+DEALER = 3              # all hands played, dealer still to play
+SETTLE = 4              # winners determined, bets not settled
+
+# Hand attributes stored as bit flags
+FLAGS = ('blackjack', 'win', 'push', 'double_down',
+         'insurance', 'busted', 'first_iter', 'surrender')
+
+
+def dumps(players, deck, phase=BETWEEN_ROUNDS, hands=True):
+    """
+    Serialize the complete table state.
+
+    args:
+        players (list):     list of all players
+        deck (class):       Deck() object
+        phase (int):        where the round is (BETWEEN_ROUNDS ... SETTLE)
+        hands (bool):       False leaves every hand out, i.e. for a
+                            BETWEEN_ROUNDS snapshot taken at round_end,
+                            before reset_hands()
+
+    returns:
+        (bytes):            snapshot
+    """
+    ids = deck.card_ids()
+    parts = [HEADER.pack(MAGIC, VERSION, phase, deck.running_count,
+                         deck.num_decks, len(ids), len(players)),
+             ids]
+
+    if deck._order is None:
+        parts.append(ORDER.pack(0, 0))
+    else:
+        parts.append(ORDER.pack(len(deck._order), len(deck._dealing)))
+        parts.append(bytes(bj.CARD_IDS[(c.suit, c.rank)]
+                           for c in deck._order))
+
+    for player in players:
+        name = player.name.encode('utf-8')
+        if len(name) > 0xffff:
+            raise ValueError(f'name of {len(name)} bytes is too long for '
+                             f'a snapshot')
+        is_dealer = isinstance(player, Dealer)
+        parts.append(PLAYER.pack(is_dealer, len(name)))
+        parts.append(name)
+
+        if getattr(player, 'cents', None) is None:
+            parts.append(BALANCE.pack(0, 0, -1, 0))
+        else:
+            last_wager = -1 if player.last_wager is None \
+                else player.last_wager
+            parts.append(BALANCE.pack(1, player.cents, last_wager,
+                                      player.timeouts))
+
+        player_hands = player.hands if hands else []
+        parts.append(bytes([len(player_hands)]))
+        for hand in player_hands:
+            flags = 0
+            for bit, attr in enumerate(FLAGS):
+                if getattr(hand, attr):
+                    flags |= 1 << bit
+            wager = -1 if hand.wager is None else hand.wager
+            final_value = -1 if hand.final_value is None else hand.final_value
+            parts.append(HAND.pack(flags, wager, final_value,
+                                   len(hand.cards)))
+            parts.append(bytes(bj.CARD_IDS[(c.suit, c.rank)] | c.hidden << 7
+                               for c in hand.cards))
+
+    return b''.join(parts)
+
+
+def loads(data):
+    """
+    Rebuild a table from a snapshot. Strategy bots are not part of a
+    snapshot, reattach them to the restored gamblers if need be.
+
+    args:
+        data (bytes):       snapshot from dumps()
+
+    returns:
+        players (list):     list of all players
+        deck (class):       Deck() object
+        phase (int):        where the round is (BETWEEN_ROUNDS ... SETTLE)
+    """
+    magic, version, phase, running_count, num_decks, num_cards, \
+        num_players = HEADER.unpack_from(data)
+    if magic != MAGIC:
+        raise ValueError('not a table snapshot')
+    if version != VERSION:
+        raise ValueError(f'snapshot version {version}, expected {VERSION}')
+
+    offset = HEADER.size
+    deck = Deck(num_decks)
+    deck.load(data[offset:offset + num_cards])
+    deck.running_count = running_count
+    offset += num_cards
+
+    order_len, dealing = ORDER.unpack_from(data, offset)
+    offset += ORDER.size
+    if order_len:
+        order = [Card(*bj.CARD_INFO[i])
+                 for i in data[offset:offset + order_len]]
+        offset += order_len
+        # the shoe is dealt from the bottom of the order, keep them the
+        # same cards like Deck.shuffle() does
+        if dealing == len(deck.cards):
+            order[:dealing] = deck.cards
+            deck._dealing = deck.cards
+        else:
+            deck._dealing = order[:dealing]
+        deck._order = order
+        # create() reuses (& unhides) the cards a shuffler gathers
+        deck._shoe = list(order)
+
+    players = []
+    for _ in range(num_players):
+        is_dealer, name_len = PLAYER.unpack_from(data, offset)
+        offset += PLAYER.size
+        name = data[offset:offset + name_len].decode('utf-8')
+        offset += name_len
+
+        player = Dealer() if is_dealer else Gambler(name)
+        has_money, cents, last_wager, timeouts = \
+            BALANCE.unpack_from(data, offset)
+        offset += BALANCE.size
+        if has_money:
+            player.cents = cents
+            player.last_wager = None if last_wager == -1 else last_wager
+            player.timeouts = timeouts
+
+        num_hands = data[offset]
+        offset += 1
+        for _ in range(num_hands):
+            flags, wager, final_value, num_cards = \
+                HAND.unpack_from(data, offset)
+            offset += HAND.size
+
+            hand = Hand()
+            for bit, attr in enumerate(FLAGS):
+                setattr(hand, attr, bool(flags & 1 << bit))
+            hand.wager = None if wager == -1 else wager
+            hand.final_value = None if final_value == -1 else final_value
+
+            for card_byte in data[offset:offset + num_cards]:
+                card = Card(*bj.CARD_INFO[card_byte & 0x7f])
+                card.hidden = bool(card_byte & 0x80)
+                hand.cards.append(card)
+            offset += num_cards
+
+            player.hands.append(hand)
+        players.append(player)
+
+    return players, deck, phase
+
+
+def resume_round(players, deck, phase, rules=bj.RULES):
+    """
+    Finish a round restored mid-way, picking up from the given phase
+    exactly as play_round() would have carried on.
+
+    args:
+        players (list):     list of all players
+        deck (class):       Deck() object
+        phase (int):        phase the snapshot was taken in
+        rules (class):      TableRules() the round is played under
+    """
+    if phase == BETWEEN_ROUNDS:
+        return
+
+    if phase == DEALT:
+        bj.print_cards(players)
+        if not bj.check_dealer_for_blackjack(players, rules):
+            bj.play_hands(players, deck, rules)
+    elif phase == PLAYING:
+        bj.play_hands(players, deck, rules)
+
+    if phase <= DEALER:
+        bj.determine_winners(players, deck, rules)
+
+    bj.settle_up(players, rules)
+    if bj.listeners:
+        bj.emit('round_end', players=players, deck=deck)
+    bj.reset_hands(players)
+
+    return
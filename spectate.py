@@ -0,0 +1,359 @@
+#!/usr/bin/env python
+
+"""
+Live spectator feed for blackjack.py tables
+
+TableFeed listens to table events and hands a flat copy of the table
+(hands as card codes, wagers, balances, results) to a SpectatorHub. That
+is all the table's own thread does; the hub diffs it against the last
+state & fans the delta out from an asyncio loop in a background thread.
+
+Spectators connect over TCP & read newline delimited JSON:
+
+    {"seq": 0, "snapshot": {...}}                   on joining
+    {"seq": 7, "event": "decision", "set": {...},   after each event that
+     "add": {...}, "del": [...]}                    changed the table
+
+"add" appends to a string (a card dealt to a hand), "set" replaces a
+value & "del" removes a key. A spectator that falls more than queue_size
+messages behind has its backlog dropped & gets a new snapshot instead, so
+a slow reader never holds up the table or the other spectators.
+"""
+
+__author__ = "Kyle Long"
+__email__ = "long.kyle@gmail.com"
+__date__ = "08/26/2019"
+__copyright__ = "Copyright 2019, Kyle Long"
+__python_version__ = "3.7.4"
+
+
+import json
+import asyncio
+import argparse
+import threading
+from collections import deque
+
+import blackjack as bj
+
+RANK_CODES = {'Two': '2', 'Three': '3', 'Four': '4', 'Five': '5',
+              'Six': '6', 'Seven': '7', 'Eight': '8', 'Nine': '9',
+              'Ten': 'T', 'Jack': 'J', 'Queen': 'Q', 'King': 'K',
+              'Ace': 'A'}
+
+# events that don't change what a spectator sees
+SKIPPED = ('prompt',)
+
+
+def card_code(card):
+    """
+    args:
+        card (class):   Card() object
+
+    returns:
+        (str):          rank & suit, i.e. 'Th' for the Ten of Hearts, or
+                        '??' for a hidden card
+    """
+    if card.hidden:
+        return '??'
+    return RANK_CODES[card.rank] + card.suit[0].lower()
+
+
+def table_state(players, deck=None, results=None):
+    """
+    Flat copy of what a spectator can see. Keys are '<seat>.name',
+    '<seat>.money', '<seat>.<hand>.cards', '<seat>.<hand>.wager' &
+    '<seat>.<hand>.won', plus 'shoe' for the cards left.
+
+    args:
+        players (list):     Gambler() objects, then the Dealer()
+        deck (class):       optional Deck() object
+        results (dict):     winnings of settled hands, by id(hand)
+
+    returns:
+        (dict):             table state
+    """
+    state = {}
+    if deck is not None:
+        state['shoe'] = len(deck.cards)
+    for seat, player in enumerate(players):
+        state[f'{seat}.name'] = player.name
+        cents = getattr(player, 'cents', None)
+        if cents is not None:
+            state[f'{seat}.money'] = bj.dollars(cents)
+        for i, hand in enumerate(player.hands):
+            key = f'{seat}.{i}'
+            state[f'{key}.cards'] = ''.join(card_code(card)
+                                            for card in hand.cards)
+            if hand.wager is not None:
+                state[f'{key}.wager'] = hand.wager
+            if results and id(hand) in results:
+                state[f'{key}.won'] = results[id(hand)]
+
+    return state
+
+
+def delta(old, new):
+    """
+    args:
+        old (dict):     previous table state
+        new (dict):     current table state
+
+    returns:
+        (dict):         'set', 'add' & 'del' changes that turn old into
+                        new, empty if nothing changed
+    """
+    changes = {}
+    for key, value in new.items():
+        before = old.get(key)
+        if before == value:
+            continue
+        if isinstance(value, str) and isinstance(before, str) and \
+                value.startswith(before):
+            changes.setdefault('add', {})[key] = value[len(before):]
+        else:
+            changes.setdefault('set', {})[key] = value
+    removed = [key for key in old if key not in new]
+    if removed:
+        changes['del'] = removed
+
+    return changes
+
+
+def apply(state, message):
+    """
+    Update a spectator's copy of the table with one feed message.
+
+    args:
+        state (dict):       table state, updated in place
+        message (dict):     decoded snapshot or delta
+
+    returns:
+        (dict):             the updated state
+    """
+    if 'snapshot' in message:
+        state.clear()
+        state.update(message['snapshot'])
+        return state
+
+    state.update(message.get('set', {}))
+    for key, value in message.get('add', {}).items():
+        state[key] = state.get(key, '') + value
+    for key in message.get('del', []):
+        state.pop(key, None)
+
+    return state
+
+
+def encode(message):
+    return (json.dumps(message, separators=(',', ':')) + '\n').encode()
+
+
+class Subscriber():
+    """
+    One connected spectator: messages waiting to be written & whether it
+    fell too far behind & needs a snapshot.
+    """
+
+    def __init__(self, writer):
+        self.writer = writer
+        self.queue = deque()
+        self.ready = asyncio.Event()
+        self.stale = False
+        self.closed = False
+        self.task = asyncio.current_task()
+
+
+class SpectatorHub():
+    """
+    Fans table deltas out to TCP spectators from an asyncio loop in a
+    daemon thread. publish() may be called from any thread & never
+    waits on a spectator.
+
+    args:
+        host (str):         address to bind
+        port (int):         port to bind, 0 picks a free port
+        queue_size (int):   messages a spectator may fall behind before
+                            its backlog is replaced by a snapshot
+    """
+
+    def __init__(self, host='127.0.0.1', port=8765, queue_size=256):
+        self.host = host
+        self.port = port
+        self.queue_size = queue_size
+        self.state = {}
+        self.seq = 0
+        self.resyncs = 0
+        self.subscribers = set()
+        self.loop = asyncio.new_event_loop()
+        self.server = None
+        self._started = threading.Event()
+        self._thread = None
+
+    def start(self):
+        self._thread = threading.Thread(target=self._serve, daemon=True)
+        self._thread.start()
+        self._started.wait()
+        return
+
+    def stop(self):
+        asyncio.run_coroutine_threadsafe(self._close(), self.loop).result()
+        self.loop.call_soon_threadsafe(self.loop.stop)
+        self._thread.join()
+        self.loop.close()
+        return
+
+    def publish(self, state, event):
+        """
+        Queue a new table state. The diff & every write happen on the
+        hub's loop.
+
+        args:
+            state (dict):   table_state() of the table
+            event (str):    table event that led to it
+        """
+        try:
+            self.loop.call_soon_threadsafe(self._publish, state, event)
+        except RuntimeError:
+            # the hub has stopped, spectators must never break the table
+            pass
+        return
+
+    def _serve(self):
+        asyncio.set_event_loop(self.loop)
+        self.server = self.loop.run_until_complete(
+            asyncio.start_server(self._join, self.host, self.port))
+        self.port = self.server.sockets[0].getsockname()[1]
+        self._started.set()
+        self.loop.run_forever()
+        return
+
+    async def _close(self):
+        self.server.close()
+        await self.server.wait_closed()
+        tasks = []
+        for subscriber in self.subscribers:
+            subscriber.closed = True
+            subscriber.ready.set()
+            tasks.append(subscriber.task)
+        await asyncio.gather(*tasks, return_exceptions=True)
+        return
+
+    def _snapshot(self):
+        return encode({'seq': self.seq, 'snapshot': self.state})
+
+    def _publish(self, state, event):
+        changes = delta(self.state, state)
+        if not changes:
+            return
+        self.state = state
+        self.seq += 1
+        changes['seq'] = self.seq
+        changes['event'] = event
+
+        # encoded once for every spectator
+        line = encode(changes)
+        for subscriber in self.subscribers:
+            if subscriber.stale:
+                continue
+            if len(subscriber.queue) >= self.queue_size:
+                subscriber.stale = True
+                subscriber.queue.clear()
+            else:
+                subscriber.queue.append(line)
+            subscriber.ready.set()
+
+        return
+
+    async def _join(self, reader, writer):
+        subscriber = Subscriber(writer)
+        writer.write(self._snapshot())
+        self.subscribers.add(subscriber)
+        try:
+            await writer.drain()
+            while not subscriber.closed:
+                await subscriber.ready.wait()
+                subscriber.ready.clear()
+                if subscriber.stale:
+                    subscriber.stale = False
+                    self.resyncs += 1
+                    writer.write(self._snapshot())
+                while subscriber.queue:
+                    writer.write(subscriber.queue.popleft())
+                await writer.drain()
+        except ConnectionError:
+            pass
+        finally:
+            self.subscribers.discard(subscriber)
+            writer.close()
+
+        return
+
+
+class TableFeed():
+    """
+    Publishes the table to a SpectatorHub after every blackjack.emit()
+    event that can change it.
+
+    args:
+        hub (class):    SpectatorHub() object
+    """
+
+    def __init__(self, hub):
+        self.hub = hub
+        self.players = None
+        self.deck = None
+        self.results = {}
+
+    def start(self):
+        bj.listeners.append(self.on_event)
+        return
+
+    def stop(self):
+        if self.on_event in bj.listeners:
+            bj.listeners.remove(self.on_event)
+        return
+
+    def on_event(self, event, **data):
+        if event in SKIPPED:
+            return
+        if data.get('players') is not None:
+            self.players = data['players']
+        if data.get('deck') is not None:
+            self.deck = data['deck']
+        if event == 'settle':
+            self.results[id(data['hand'])] = data['winnings']
+        if self.players is None:
+            return
+
+        self.hub.publish(table_state(self.players, self.deck, self.results),
+                         event)
+        if event == 'round_end':
+            self.results = {}
+
+        return
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description='Play blackjack with a live spectator feed')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--queue', type=int, default=256,
+                        help='messages a spectator may fall behind')
+    args = parser.parse_args()
+
+    hub = SpectatorHub(args.host, args.port, args.queue)
+    hub.start()
+    feed = TableFeed(hub)
+    feed.start()
+    try:
+        bj.run()
+    finally:
+        feed.stop()
+        hub.stop()
+
+    return
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,245 @@
+#!/usr/bin/env python
+
+"""
+Strategy bots for blackjack.py
+
+A Strategy is handed the same information a human sees at each prompt
+and answers it in place of input_func().
+"""
+
+__author__ = "Kyle Long"
+__email__ = "long.kyle@gmail.com"
+__date__ = "08/26/2019"
+__copyright__ = "Copyright 2019, Kyle Long"
+__python_version__ = "3.7.4"
+
+
+import random
+
+HIT = 'h'
+STAY = 's'
+DOUBLE_DOWN = 'd'
+SPLIT = 'split'
+SURRENDER = 'r'
+
+# Basic strategy for a multi-deck shoe, dealer hits soft 17, double after
+# split allowed. Rows are keyed by player total, columns by dealer upcard
+# (2-10, Ace is 1). 'Ds' doubles if allowed, otherwise stays.
+_UPCARDS = (2, 3, 4, 5, 6, 7, 8, 9, 10, 1)
+
+
+def _row(actions):
+    return dict(zip(_UPCARDS, actions.split()))
+
+
+HARD_TABLE = {
+    8: _row('h h h h h h h h h h'),
+    9: _row('h d d d d h h h h h'),
+    10: _row('d d d d d d d d h h'),
+    11: _row('d d d d d d d d d d'),
+    12: _row('h h s s s h h h h h'),
+    13: _row('s s s s s h h h h h'),
+    14: _row('s s s s s h h h h h'),
+    15: _row('s s s s s h h h h h'),
+    16: _row('s s s s s h h h h h'),
+}
+
+SOFT_TABLE = {
+    13: _row('h h h d d h h h h h'),
+    14: _row('h h h d d h h h h h'),
+    15: _row('h h d d d h h h h h'),
+    16: _row('h h d d d h h h h h'),
+    17: _row('h d d d d h h h h h'),
+    18: _row('Ds Ds Ds Ds Ds s s h h h'),
+    19: _row('s s s s Ds s s s s s'),
+}
+
+# pair card value -> 'y' split, 'n' play the hand as a total, 's' stay
+PAIR_TABLE = {
+    1: _row('y y y y y y y y y y'),
+    2: _row('y y y y y y n n n n'),
+    3: _row('y y y y y y n n n n'),
+    4: _row('n n n y y n n n n n'),
+    5: _row('n n n n n n n n n n'),
+    6: _row('y y y y y n n n n n'),
+    7: _row('y y y y y y n n n n'),
+    8: _row('y y y y y y y y y y'),
+    9: _row('y y y y y s y y s s'),
+    10: _row('n n n n n n n n n n'),
+}
+
+
+class Strategy():
+    """
+    Base class for all bots. Flat bets one unit, never takes insurance,
+    and always stays. Subclasses override any of the three decisions.
+
+    args:
+        unit (int):     wager placed on every hand
+    """
+    name = 'Strategy'
+
+    def __init__(self, unit=10):
+        self.unit = unit
+
+    def new_shoe(self, seed):
+        """
+        Called by simulations before each shoe, so a bot with state of
+        its own (i.e. a random number generator) plays a shoe the same
+        way however the shoes are split between workers.
+
+        args:
+            seed (int):     seed of the shoe, see corpus.shoe_seed()
+        """
+        return
+
+    def wager(self, money, shoe):
+        """
+        args:
+            money (int):    gambler's balance
+            shoe (dict):    shoe_state() of the shoe before the deal
+
+        returns:
+            (int):          wager between 1 & money
+        """
+        return min(self.unit, money)
+
+    def insurance(self, hand, money):
+        """
+        args:
+            hand (class):   gambler's Hand() object
+            money (int):    gambler's balance
+
+        returns:
+            (bool):         True to take insurance
+        """
+        return False
+
+    def action(self, hand, upcard, options, money, shoe):
+        """
+        args:
+            hand (class):       gambler's Hand() object
+            upcard (class):     dealer's face up Card() object
+            options (list):     legal actions, i.e. ['s', 'h', 'd', 'split']
+            money (int):        gambler's balance
+            shoe (dict):        shoe_state() at the time of the decision
+
+        returns:
+            (str):              one of options
+        """
+        return STAY
+
+
+def basic_action(total, soft, dealer, options, pair=None):
+    """
+    Look up the basic strategy play for a hand.
+
+    args:
+        total (int):        best total of the hand
+        soft (bool):        True if an Ace is being counted as 11
+        dealer (int):       dealer's upcard value (Ace is 1)
+        options (list):     legal actions, i.e. ['s', 'h', 'd', 'split']
+        pair (int):         card value if the hand is a pair
+
+    returns:
+        (str):              one of options
+    """
+    if SPLIT in options and pair is not None:
+        split = PAIR_TABLE[pair][dealer]
+        if split == 'y':
+            return SPLIT
+        if split == 's':
+            return STAY
+
+    if soft and total < 20:
+        play = SOFT_TABLE.get(total, {}).get(dealer, HIT)
+    elif total >= 17:
+        play = STAY
+    else:
+        play = HARD_TABLE.get(total, {}).get(dealer, HIT)
+
+    if play in (DOUBLE_DOWN, 'Ds'):
+        if DOUBLE_DOWN in options:
+            return DOUBLE_DOWN
+        return STAY if play == 'Ds' else HIT
+
+    return play
+
+
+class BasicStrategy(Strategy):
+    """
+    Plays the basic strategy tables above.
+    """
+    name = 'Basic Strategy'
+
+    def action(self, hand, upcard, options, money, shoe):
+        values = hand.get_hand_value()
+        pair = hand.cards[0].value if SPLIT in options else None
+
+        return basic_action(values[-1], len(values) == 2, upcard.value,
+                            options, pair)
+
+
+class MimicDealerStrategy(Strategy):
+    """
+    Hits until 17 or more, never doubles or splits.
+    """
+    name = 'Mimic the Dealer'
+
+    def action(self, hand, upcard, options, money, shoe):
+        if hand.get_hand_value()[-1] < 17:
+            return HIT
+        return STAY
+
+
+class RandomStrategy(Strategy):
+    """
+    Picks a random legal action & wager. Useful for exercising the
+    engine rather than for winning.
+
+    args:
+        unit (int):     largest wager placed
+        seed (int):     optional seed for repeatable choices
+    """
+    name = 'Random'
+
+    def __init__(self, unit=10, seed=None):
+        Strategy.__init__(self, unit)
+        self.seed = seed
+        self.rng = random.Random(seed)
+
+    def new_shoe(self, seed):
+        if self.seed is not None:
+            self.rng = random.Random(f'{self.seed}-{seed}')
+        return
+
+    def wager(self, money, shoe):
+        return self.rng.randint(1, min(self.unit, money))
+
+    def insurance(self, hand, money):
+        return self.rng.random() < 0.5
+
+    def action(self, hand, upcard, options, money, shoe):
+        return self.rng.choice(options)
+
+
+class CountingStrategy(BasicStrategy):
+    """
+    Plays basic strategy & sizes wagers with a bet ramp on the hi-lo
+    true count.
+
+    args:
+        ramp (tuple):   wager for each true count, starting at a true
+                        count of 0 or less. Counts past the end of the
+                        ramp bet the last wager
+    """
+    name = 'Counting'
+
+    def __init__(self, ramp=(10, 20, 40, 80)):
+        BasicStrategy.__init__(self, unit=ramp[0])
+        self.ramp = tuple(ramp)
+        self.name = f'Ramp {"-".join(str(w) for w in self.ramp)}'
+
+    def wager(self, money, shoe):
+        index = min(max(int(shoe['true_count']), 0), len(self.ramp) - 1)
+        return min(self.ramp[index], money)
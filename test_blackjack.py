@@ -12,7 +12,9 @@ __python_version__ = "3.7.4"
 
 
 import unittest
+from unittest import mock
 import blackjack as bj
+import strategy as st
 from blackjack import Card, Deck, Hand, Dealer, Gambler
 
 
@@ -90,6 +92,225 @@ class TestBlackjack(unittest.TestCase):
         dealer.hands[0].cards[1].value = 5
         self.assertFalse(bj.check_dealer_for_blackjack([dealer]))
 
+    def test_strategy_decisions(self):
+        """
+        Make sure a gambler with a strategy bot is never prompted
+        and that the bot's wager & actions are used.
+        """
+        from strategy import Strategy
+
+        gambler = Gambler('Bot', strategy=Strategy(unit=30))
+        gambler.money = 500
+        players = [gambler, Dealer()]
+
+        deck = Deck(num_decks=1)
+        deck.create()
+        deck.shuffle(seed=3)
+        with bj.quiet():
+            bj.deal(players, deck)
+            self.assertEqual(gambler.hands[0].wager, 30)
+            bj.print_cards(players)
+            if not bj.check_dealer_for_blackjack(players):
+                bj.play_hands(players, deck)
+
+        # base Strategy always stays
+        self.assertEqual(len(gambler.hands[0].cards), 2)
+        self.assertIsNotNone(gambler.hands[0].final_value)
+
+    def test_play(self):
+        """
+        Make sure play() loops round after round without recursing
+        and stops once every gambler has left the table.
+        """
+        from strategy import BasicStrategy
+
+        gambler = Gambler('Bot', strategy=BasicStrategy())
+        gambler.money = 500
+        players = [gambler, Dealer()]
+        rounds = []
+        bj.listeners.append(lambda event, **data: rounds.append(event))
+
+        answers = ['y', 'y', 'n']
+        try:
+            with mock.patch('builtins.input', side_effect=answers), \
+                    bj.quiet():
+                bj.play(players, Deck(num_decks=1))
+        finally:
+            bj.listeners.clear()
+
+        self.assertEqual(len(players), 1)
+        self.assertEqual(rounds.count('round_end'), 3)
+        self.assertEqual(rounds.count('shuffle'), 1)
+
+    def test_shoe_state(self):
+        """
+        Make sure the running count tracks dealt cards and leaves
+        out the dealer's hole card until it is revealed.
+        """
+        dealer = Dealer()
+        hand = Hand()
+        dealer.hands.append(hand)
+
+        deck = Deck(num_decks=1)
+        deck.cards = [Card('Hearts', 'Five', 5), Card('Hearts', 'King', 10)]
+        hand.deal_card(deck)
+        hand.deal_card(deck)
+        hand.cards[0].hidden = True
+
+        state = bj.shoe_state(deck, [dealer])
+        self.assertEqual(state['cards_remaining'], 0)
+        self.assertEqual(state['running_count'], 1)
+
+        hand.cards[0].hidden = False
+        self.assertEqual(bj.shoe_state(deck, [dealer])['running_count'], 0)
+
+    def test_input_func(self):
+        """
+        Make sure responses are case-insensitive, come back in their
+        short form, and that responses typed ahead on one line answer
+        the following prompts.
+        """
+        options = ['s', 'h', 'd']
+        with mock.patch('builtins.input', side_effect=['Double Down']), \
+                bj.quiet():
+            self.assertEqual(bj.input_func('?', str, str_options=options),
+                             'd')
+
+        with mock.patch('builtins.input', side_effect=['25 HIT s']), \
+                bj.quiet():
+            self.assertEqual(bj.input_func('?', int, 1, 500), 25)
+            self.assertEqual(bj.input_func('?', str, str_options=options),
+                             'h')
+            self.assertEqual(bj.input_func('?', str, str_options=options),
+                             's')
+        self.assertFalse(bj.input_queue)
+
+        # an invalid queued response clears the rest of the queue
+        with mock.patch('builtins.input', side_effect=['split h', 'y']), \
+                bj.quiet():
+            self.assertEqual(bj.input_func('?', str, str_options=bj.YES_NO),
+                             'y')
+        self.assertFalse(bj.input_queue)
+
+    def test_wager_zero(self):
+        """
+        Make sure a wager of 0 only sits a player out when wagers have
+        a deadline, & is refused as a typo otherwise.
+        """
+        gambler = Gambler('Ann')
+        gambler.money = 500
+        players = [gambler, Dealer()]
+        deck = Deck(num_decks=1)
+        deck.create()
+        deck.shuffle(seed=3)
+
+        with mock.patch('builtins.input', side_effect=['0', '15']), \
+                bj.quiet():
+            bj.deal(players, deck)
+        self.assertEqual(gambler.hands[0].wager, 15)
+        bj.reset_hands(players)
+
+        timeouts = dict(bj.TIMEOUTS)
+        bj.TIMEOUTS.update(wager=30)
+        try:
+            with mock.patch('blackjack.read_line', return_value='0'), \
+                    bj.quiet():
+                bj.deal(players, deck)
+        finally:
+            bj.TIMEOUTS.update(timeouts)
+        self.assertFalse(gambler.hands)
+
+    def test_input_queue_per_player(self):
+        """
+        Make sure responses typed ahead by one player only answer their
+        own prompts, not the next player's.
+        """
+        ann = Gambler('Ann')
+        bob = Gambler('Bob')
+        ann.money = bob.money = 500
+        players = [ann, bob, Dealer()]
+
+        deck = Deck(num_decks=1)
+        deck.create()
+        deck.shuffle(seed=3)
+        prompts = mock.Mock(side_effect=['10 10', '20'])
+        with mock.patch('builtins.input', prompts), bj.quiet():
+            bj.deal(players, deck)
+
+        self.assertEqual(ann.hands[0].wager, 10)
+        self.assertEqual(bob.hands[0].wager, 20)
+        self.assertEqual(prompts.call_count, 2)
+        self.assertFalse(bj.input_queue)
+
+    def test_timeouts(self):
+        """
+        Make sure a prompt with a deadline reads a line in time, takes
+        the default when it runs out, and that an idle player repeats
+        their last wager or sits out.
+        """
+        import os
+        import sys
+        import metrics
+
+        # a real pipe stands in for the terminal
+        read, write = os.pipe()
+        stdin = os.fdopen(read)
+        try:
+            with mock.patch.object(sys, 'stdin', stdin), bj.quiet():
+                self.assertIsNone(bj.read_line('?', 0.01))
+                os.write(write, b'h\n')
+                self.assertEqual(bj.read_line('?', 5), 'h')
+        finally:
+            stdin.close()
+            os.close(write)
+
+        table_metrics = metrics.TableMetrics('test')
+        table_metrics.start()
+        timeouts = dict(bj.TIMEOUTS)
+        bj.TIMEOUTS.update(wager=0.5, insurance=0.5)
+        try:
+            with mock.patch('blackjack.read_line', return_value=None), \
+                    bj.quiet():
+                self.assertEqual(bj.input_func('?', str, str_options='yn',
+                                               kind='insurance',
+                                               default='n'), 'n')
+
+                # no last wager, so the idle player sits out while the
+                # bot plays on
+                idle = Gambler('Idle')
+                idle.money = 100
+                bot = Gambler('Bot', strategy=st.Strategy())
+                bot.money = 100
+                players = [idle, bot, Dealer()]
+                deck = Deck()
+                deck.create()
+                deck.shuffle(1)
+                bj.play_round(players, deck)
+                self.assertEqual(idle.money, 100)
+                self.assertNotEqual(bot.money, 100)
+
+                idle.last_wager = 20
+                bj.deal(players, deck)
+                self.assertEqual(idle.hands[0].wager, 20)
+                self.assertEqual(idle.timeouts, 2)
+                bj.reset_hands(players)
+
+                # idle for long enough, they stop betting & leave
+                bj.TIMEOUTS.update(play_again=0.5)
+                idle.timeouts = bj.IDLE_TIMEOUTS
+                bj.deal(players, deck)
+                self.assertFalse(idle.hands)
+                bj.reset_hands(players)
+                bj.play_again(players, deck)
+            self.assertNotIn(idle, players)
+        finally:
+            bj.TIMEOUTS.update(timeouts)
+            table_metrics.stop()
+
+        values = table_metrics.snapshot()
+        self.assertEqual(values['timeouts'], 6)
+        self.assertTrue(values['rounds_per_hour'] > 0)
+
     def test_flatten_list(self):
         """
         Create nested list & flatten it using flatten_list.
@@ -226,6 +447,136 @@ class TestBlackjack(unittest.TestCase):
         bj.settle_up(players)
         self.assertEqual(player.money, 652.5)
 
+    def test_ledger(self):
+        """
+        Make sure balances are kept in exact integer cents & a round
+        with several hands settles in one pass.
+        """
+        from rules import TableRules
+
+        gambler = Gambler('Test')
+        gambler.money = 0.1
+        for _ in range(10):
+            gambler.money += 0.1
+        self.assertEqual(gambler.cents, 110)
+        self.assertEqual(gambler.money, 1.1)
+        gambler.money = 500
+        self.assertEqual(gambler.money, 500)
+        self.assertIsInstance(gambler.money, int)
+
+        # 6:5 on a $1 wager pays exactly $1.20
+        rules = TableRules(blackjack_pays=1.2)
+        hand = Hand()
+        hand.wager = 1
+        hand.blackjack = True
+        self.assertEqual(bj.hand_result(hand, False, rules), 120)
+
+        # a split hand winning, a pushed hand & an insured blackjack
+        dealer = Dealer()
+        dealer.hands.append(Hand())
+        gambler.hands = [Hand(), Hand(), Hand()]
+        for wager, hand in zip((15, 15, 7), gambler.hands):
+            hand.wager = wager
+        gambler.hands[0].win = True
+        gambler.hands[1].push = True
+        gambler.hands[2].blackjack = True
+        gambler.hands[2].insurance = True
+
+        settled = []
+        bj.listeners.append(lambda event, **data: settled.append(data)
+                            if event == 'settle' else None)
+        try:
+            with bj.quiet():
+                bj.settle_up([gambler, dealer], rules)
+        finally:
+            bj.listeners.pop()
+
+        # 15 + 0 + 7 * 1.2 - 7 * 0.5
+        self.assertEqual(gambler.cents, 50000 + 1500 + 840 - 350)
+        self.assertEqual(gambler.money, 519.9)
+        self.assertEqual([data['cents'] for data in settled],
+                         [1500, 0, 490])
+        self.assertEqual(settled[2]['winnings'], 4.9)
+
+    def test_table_rules(self):
+        """
+        Make sure the dealer, payouts & offered actions follow the
+        table's rules.
+        """
+        from rules import TableRules
+        from strategy import Strategy
+
+        # dealer stands on a soft 17 (A, 6) under S17
+        deck = Deck()
+        deck.create()
+        dealer = Dealer()
+        dealer_hand = Hand()
+        dealer_hand.cards = [Card('Hearts', 'Ace', 1),
+                             Card('Hearts', 'Six', 6)]
+        dealer.hands.append(dealer_hand)
+        gambler = Gambler('Test')
+        gambler_hand = Hand()
+        gambler_hand.final_value = 18
+        gambler.hands.append(gambler_hand)
+        players = [gambler, dealer]
+        with bj.quiet():
+            bj.determine_winners(players, deck, TableRules(hit_soft_17=False))
+        self.assertEqual(len(dealer_hand.cards), 2)
+        self.assertTrue(gambler_hand.win)
+
+        # 6:5 blackjack & late surrender
+        gambler.money = 500
+        gambler_hand.win = False
+        gambler_hand.blackjack = True
+        gambler_hand.wager = 10
+        with bj.quiet():
+            bj.settle_up(players, TableRules(blackjack_pays=1.2))
+        self.assertEqual(gambler.money, 512)
+        gambler_hand.blackjack = False
+        gambler_hand.surrender = True
+        with bj.quiet():
+            bj.settle_up(players)
+        self.assertEqual(gambler.money, 507)
+
+        # offered actions on a pair of Aces, then on a split Ace hand
+        class Recorder(Strategy):
+            def action(self, hand, upcard, options, money, shoe):
+                seen.append(options)
+                return 'split' if len(seen) == 1 else 's'
+
+        rules = TableRules(late_surrender=True, double_after_split=False,
+                           resplit_aces=False)
+        gambler = Gambler('Bot', strategy=Recorder())
+        gambler.money = 500
+        hand = Hand()
+        hand.wager = 10
+        hand.cards = [Card('Hearts', 'Ace', 1), Card('Clubs', 'Ace', 1)]
+        gambler.hands.append(hand)
+        dealer = Dealer()
+        dealer.hands.append(Hand())
+        dealer.hands[0].cards = [Card('Hearts', 'Ten', 10),
+                                 Card('Clubs', 'Nine', 9)]
+        deck = Deck()
+        deck.cards = [Card('Spades', 'Two', 2), Card('Spades', 'Ace', 1)]
+        seen = []
+        with bj.quiet():
+            bj.play_hands([gambler, dealer], deck, rules)
+
+        self.assertEqual(seen[0], ['s', 'h', 'd', 'split', 'r'])
+        # a second Ace can't be resplit, no doubles or surrender
+        self.assertEqual(seen[1], ['s', 'h'])
+
+        # split Aces get one card each when they can't be hit
+        gambler.hands = [hand]
+        hand.cards = [Card('Hearts', 'Ace', 1), Card('Clubs', 'Ace', 1)]
+        deck.cards = [Card('Spades', 'Two', 2), Card('Spades', 'Five', 5)]
+        seen = []
+        with bj.quiet():
+            bj.play_hands([gambler, dealer], deck,
+                          TableRules(hit_split_aces=False))
+        self.assertEqual(len(seen), 1)
+        self.assertEqual([h.final_value for h in gambler.hands], [16, 13])
+
     def reset_hand_attrs(self, hand):
         """
         Non-test method that resets a hand to it's original
@@ -284,6 +635,22 @@ class TestDeck(unittest.TestCase):
         deck2.shuffle()
         self.assertNotEqual(deck1, deck2)
 
+    def test_seeded_shuffle(self):
+        """
+        Make sure a seed replays the same shoe order and that its
+        antithetic shoe is a different order of the same cards.
+        """
+        orders = []
+        for antithetic in (False, False, True):
+            deck = Deck(num_decks=2)
+            deck.create()
+            deck.shuffle(seed=42, antithetic=antithetic)
+            orders.append([c.get_card_str() for c in deck.cards])
+
+        self.assertEqual(orders[0], orders[1])
+        self.assertNotEqual(orders[0], orders[2])
+        self.assertEqual(sorted(orders[0]), sorted(orders[2]))
+
 
 class TestHand(unittest.TestCase):
 
@@ -0,0 +1,96 @@
+#!/usr/bin/env python
+
+"""
+unittests for corpus.py
+"""
+
+__author__ = "Kyle Long"
+__email__ = "long.kyle@gmail.com"
+__date__ = "08/26/2019"
+__copyright__ = "Copyright 2019, Kyle Long"
+__python_version__ = "3.7.4"
+
+
+import os
+import tempfile
+import unittest
+import corpus
+import simulation as sim
+import strategy as st
+from blackjack import Deck
+
+
+class TestCorpus(unittest.TestCase):
+
+    def setUp(self):
+        fd, self.path = tempfile.mkstemp(suffix='.shoes')
+        os.close(fd)
+        corpus.write_corpus(self.path, shoes=10, num_decks=2, seed=5)
+
+    def tearDown(self):
+        os.remove(self.path)
+
+    def test_shoe(self):
+        """
+        Make sure each shoe in the corpus is the same order a seeded
+        shuffle gives & that Deck.load() restores it.
+        """
+        with corpus.ShoeCorpus(self.path) as shoes:
+            self.assertEqual(len(shoes), 10)
+            self.assertEqual(shoes.num_decks, 2)
+
+            deck = Deck(num_decks=2)
+            deck.create()
+            deck.shuffle(corpus.shoe_seed(5, 3))
+            loaded = Deck(num_decks=2)
+            with shoes.shoe(3) as order:
+                self.assertEqual(bytes(order), deck.card_ids())
+                loaded.load(order)
+            self.assertEqual([c.get_card_str() for c in loaded.cards],
+                             [c.get_card_str() for c in deck.cards])
+
+            with self.assertRaises(IndexError):
+                shoes.shoe(10)
+
+    def test_shoe_seed(self):
+        """
+        Make sure no two (seed, shoe) pairs share a shoe seed.
+        """
+        self.assertNotEqual(corpus.shoe_seed(0, 1000003),
+                            corpus.shoe_seed(1, 0))
+        last = (1 << corpus.SHOE_BITS) - 1
+        self.assertNotEqual(corpus.shoe_seed(0, last),
+                            corpus.shoe_seed(1, 0))
+        seeds = {corpus.shoe_seed(seed, shoe)
+                 for seed in range(20) for shoe in range(50)}
+        self.assertEqual(len(seeds), 20 * 50)
+
+        for seed, shoe in ((0, last + 1), (0, -1), (-1, 0)):
+            with self.assertRaises(ValueError):
+                corpus.shoe_seed(seed, shoe)
+
+    def test_partition(self):
+        """
+        Make sure every shoe belongs to exactly one worker.
+        """
+        with corpus.ShoeCorpus(self.path) as shoes:
+            indexes = []
+            for worker in range(3):
+                indexes.extend(shoes.partition(worker, 3))
+            self.assertEqual(indexes, list(range(10)))
+
+    def test_tournament(self):
+        """
+        Make sure a tournament played from the corpus matches one
+        played from the same seeded shuffles.
+        """
+        bots = [st.BasicStrategy()]
+        seeded = sim.run_tournament(bots, shoes=3, num_decks=2, seed=5,
+                                    processes=1)
+        mapped = sim.run_tournament(bots, shoes=3, processes=1,
+                                    corpus=self.path)
+        self.assertEqual(seeded, mapped)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,155 @@
+#!/usr/bin/env python
+
+"""
+unittests for dataset.py
+"""
+
+__author__ = "Kyle Long"
+__email__ = "long.kyle@gmail.com"
+__date__ = "08/26/2019"
+__copyright__ = "Copyright 2019, Kyle Long"
+__python_version__ = "3.7.4"
+
+
+import os
+import unittest
+import tempfile
+from unittest import mock
+import blackjack as bj
+import dataset as ds
+import simulation as sim
+import strategy as st
+from blackjack import Card, Deck, Dealer, Gambler
+
+
+class TestDataset(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmp.name, 'decisions')
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_append(self):
+        """
+        Make sure rows are chunked, survive reopening the writer, and
+        read back in order from the mapped columns.
+        """
+        rows = [(12 + i % 9, i % 2, 0, 1 + i % 10, i / 4, i % 7, i * 100)
+                for i in range(16)]
+        writer = ds.DecisionWriter(self.path, chunk_rows=5, buffer_rows=3)
+        for row in rows[:12]:
+            writer.append(row)
+        writer.close()
+        writer = ds.DecisionWriter(self.path, chunk_rows=5, buffer_rows=3)
+        for row in rows[12:]:
+            writer.append(row)
+        writer.close()
+
+        with ds.Dataset(self.path) as data:
+            self.assertEqual(len(data.chunks), 4)
+            self.assertEqual(len(data), 16)
+            self.assertEqual(list(data.rows()), rows)
+            results = [v for view in data.column('result') for v in view]
+        self.assertEqual(results, [row[6] for row in rows])
+
+    def test_close(self):
+        """
+        Make sure close() releases the views it handed out & unmaps a
+        file once the last view made from it is gone.
+        """
+        writer = ds.DecisionWriter(self.path, chunk_rows=5)
+        for i in range(8):
+            writer.append((12, 0, 0, 10, 0.0, 0, i))
+        writer.close()
+
+        data = ds.Dataset(self.path)
+        first, second = data.column('result')
+        kept = second[:2]
+        self.assertEqual(data.close(), 1)
+        with self.assertRaises(ValueError):
+            first[0]
+        self.assertEqual(list(kept), [5, 6])
+
+        kept.release()
+        self.assertEqual(data.close(), 0)
+        self.assertEqual(data._maps, [])
+
+    def test_split_result(self):
+        """
+        Make sure a split is credited with the results of both hands.
+        """
+        class Splitter(st.Strategy):
+            def action(self, hand, upcard, options, money, shoe):
+                return st.SPLIT if st.SPLIT in options else st.STAY
+
+        gambler = Gambler('Bot', strategy=Splitter())
+        gambler.money = 500
+        players = [gambler, Dealer()]
+        deck = Deck()
+        # dealt from the end: 8, 8 to the gambler, 10 & 9 to the dealer,
+        # then a King & an Ace to the split hands
+        deck.cards = [Card('Hearts', 'Two', 2), Card('Spades', 'Ace', 1),
+                      Card('Spades', 'King', 10), Card('Clubs', 'Nine', 9),
+                      Card('Clubs', 'Ten', 10), Card('Clubs', 'Eight', 8),
+                      Card('Hearts', 'Eight', 8)]
+
+        writer = ds.DecisionWriter(self.path)
+        recorder = ds.DecisionRecorder(writer, deck)
+        recorder.start()
+        try:
+            with bj.quiet():
+                bj.play_round(players, deck)
+        finally:
+            recorder.stop()
+            writer.close()
+
+        with ds.Dataset(self.path) as data:
+            rows = list(data.rows())
+        split, stay_1, stay_2 = rows
+        self.assertEqual(split[:4], (16, 0, 1, 9))
+        self.assertEqual(split[5], ds.DECISIONS.index(st.SPLIT))
+        self.assertEqual(split[6], -1000)
+        self.assertEqual((stay_1[0], stay_1[6]), (18, -1000))
+        self.assertEqual((stay_2[0], stay_2[1], stay_2[6]), (19, 1, 0))
+
+    def test_export(self):
+        """
+        Make sure an export logs every decision & more shoes can be
+        added later.
+        """
+        bot = st.RandomStrategy(seed=4)
+        rows = ds.export(bot, self.path, 0, 2, num_decks=1, processes=1)
+        rows += ds.export(bot, self.path, 2, 3, num_decks=1, processes=1)
+        with self.assertRaises(FileExistsError):
+            ds.export(bot, self.path, 0, 1, num_decks=1, processes=1)
+
+        with ds.Dataset(self.path) as data:
+            self.assertEqual(len(data), rows)
+            actions = set()
+            for total, soft, pair, upcard, count, action, result in \
+                    data.rows():
+                self.assertTrue(2 <= total <= 21)
+                self.assertTrue(1 <= upcard <= 10)
+                actions.add(ds.DECISIONS[action])
+        self.assertTrue({st.STAY, st.HIT} <= actions)
+
+    def test_export_processes(self):
+        """
+        Make sure a seeded bot exports the same rows however the shoes
+        are split across processes.
+        """
+        exported = []
+        for processes in (1, 2):
+            path = os.path.join(self.tmp.name, f'decisions-{processes}')
+            with mock.patch.object(sim, 'CHUNK_SHOES', 2):
+                ds.export(st.RandomStrategy(seed=7), path, 0, 6,
+                          num_decks=1, processes=processes)
+            with ds.Dataset(path) as data:
+                exported.append(list(data.rows()))
+        self.assertEqual(exported[0], exported[1])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,161 @@
+#!/usr/bin/env python
+
+"""
+unittests for distributed.py
+"""
+
+__author__ = "Kyle Long"
+__email__ = "long.kyle@gmail.com"
+__date__ = "08/26/2019"
+__copyright__ = "Copyright 2019, Kyle Long"
+__python_version__ = "3.7.4"
+
+
+import os
+import unittest
+from unittest import mock
+from multiprocessing.connection import Client
+import distributed as dist
+import simulation as sim
+import strategy as st
+from rules import TableRules
+
+
+class TestDistributed(unittest.TestCase):
+
+    def setUp(self):
+        self.bots = [st.BasicStrategy(), st.MimicDealerStrategy()]
+        self.expected = sim.play_shoes(self.bots, 0, 12, num_decks=1,
+                                       processes=1)
+
+    def run_workers(self, coordinator, workers):
+        coordinator.serve()
+        processes = dist.spawn_workers(coordinator.address, workers)
+        try:
+            return coordinator.wait(timeout=60)
+        finally:
+            for process in processes:
+                process.wait(timeout=10)
+
+    def test_local_workers(self):
+        """
+        Make sure subprocess workers produce exactly the totals of a
+        local simulation.
+        """
+        coordinator = dist.Coordinator(self.bots, 12, num_decks=1,
+                                       chunk_shoes=12)
+        totals = self.run_workers(coordinator, workers=3)
+        self.assertEqual(totals, self.expected)
+        self.assertEqual(coordinator.merged, [12, 12])
+
+    def test_redispatch(self):
+        """
+        Make sure a chunk held by a worker that disconnects is played
+        by another worker.
+        """
+        coordinator = dist.Coordinator(self.bots, 12, num_decks=1,
+                                       chunk_shoes=4)
+        coordinator.serve()
+
+        # take a chunk, then vanish without a result
+        conn = Client(coordinator.address, authkey=dist.authkey())
+        conn.send(('ready',))
+        self.assertEqual(conn.recv()[0], 'chunk')
+        conn.close()
+
+        totals = self.run_workers(coordinator, workers=1)
+        self.assertEqual(totals, self.expected)
+        self.assertEqual(coordinator.stats['redispatched'], 1)
+
+    def test_steal(self):
+        """
+        Make sure an idle worker splits the largest running chunk, and
+        the split off half is played separately.
+        """
+        coordinator = dist.Coordinator(self.bots[:1], 12, num_decks=1,
+                                       chunk_shoes=12)
+        coordinator.serve()
+        key = dist.authkey()
+
+        victim = Client(coordinator.address, authkey=key)
+        victim.send(('ready',))
+        chunk = victim.recv()
+        self.assertEqual(chunk[5:7], (0, 12))
+
+        thief = Client(coordinator.address, authkey=key)
+        thief.send(('ready',))
+        self.assertEqual(thief.recv()[0], 'wait')
+        thief.close()
+
+        # the victim agrees to stop at shoe 6
+        split = victim.recv()
+        self.assertEqual(split, ('split', chunk[1], 6))
+        victim.send(split)
+        victim.send(('ready',))
+        self.assertEqual(victim.recv()[5:7], (6, 12))
+        victim.close()
+
+        totals = self.run_workers(coordinator, workers=1)
+        self.assertEqual(totals, self.expected[:1])
+        self.assertEqual(coordinator.stats['splits'], 1)
+
+
+    def test_rules(self):
+        """
+        Make sure workers play the coordinator's table rules.
+        """
+        rules = TableRules(hit_soft_17=False, blackjack_pays=1.2)
+        expected = sim.play_shoes(self.bots, 0, 12, num_decks=1,
+                                  processes=1, rules=rules)
+        self.assertNotEqual(expected, self.expected)
+        coordinator = dist.Coordinator(self.bots, 12, num_decks=1,
+                                       chunk_shoes=6, rules=rules)
+        self.assertEqual(self.run_workers(coordinator, workers=2), expected)
+
+    def test_bad_result(self):
+        """
+        Make sure a result for the wrong shoes is thrown away & its
+        chunk played again, without stopping the coordinator.
+        """
+        coordinator = dist.Coordinator(self.bots, 12, num_decks=1,
+                                       chunk_shoes=12)
+        coordinator.serve()
+
+        conn = Client(coordinator.address, authkey=dist.authkey())
+        conn.send(('ready',))
+        chunk = conn.recv()
+        with mock.patch('sys.stderr'):
+            conn.send(('result', chunk[1], 0, 3, 1, 100, 10000))
+            conn.send(('ready',))
+            self.assertEqual(conn.recv()[5:7], (0, 12))
+        conn.close()
+
+        totals = self.run_workers(coordinator, workers=1)
+        self.assertEqual(totals, self.expected)
+        self.assertEqual(coordinator.stats['rejected'], 1)
+
+    def test_random_bot(self):
+        """
+        Make sure a bot with its own random state gets the same results
+        however the shoes are chunked.
+        """
+        bots = [st.RandomStrategy(seed=2)]
+        expected = sim.play_shoes(bots, 0, 12, num_decks=1, processes=1)
+        coordinator = dist.Coordinator(bots, 12, num_decks=1,
+                                       chunk_shoes=5)
+        self.assertEqual(self.run_workers(coordinator, workers=2), expected)
+
+    def test_public_bind(self):
+        """
+        Make sure the default key can't be used off loopback.
+        """
+        with mock.patch.dict('os.environ'):
+            os.environ.pop('BLACKJACK_AUTHKEY', None)
+            with self.assertRaises(ValueError):
+                dist.Coordinator(self.bots, 12, host='0.0.0.0')
+        self.assertTrue(dist.is_loopback('127.0.0.1'))
+        self.assertFalse(dist.is_loopback('example.com'))
+
+
+if __name__ == '__main__':
+    unittest.main()
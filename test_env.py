@@ -0,0 +1,137 @@
+#!/usr/bin/env python
+
+"""
+unittests for env.py
+"""
+
+__author__ = "Kyle Long"
+__email__ = "long.kyle@gmail.com"
+__date__ = "08/26/2019"
+__copyright__ = "Copyright 2019, Kyle Long"
+__python_version__ = "3.7.4"
+
+
+import random
+import unittest
+import env
+import kernel
+from rules import PRESETS, TableRules
+
+
+class TestEnv(unittest.TestCase):
+
+    def test_vector_matches_engine(self):
+        """
+        Make sure a single table VectorEnv sees the same observations &
+        pays the same rewards as the engine driven BlackjackEnv, with
+        splits & surrenders played under each preset's rules.
+        """
+        for name, rules in PRESETS.items():
+            scalar = env.BlackjackEnv(num_decks=2, seed=5, wagers=(10, 20),
+                                      composition=True, rules=rules)
+            vector = env.VectorEnv(1, num_decks=2, seed=5, wagers=(10, 20),
+                                   composition=True, rules=rules)
+            rng = random.Random(1)
+            vector_obs = tuple(vector.reset())
+            for _ in range(200):
+                obs = scalar.reset()
+                self.assertEqual(vector_obs, obs, name)
+                done = False
+                while not done:
+                    if obs[0] == env.BET:
+                        action = rng.randrange(2)
+                    elif obs[0] == env.PLAY:
+                        # split whenever it's allowed, to reach resplits
+                        action = 3 if 3 in scalar.legal else \
+                            rng.choice(scalar.legal)
+                    else:
+                        action = 0
+                    obs, reward, done, info = scalar.step(action)
+                    vector_obs, rewards, dones = vector.step([action])
+                    vector_obs = tuple(vector_obs)
+                    self.assertEqual(dones[0], done, name)
+                    self.assertEqual(rewards[0], reward, name)
+                    if not done:
+                        self.assertEqual(vector_obs, obs, name)
+            scalar.close()
+
+    def test_engine_rules(self):
+        """
+        Make sure the engine's splits & surrenders are offered & paid.
+        """
+        scalar = env.BlackjackEnv(num_decks=1, seed=2,
+                                  rules=TableRules(late_surrender=True))
+        split = surrender = False
+        for _ in range(500):
+            obs = scalar.reset()
+            if obs[0] != env.PLAY:
+                scalar.step(0)
+                continue
+            if 3 in scalar.legal and not split:
+                obs, reward, done, info = scalar.step(3)
+                self.assertEqual(info['hands'], 2)
+                split = True
+                while not done:
+                    obs, reward, done, info = scalar.step(0)
+            elif not surrender:
+                self.assertIn(4, scalar.legal)
+                obs, reward, done, info = scalar.step(4)
+                self.assertTrue(done)
+                self.assertEqual(reward, -5)
+                surrender = True
+            else:
+                with self.assertRaises(ValueError):
+                    scalar.step(3 if 3 not in scalar.legal else 9)
+                scalar.step(0)
+            if split and surrender:
+                break
+        self.assertTrue(split and surrender)
+        scalar.close()
+        self.assertIsNone(scalar._thread)
+
+    def test_vector_env(self):
+        """
+        Make sure tables step independently, finished tables start a
+        new round, and illegal actions are refused.
+        """
+        vector = env.VectorEnv(50, num_decks=1, seed=3)
+        obs = vector.reset()
+        self.assertEqual(len(obs), 50 * len(env.FIELDS))
+        settled = 0
+        total = 0.0
+        for _ in range(200):
+            obs, rewards, dones = vector.step([1 if obs[i * 8 + 1] < 12
+                                               else 0 for i in range(50)])
+            settled += sum(dones)
+            total += sum(rewards)
+        self.assertTrue(settled > 50)
+        self.assertTrue(-10 * settled < total < 10 * settled)
+
+        vector.reset()
+        while vector.phase[0] != env.PLAY:
+            vector.step([0] * 50)
+        vector.step([1] + [0] * 49)
+        if vector.phase[0] == env.PLAY:
+            legal = vector.legal()
+            self.assertEqual(list(legal[0][:2]), [1, 1])
+            self.assertEqual(list(legal[0][2:]), [0, 0, 0])
+            with self.assertRaises(ValueError):
+                vector.step([2] + [0] * 49)
+
+    def test_vector_shoe_bounds(self):
+        """
+        Make sure a table never deals past the end of its own shoe.
+        """
+        with self.assertRaises(ValueError):
+            env.VectorEnv(2, num_decks=1, penetration=1.0)
+
+        tables = env.VectorEnv(2, num_decks=1, penetration=0.99)
+        tables.reset()
+        with self.assertRaises(IndexError):
+            for _ in range(1000):
+                tables.step([kernel.HIT] * 2)
+        self.assertTrue(min(tables.cursor) >= 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,72 @@
+#!/usr/bin/env python
+
+"""
+unittests for fuzz.py
+"""
+
+__author__ = "Kyle Long"
+__email__ = "long.kyle@gmail.com"
+__date__ = "08/26/2019"
+__copyright__ = "Copyright 2019, Kyle Long"
+__python_version__ = "3.7.4"
+
+
+import unittest
+from unittest import mock
+import fuzz
+import blackjack as bj
+from rules import PRESETS
+
+
+class TestFuzz(unittest.TestCase):
+
+    def test_fuzz(self):
+        """
+        Make sure randomized rounds keep every invariant.
+        """
+        self.assertEqual(fuzz.fuzz(200, seed=0, processes=1), [])
+
+    def test_shrink(self):
+        """
+        Break settle_up() & make sure the fuzzer catches it and shrinks
+        the failure to a single gambler that replays from its seed.
+        """
+        with mock.patch.object(bj, 'settle_up', lambda players, rules: None):
+            failures = fuzz.fuzz(20, seed=0, processes=1)
+            self.assertEqual(len(failures), 1)
+
+            failure = failures[0]
+            self.assertEqual(failure['num_gamblers'], 1)
+            self.assertIn('balance moved by', failure['error'])
+
+            error, _ = fuzz.check_round(failure['seed'], failure['traces'],
+                                        failure['num_gamblers'])
+            self.assertEqual(error, failure['error'])
+
+    def test_rules(self):
+        """
+        Make sure the fuzzer holds the engine to the table's payouts &
+        checks the house against the settle events.
+        """
+        six_to_five = PRESETS['six_to_five']
+        for rules in (six_to_five, PRESETS['vegas_strip']):
+            self.assertEqual(fuzz.fuzz(200, seed=0, processes=1, rules=rules),
+                             [])
+
+        # an engine that pays 3:2 at a 6:5 table
+        settle_up = bj.settle_up
+        with mock.patch.object(bj, 'settle_up',
+                               lambda players, rules: settle_up(players)):
+            failures = fuzz.fuzz(200, seed=0, processes=1, rules=six_to_five)
+            self.assertEqual(len(failures), 1)
+            self.assertIn('balance moved by', failures[0]['error'])
+
+        # balances paid but the house never told
+        with mock.patch.object(bj, 'emit', lambda event, **data: None):
+            failures = fuzz.fuzz(20, seed=0, processes=1)
+            self.assertEqual(len(failures), 1)
+            self.assertIn('house moved by', failures[0]['error'])
+
+
+if __name__ == '__main__':
+    unittest.main()
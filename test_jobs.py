@@ -0,0 +1,139 @@
+#!/usr/bin/env python
+
+"""
+unittests for jobs.py
+"""
+
+__author__ = "Kyle Long"
+__email__ = "long.kyle@gmail.com"
+__date__ = "08/26/2019"
+__copyright__ = "Copyright 2019, Kyle Long"
+__python_version__ = "3.7.4"
+
+
+import unittest
+import tempfile
+import jobs
+import simulation as sim
+import strategy as st
+
+
+class TestJobs(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.queue = jobs.JobQueue(self.tmp.name, chunk_shoes=2)
+        self.config = {'strategy': 'basic', 'shoes': 4, 'num_decks': 1}
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_cache(self):
+        """
+        Make sure results match a plain simulation, identical & shorter
+        runs come straight from the cache, and a longer run only plays
+        the shoes it's missing.
+        """
+        job_id = self.queue.submit(self.config)
+        self.assertEqual(self.queue.status(job_id)['status'], jobs.QUEUED)
+        self.assertEqual(self.queue.run(processes=1), [job_id])
+
+        job = self.queue.status(job_id)
+        self.assertEqual(job['status'], jobs.DONE)
+        expected = sim.run_tournament([st.BasicStrategy()], 4, 1,
+                                      processes=1)[0]
+        self.assertEqual(job['result']['rounds'], expected['rounds'])
+        self.assertAlmostEqual(job['result']['mean'], expected['mean'])
+
+        # identical & shorter runs finish on submit
+        for shoes in (4, 2):
+            config = dict(self.config, shoes=shoes,
+                          strategy={'name': 'basic'})
+            cached = self.queue.status(self.queue.submit(config))
+            self.assertEqual(cached['status'], jobs.DONE)
+        self.assertEqual(cached['result']['rounds'],
+                         sim.run_tournament([st.BasicStrategy()], 2, 1,
+                                            processes=1)[0]['rounds'])
+
+        # a longer run picks up at shoe 4
+        seen = []
+        job_id = self.queue.submit(dict(self.config, shoes=7))
+        self.queue.run(processes=1, progress=lambda j: seen.append(j['done']))
+        self.assertEqual(seen, [3, 4])
+        expected = sim.run_tournament([st.BasicStrategy()], 7, 1,
+                                      processes=1)[0]
+        result = self.queue.status(job_id)['result']
+        self.assertEqual(result['rounds'], expected['rounds'])
+        self.assertAlmostEqual(result['mean'], expected['mean'])
+
+        # other rules are a different entry
+        config = dict(self.config, rules={'blackjack_pays': 1.2})
+        self.assertEqual(self.queue.status(self.queue.submit(config))
+                         ['status'], jobs.QUEUED)
+
+        with self.assertRaises(ValueError):
+            self.queue.submit(dict(self.config, strategy='psychic'))
+
+    def test_normalize(self):
+        """
+        Make sure equivalent configurations share a key, a random bot is
+        seeded from the job so its results can be replayed, & bad sizes
+        are refused.
+        """
+        config = jobs.normalize(dict(self.config, strategy='random',
+                                     seed=3, bankroll=1000.0))
+        self.assertEqual(config['strategy'], {'name': 'random', 'seed': 3})
+        self.assertEqual(jobs.cache_key(config), jobs.cache_key(
+            jobs.normalize(dict(self.config, bankroll=1000,
+                                strategy={'name': 'random', 'seed': 3},
+                                seed=3))))
+        self.assertNotEqual(jobs.cache_key(config), jobs.cache_key(
+            jobs.normalize(dict(self.config, strategy='random', seed=4))))
+
+        for bad in ({'num_decks': 0}, {'num_decks': 9}, {'bankroll': 0}):
+            with self.assertRaises(ValueError):
+                jobs.normalize(dict(self.config, **bad))
+
+    def test_cancel(self):
+        """
+        Make sure queued jobs are dropped, running jobs stop after the
+        current chunk, and finished chunks stay cached.
+        """
+        queued = self.queue.submit(dict(self.config, seed=1))
+        self.queue.cancel(queued)
+
+        job_id = self.queue.submit(self.config)
+
+        def cancel(job):
+            self.queue.cancel(job['id'])
+
+        self.assertEqual(self.queue.run(processes=1, progress=cancel),
+                         [job_id])
+        self.assertEqual(self.queue.status(queued)['status'],
+                         jobs.CANCELLED)
+        job = self.queue.status(job_id)
+        self.assertEqual(job['status'], jobs.CANCELLED)
+        self.assertEqual(job['done'], 1)
+
+        cached = self.queue.submit(dict(self.config, shoes=2))
+        self.assertEqual(self.queue.status(cached)['status'], jobs.DONE)
+
+    def test_solve(self):
+        """
+        Make sure a solve job fills in every hand against every upcard
+        & is cached.
+        """
+        job_id = self.queue.submit({'kind': 'solve', 'num_decks': 1})
+        self.queue.run(processes=1)
+        result = self.queue.status(job_id)['result']
+        self.assertEqual(len(result['table']), 10)
+        self.assertEqual(result['table']['6']['10,10']['action'], st.STAY)
+        self.assertEqual(result['table']['6']['5,6']['action'],
+                         st.DOUBLE_DOWN)
+
+        again = self.queue.submit({'kind': 'solve', 'num_decks': 1})
+        self.assertEqual(self.queue.status(again)['result'], result)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,182 @@
+#!/usr/bin/env python
+
+"""
+unittests for kernel.py
+"""
+
+__author__ = "Kyle Long"
+__email__ = "long.kyle@gmail.com"
+__date__ = "08/26/2019"
+__copyright__ = "Copyright 2019, Kyle Long"
+__python_version__ = "3.7.4"
+
+
+import unittest
+import blackjack as bj
+import kernel
+import simulation as sim
+import strategy as st
+from blackjack import Card, Deck, Hand
+from corpus import shoe_seed
+from rules import PRESETS
+
+
+class TestKernel(unittest.TestCase):
+
+    def test_hand_total(self):
+        """
+        Make sure hand_total() matches Hand.get_hand_value().
+        """
+        hands = [(1, 6), (1, 1, 6), (10, 6, 9), (1, 10), (1, 5, 10), (5,)]
+        for values in hands:
+            hand = Hand()
+            for v in values:
+                hand.cards.append(Card('Hearts', str(v), v))
+            hand_values = hand.get_hand_value()
+            best, soft = kernel.hand_total(sum(values), 1 in values)
+            self.assertEqual(best, hand_values[-1])
+            self.assertEqual(soft, len(hand_values) == 2)
+
+    def test_simulate_shoe(self):
+        """
+        Make sure the kernel plays basic strategy shoes, splits
+        included, with exactly the same results (in cents) as the game
+        engine under each preset's rules.
+        """
+        hard, soft, pairs = kernel.basic_tables()
+        for name, rules in PRESETS.items():
+            for seed in range(20):
+                deck = Deck(num_decks=2)
+                deck.create()
+                deck.shuffle(seed)
+                shoe = kernel.card_codes(deck.cards)
+                results = kernel.results_array(27)
+                rounds = kernel.simulate_shoe(shoe, 10, 1000, hard, soft,
+                                              pairs, rules.reshuffle_at(2),
+                                              kernel.rules_array(rules),
+                                              results)
+
+                with bj.quiet():
+                    expected = sim.play_shoe(st.BasicStrategy(), deck, seed,
+                                             rules=rules, cents=True)
+                self.assertEqual(list(results[:rounds]), expected, name)
+
+        # a bankroll that can't cover a double doesn't double
+        deck.cards = []
+        deck.create()
+        deck.shuffle(0)
+        shoe = kernel.card_codes(deck.cards)
+        rules = kernel.rules_array(bj.RULES)
+        rounds = kernel.simulate_shoe(shoe, 10, 15, hard, soft, pairs,
+                                      bj.RULES.reshuffle_at(2), rules,
+                                      results)
+        with bj.quiet():
+            expected = sim.play_shoe(st.BasicStrategy(), deck, 0, 15,
+                                     cents=True)
+        self.assertEqual(list(results[:rounds]), expected)
+
+    @unittest.skipUnless(kernel.NUMBA, 'Numba is not installed')
+    def test_fast_path(self):
+        """
+        Make sure simulations take the kernel for basic strategy & get
+        the same sums as the engine.
+        """
+        rules = PRESETS['vegas_strip']
+        args = (0, st.BasicStrategy(), 2, 7, 0, 30, 1000, None, rules)
+        engine = [0, 0, 0]
+        with bj.quiet():
+            for shoe in range(30):
+                for result in sim.play_shoe(st.BasicStrategy(),
+                                            Deck(num_decks=2),
+                                            shoe_seed(7, shoe),
+                                            rules=rules, cents=True):
+                    engine[0] += 1
+                    engine[1] += result
+                    engine[2] += result * result
+        self.assertEqual(sim._play_chunk_cents(args), (0, *engine))
+        self.assertEqual(sim._kernel_sums(*args[1:7], rules),
+                         tuple(engine))
+
+    def test_settle(self):
+        """
+        Make sure settle() pays in cents by the table's rules.
+        """
+        six_to_five = kernel.rules_array(PRESETS['six_to_five'])
+        default = kernel.rules_array(bj.RULES)
+        self.assertEqual(kernel.settle(10, 21, True, False, 20, False,
+                                       False, default), 1500)
+        self.assertEqual(kernel.settle(10, 21, True, False, 20, False,
+                                       False, six_to_five), 1200)
+        self.assertEqual(kernel.settle(10, 16, False, True, 20, False,
+                                       False, default), -500)
+        self.assertEqual(kernel.settle(10, 20, False, False, 21, True,
+                                       True, default), -500)
+
+    def test_dealer_stands(self):
+        """
+        Make sure the dealer hits a soft 17 only when the rules say so.
+        """
+        for rules in PRESETS.values():
+            stand_soft = rules.stand_values[1]
+            self.assertEqual(kernel.dealer_stands(17, True, stand_soft),
+                             not rules.hit_soft_17)
+            self.assertTrue(kernel.dealer_stands(17, False, stand_soft))
+            self.assertFalse(kernel.dealer_stands(16, False, stand_soft))
+
+    def test_draw(self):
+        """
+        Make sure draw() deals from the end and won't wrap around once
+        the shoe is empty.
+        """
+        shoe = kernel.to_array([5, 6, 7])
+        self.assertEqual(kernel.draw(shoe, 3), (7, 2))
+        self.assertEqual(kernel.draw(shoe, 1), (5, 0))
+        with self.assertRaises(IndexError):
+            kernel.draw(shoe, 0)
+
+    def test_seeded_shuffle(self):
+        """
+        Make sure the kernel's shuffle deals the same shoe as a Deck()
+        shuffled with the same seed.
+        """
+        for seed in (0, 5, 2 ** 32, shoe_seed(7, 12345), 10 ** 30):
+            deck = Deck(num_decks=2)
+            deck.create()
+            template = kernel.card_codes(deck.cards)
+            deck.shuffle(seed)
+            state = kernel.to_array([0] * kernel.MT_STATE)
+            key = kernel.to_array(kernel.seed_words(seed))
+            kernel.mt_seed(key, len(key), state)
+            kernel.seeded_shuffle(template, state)
+            self.assertEqual(list(template),
+                             list(kernel.card_codes(deck.cards)))
+
+    @unittest.skipUnless(kernel.NUMBA, 'Numba is not installed')
+    def test_compiled(self):
+        """
+        Make sure the compiled kernel matches the plain Python one &
+        keeps the empty shoe check.
+        """
+        hard, soft, pairs = kernel.basic_tables()
+        rules = kernel.rules_array(PRESETS['vegas_strip'])
+        for seed in range(5):
+            deck = Deck(num_decks=2)
+            deck.create()
+            deck.shuffle(seed)
+            shoe = kernel.card_codes(deck.cards)
+            compiled = kernel.results_array(52)
+            python = kernel.results_array(52)
+            rounds = kernel.simulate_shoe(shoe, 10, 1000, hard, soft, pairs,
+                                          52, rules, compiled)
+            self.assertEqual(
+                kernel.simulate_shoe.py_func(shoe, 10, 1000, hard, soft,
+                                             pairs, 52, rules, python),
+                rounds)
+            self.assertEqual(list(compiled[:rounds]), list(python[:rounds]))
+
+        with self.assertRaises(IndexError):
+            kernel.draw(kernel.to_array([5, 6, 7]), 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,89 @@
+#!/usr/bin/env python
+
+"""
+unittests for memory.py
+"""
+
+__author__ = "Kyle Long"
+__email__ = "long.kyle@gmail.com"
+__date__ = "08/26/2019"
+__copyright__ = "Copyright 2019, Kyle Long"
+__python_version__ = "3.7.4"
+
+
+import os
+import sys
+import unittest
+import subprocess
+import blackjack as bj
+import memory
+import simulation as sim
+import strategy as st
+from blackjack import Deck
+
+
+class TestMemoryMonitor(unittest.TestCase):
+
+    def test_sample(self):
+        """
+        Make sure rounds are sampled every N rounds with object counts,
+        and that a steady table raises no alert.
+        """
+        alerts = []
+        monitor = memory.MemoryMonitor(every=5, window=3,
+                                       threshold=10 ** 6,
+                                       alert=alerts.append)
+        monitor.start()
+        try:
+            deck = Deck(num_decks=2)
+            with bj.quiet():
+                for seed in range(3):
+                    sim.play_shoe(st.BasicStrategy(), deck, seed)
+        finally:
+            monitor.stop()
+
+        self.assertNotIn(monitor.on_event, bj.listeners)
+        self.assertTrue(monitor.samples)
+        self.assertEqual(monitor.samples[0]['round'], 5)
+        self.assertTrue(monitor.samples[0]['cards'] >= 104)
+        self.assertEqual(monitor.samples[0]['table_players'], 2)
+        self.assertFalse(alerts)
+
+    def test_check(self):
+        """
+        Make sure steady growth across a window raises an alert.
+        """
+        alerts = []
+        monitor = memory.MemoryMonitor(window=3, threshold=100,
+                                       alert=alerts.append)
+        for i in range(1, 4):
+            monitor.samples.append({'round': i * 10, 'traced': i * 10000,
+                                    'cards': 0, 'hands': 0, 'players': 0,
+                                    'top': []})
+        self.assertEqual(monitor.trend(), 1000)
+        self.assertTrue(monitor.check())
+        self.assertEqual(len(alerts), 1)
+
+    def test_default_alert(self):
+        """
+        Make sure the default alert is shown under Python's default
+        warning filters.
+        """
+        script = ('import memory\n'
+                  'monitor = memory.MemoryMonitor(window=2, threshold=1)\n'
+                  'monitor.samples = [{"round": i, "traced": i * 100, '
+                  '"cards": 0, "hands": 0, "players": 0, "top": []} '
+                  'for i in (1, 2)]\n'
+                  'assert monitor.check()\n')
+        env = dict(os.environ)
+        env.pop('PYTHONWARNINGS', None)
+        result = subprocess.run([sys.executable, '-c', script], env=env,
+                                cwd=os.path.dirname(os.path.abspath(__file__)),
+                                capture_output=True, text=True)
+        self.assertEqual(result.returncode, 0, result.stderr)
+        self.assertIn('MemoryGrowthWarning: Memory grew 100 bytes/round',
+                      result.stderr)
+
+
+if __name__ == '__main__':
+    unittest.main()
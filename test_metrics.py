@@ -0,0 +1,150 @@
+#!/usr/bin/env python
+
+"""
+unittests for metrics.py
+"""
+
+__author__ = "Kyle Long"
+__email__ = "long.kyle@gmail.com"
+__date__ = "08/26/2019"
+__copyright__ = "Copyright 2019, Kyle Long"
+__python_version__ = "3.7.4"
+
+
+import socket
+import unittest
+import urllib.request
+import blackjack as bj
+import metrics
+import simulation as sim
+import strategy as st
+from unittest import mock
+from blackjack import Deck, Dealer, Gambler
+
+
+class TestMetrics(unittest.TestCase):
+
+    def play(self, table_metrics):
+        """
+        Non-test method that plays a shoe with the metrics listening.
+        """
+        table_metrics.start()
+        try:
+            with bj.quiet():
+                results = sim.play_shoe(st.BasicStrategy(), Deck(2), 3)
+        finally:
+            table_metrics.stop()
+
+        return results
+
+    def test_table_metrics(self):
+        """
+        Make sure rounds, hands, dealer timings & the house P&L are
+        counted.
+        """
+        table_metrics = metrics.TableMetrics('test')
+        results = self.play(table_metrics)
+
+        values = table_metrics.snapshot()
+        self.assertEqual(values['rounds'], len(results))
+        self.assertTrue(values['hands'] >= len(results))
+        self.assertEqual(values['house_pnl'], -sum(results))
+        self.assertTrue(values['dealer_hands'] > 0)
+        self.assertNotIn(table_metrics.on_event, bj.listeners)
+
+    def test_sitting_out(self):
+        """
+        Make sure a player sitting out a round adds no hands or splits.
+        """
+        table_metrics = metrics.TableMetrics('test')
+        idle = Gambler('Idle')
+        idle.money = 100
+        players = [idle, Gambler('Bot', strategy=st.BasicStrategy()),
+                   Dealer()]
+        players[1].money = 100
+        deck = Deck(2)
+        deck.create()
+        deck.shuffle(3)
+
+        table_metrics.start()
+        try:
+            with mock.patch('blackjack.input_func', return_value=0), \
+                    bj.quiet():
+                for _ in range(3):
+                    bj.play_round(players, deck)
+        finally:
+            table_metrics.stop()
+
+        self.assertEqual(table_metrics.rounds, 3)
+        self.assertTrue(table_metrics.hands >= 3)
+        self.assertEqual(table_metrics.splits,
+                         table_metrics.hands - 3)
+
+    def test_prometheus(self):
+        """
+        Scrape the Prometheus endpoint on localhost.
+        """
+        table_metrics = metrics.TableMetrics('test')
+        self.play(table_metrics)
+
+        exporter = metrics.PrometheusExporter(table_metrics, port=0)
+        exporter.start()
+        try:
+            url = f'http://127.0.0.1:{exporter.port}/metrics'
+            with urllib.request.urlopen(url) as response:
+                body = response.read().decode('utf-8')
+        finally:
+            exporter.stop()
+
+        self.assertIn(f'blackjack_rounds_total{{table="test"}} '
+                      f'{table_metrics.rounds}', body)
+        self.assertIn('# TYPE blackjack_house_pnl_dollars gauge', body)
+        self.assertIn('# TYPE blackjack_dealer_seconds summary', body)
+        self.assertIn(f'blackjack_dealer_seconds_count{{table="test"}} '
+                      f'{table_metrics.dealer_hands}', body)
+
+        # every counter ends in _total, & every sample has a TYPE family
+        families = {}
+        for line in body.splitlines():
+            if line.startswith('# TYPE'):
+                _, _, name, kind = line.split()
+                families[name] = kind
+                if kind == 'counter':
+                    self.assertTrue(name.endswith('_total'), name)
+            elif not line.startswith('#'):
+                name = line.split('{')[0]
+                family = name if name in families else \
+                    name.rsplit('_', 1)[0]
+                self.assertIn(family, families, name)
+
+    def test_statsd(self):
+        """
+        Make sure a flush sends counters as deltas in one UDP packet to
+        a local stand-in for StatsD.
+        """
+        server = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        server.bind(('127.0.0.1', 0))
+        server.settimeout(5)
+        try:
+            table_metrics = metrics.TableMetrics('test')
+            client = metrics.StatsdClient(table_metrics,
+                                          port=server.getsockname()[1],
+                                          every=10 ** 6)
+            table_metrics.rounds = 7
+            table_metrics.timings.append(('dealer', 0.002))
+            client.flush()
+            packet = server.recv(65536).decode('utf-8').split('\n')
+            self.assertIn('blackjack.test.rounds:7|c', packet)
+            self.assertIn('blackjack.test.dealer_ms:2.000|ms', packet)
+
+            table_metrics.rounds = 10
+            client.flush()
+            packet = server.recv(65536).decode('utf-8').split('\n')
+            self.assertIn('blackjack.test.rounds:3|c', packet)
+            client.stop()
+        finally:
+            server.close()
+
+
+if __name__ == '__main__':
+    unittest.main()
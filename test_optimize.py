@@ -0,0 +1,94 @@
+#!/usr/bin/env python
+
+"""
+unittests for optimize.py
+"""
+
+__author__ = "Kyle Long"
+__email__ = "long.kyle@gmail.com"
+__date__ = "08/26/2019"
+__copyright__ = "Copyright 2019, Kyle Long"
+__python_version__ = "3.7.4"
+
+
+import math
+import unittest
+import optimize
+import simulation as sim
+import strategy as st
+from rules import PRESETS
+
+
+class TestOptimize(unittest.TestCase):
+
+    def test_candidate_ramps(self):
+        """
+        Make sure ramps start at the minimum bet, never shrink, and
+        top out at the spread.
+        """
+        ramps = optimize.candidate_ramps(10, spreads=(1, 8), starts=(1, 2))
+        self.assertIn((10, 20, 40, 80, 80, 80), ramps)
+        self.assertIn((10, 10, 20, 40, 80, 80), ramps)
+        self.assertEqual(len(ramps), len(set(ramps)))
+        for ramp in ramps:
+            self.assertEqual(ramp[0], 10)
+            self.assertEqual(list(ramp), sorted(ramp))
+
+    def test_counting_strategy(self):
+        """
+        Make sure wagers follow the ramp & stay within the balance.
+        """
+        bot = st.CountingStrategy((10, 20, 40))
+        self.assertEqual(bot.wager(500, {'true_count': -3.2}), 10)
+        self.assertEqual(bot.wager(500, {'true_count': 1.9}), 20)
+        self.assertEqual(bot.wager(500, {'true_count': 7}), 40)
+        self.assertEqual(bot.wager(15, {'true_count': 7}), 15)
+
+    def test_score(self):
+        """
+        Check risk of ruin, N0 & DI for a known mean & deviation.
+        """
+        summary = {'name': 'x', 'rounds': 100, 'mean': 0.5, 'std': 10.0,
+                   'ci_low': 0, 'ci_high': 1}
+        scored = optimize.score(summary, rounds_per_hour=100, bankroll=1000)
+        self.assertEqual(scored['ev_per_hour'], 50)
+        self.assertEqual(scored['sd_per_hour'], 100)
+        self.assertAlmostEqual(scored['risk_of_ruin'], math.exp(-10))
+        self.assertEqual(scored['n0'], 400)
+        self.assertEqual(scored['di'], 0.05)
+
+    def test_optimize_spread(self):
+        """
+        Make sure successive halving narrows the candidates down.
+        """
+        ramps = optimize.candidate_ramps(10, spreads=(1, 4, 8), starts=(1,))
+        results = optimize.optimize_spread(ramps, shoes=2, num_decks=1,
+                                           processes=1)
+        self.assertEqual(len(results), 1)
+        self.assertIn(results[0]['ramp'], ramps)
+        self.assertEqual(results[0]['shoes'], 2 + 4)
+
+        for eta in (1, 0.5):
+            with self.assertRaises(ValueError):
+                optimize.optimize_spread(ramps, shoes=2, num_decks=1,
+                                         eta=eta, processes=1)
+
+    def test_optimize_rules(self):
+        """
+        Make sure candidates are played under the rules passed in.
+        """
+        ramp = (10, 20, 40)
+        rules = PRESETS['downtown']
+        results = optimize.optimize_spread([ramp], shoes=3, num_decks=2,
+                                           processes=1, rules=rules)
+        rounds = sim.play_shoes([st.CountingStrategy(ramp)], 0, 3,
+                                num_decks=2, processes=1, bankroll=10000,
+                                rules=rules)[0][0]
+        self.assertEqual(results[0]['rounds'], rounds)
+        self.assertNotEqual(
+            optimize.optimize_spread([ramp], shoes=3, num_decks=2,
+                                     processes=1)[0]['rounds'], rounds)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,208 @@
+#!/usr/bin/env python
+
+"""
+unittests for replay.py
+"""
+
+__author__ = "Kyle Long"
+__email__ = "long.kyle@gmail.com"
+__date__ = "08/26/2019"
+__copyright__ = "Copyright 2019, Kyle Long"
+__python_version__ = "3.7.4"
+
+
+import os
+import random
+import tempfile
+import unittest
+from unittest import mock
+import blackjack as bj
+import replay
+import shuffles
+from blackjack import Deck, Dealer, Gambler
+
+
+class TestReplay(unittest.TestCase):
+
+    def record(self, path, rounds, every, shuffler=None):
+        """
+        Non-test method that records two humans playing random actions
+        for a number of rounds, then leaving the table.
+
+        returns:
+            (list):     summary of every round as it was played live
+        """
+        rng = random.Random(7)
+        played = []
+
+        def answer(question):
+            if 'play again' in question:
+                return 'y' if len(played) < rounds else 'n'
+            if 'buy in' in question:
+                return 'y' if 'balance' in question else '500'
+            if 'wager' in question:
+                # even wagers keep balances whole through insurance
+                balance = question.split('$')[1]
+                balance = float(balance.split(',')[0].split(')')[0])
+                return str(max(min(rng.randint(1, 25) * 2, int(balance)), 1))
+            if 'insurance' in question:
+                return rng.choice('yn')
+            return rng.choice(['h', 's', 'd', 'split'])
+
+        def on_event(event, **data):
+            if event == 'round_end':
+                played.append(replay._summarize(data['players'], {}))
+
+        players = []
+        for name in ('Ann', 'Bo'):
+            gambler = Gambler(name)
+            gambler.money = 500
+            players.append(gambler)
+        players.append(Dealer())
+
+        recorder = replay.SessionRecorder(path, every)
+        recorder.start()
+        bj.listeners.append(on_event)
+        try:
+            with mock.patch('builtins.input', side_effect=answer), \
+                    mock.patch('random.getrandbits',
+                               random.Random(3).getrandbits), \
+                    bj.quiet():
+                bj.play(players, Deck(num_decks=1, shuffler=shuffler))
+        finally:
+            bj.listeners.remove(on_event)
+            recorder.stop()
+
+        return played
+
+    def test_replay(self):
+        """
+        Make sure a replay rebuilds every round played live, from the
+        start or from a checkpoint, and the log stays small.
+        """
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, 'session.bin')
+            played = self.record(path, rounds=40, every=10)
+            log = replay.SessionLog(path)
+
+            self.assertEqual(log.rounds, 40)
+            self.assertEqual(sorted(log.checkpoints), [0, 10, 20, 30, 40])
+            self.assertEqual(log.end, ['n', 'n'])
+
+            replayed = list(log.replay())
+            self.assertEqual(len(replayed), 40)
+            for live, summary in zip(played, replayed):
+                for key in ('dealer', 'dealer_value'):
+                    self.assertEqual(live[key], summary[key])
+                for gambler, copy in zip(live['gamblers'],
+                                         summary['gamblers']):
+                    self.assertEqual(gambler['money'], copy['money'])
+                    self.assertEqual([h['cards'] for h in gambler['hands']],
+                                     [h['cards'] for h in copy['hands']])
+
+            # jump to round 25 from the round 20 checkpoint
+            summary = next(log.replay(25, 25))
+            self.assertEqual(summary, replayed[24])
+            players, deck = log.table(25)
+            self.assertEqual([p.money for p in players[:-1]],
+                             [g['money'] for g in replayed[24]['gamblers']])
+
+    def test_shuffler(self):
+        """
+        Make sure a session dealt with a shuffle procedure replays it,
+        even when asked for a round past a checkpoint.
+        """
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, 'session.bin')
+            played = self.record(path, rounds=30, every=10,
+                                 shuffler=shuffles.PRESETS['casino'])
+            log = replay.SessionLog(path)
+            self.assertIs(log.shuffler, shuffles.PRESETS['casino'])
+
+            replayed = list(log.replay())
+            self.assertEqual([r['dealer'] for r in replayed],
+                             [r['dealer'] for r in played])
+            self.assertEqual(next(log.replay(25, 25)), replayed[24])
+
+            procedure = shuffles.Procedure(shuffles.riffle, name='casino')
+            with self.assertRaises(ValueError):
+                self.record(path, rounds=1, every=10, shuffler=procedure)
+
+    def test_diverged_log(self):
+        """
+        Make sure a log that doesn't match the engine raises rather
+        than waiting on input().
+        """
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, 'session.bin')
+            self.record(path, rounds=3, every=10)
+            log = replay.SessionLog(path)
+            log.records[1] = (log.records[1][0], [])
+            with self.assertRaises(ValueError):
+                list(log.replay())
+
+            # only logs of the current version are replayed
+            with open(path, 'r+b') as f:
+                f.seek(len(replay.MAGIC))
+                f.write(bytes([replay.VERSION - 1]))
+            with self.assertRaises(ValueError):
+                replay.SessionLog(path)
+
+
+    def test_record_run(self):
+        """
+        Make sure a session recorded through run(), setup prompts and
+        all, replays under the rules it was played with.
+        """
+        rules = bj.TableRules(blackjack_pays=1.2, hit_soft_17=False,
+                              max_hands=2)
+        rounds = []
+        rng = random.Random(5)
+
+        def answer(question):
+            if 'How many people' in question:
+                return '1'
+            if 'name of Player' in question:
+                return 'Ann'
+            if 'how much' in question:
+                return '500'
+            if 'How many decks' in question:
+                return '1'
+            if 'play again' in question:
+                return 'y' if len(rounds) < 20 else 'n'
+            if 'buy in' in question:
+                return 'n'
+            if 'wager' in question:
+                return '10'
+            if 'insurance' in question:
+                return 'n'
+            return rng.choice(['h', 's', 'd', 'split'])
+
+        def on_event(event, **data):
+            if event == 'round_end':
+                rounds.append(data['players'][0].money)
+
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, 'session.bin')
+            recorder = replay.SessionRecorder(path, every=10)
+            recorder.start()
+            bj.listeners.append(on_event)
+            try:
+                with mock.patch('builtins.input', side_effect=answer), \
+                        mock.patch('random.getrandbits',
+                                   random.Random(3).getrandbits), \
+                        bj.quiet():
+                    bj.run(rules)
+            finally:
+                bj.listeners.remove(on_event)
+                recorder.stop()
+
+            log = replay.SessionLog(path)
+            self.assertEqual(log.rules.settings(), rules.settings())
+            replayed = [summary['gamblers'][0]['money']
+                        for summary in log.replay()]
+            self.assertEqual(replayed, rounds)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,169 @@
+#!/usr/bin/env python
+
+"""
+unittests for rollout.py
+"""
+
+__author__ = "Kyle Long"
+__email__ = "long.kyle@gmail.com"
+__date__ = "08/26/2019"
+__copyright__ = "Copyright 2019, Kyle Long"
+__python_version__ = "3.7.4"
+
+
+import random
+import unittest
+import rollout
+from blackjack import Card, Deck, Hand, Dealer, Gambler
+from rules import PRESETS
+
+
+class TestFork(unittest.TestCase):
+
+    def test_card(self):
+        """
+        Make sure a fork draws every card of the pool exactly once,
+        repeats its draws, and never modifies the shared pool.
+        """
+        pool = tuple(range(1, 11)) * 2
+        fork = rollout.Fork(pool, random.Random(1), hole=5)
+        drawn = [fork.card(i) for i in range(len(pool))]
+        self.assertEqual(sorted(drawn), sorted(pool))
+        self.assertEqual(fork.card(3), drawn[3])
+        self.assertEqual(pool, tuple(range(1, 11)) * 2)
+
+        # the hole card can't give the dealer a blackjack
+        for seed in range(50):
+            fork = rollout.Fork((1, 10, 10), random.Random(seed), no_hole=10)
+            self.assertEqual(fork.hole, 1)
+
+
+class TestEvaluate(unittest.TestCase):
+
+    def setup_round(self, values, upcard):
+        """
+        Non-test method that deals a gambler a hand of the given
+        values against the given dealer upcard.
+        """
+        gambler = Gambler('Test')
+        gambler.money = 500
+        hand = Hand()
+        hand.wager = 10
+        for v in values:
+            hand.cards.append(Card('Hearts', str(v), v))
+        gambler.hands.append(hand)
+
+        dealer = Dealer()
+        dealer_hand = Hand()
+        dealer_hand.cards = [Card('Spades', 'Nine', 9),
+                             Card('Spades', str(upcard), upcard)]
+        dealer_hand.cards[0].hidden = True
+        dealer.hands.append(dealer_hand)
+
+        deck = Deck(num_decks=6)
+        deck.create()
+        deck.shuffle(seed=1)
+
+        return [gambler, dealer], deck, gambler, hand
+
+    def test_evaluate(self):
+        """
+        Make sure rollouts agree with basic strategy on clear cut
+        decisions & report every legal action.
+        """
+        players, deck, gambler, hand = self.setup_round((10, 9), 6)
+        results = rollout.evaluate(players, deck, gambler, hand,
+                                   rollouts=2000, seed=1)
+        self.assertEqual(set(results), {'s', 'h', 'd'})
+        self.assertEqual(rollout.best_action(results), 's')
+
+        players, deck, gambler, hand = self.setup_round((5, 6), 6)
+        results = rollout.evaluate(players, deck, gambler, hand,
+                                   rollouts=2000, seed=1)
+        self.assertEqual(rollout.best_action(results), 'd')
+
+        # the deck is never touched
+        self.assertEqual(len(deck.cards), 6 * 52)
+
+    def test_split(self):
+        """
+        Make sure a pair can be split, & that split hands only double
+        when the gambler has the money for it.
+        """
+        players, deck, gambler, hand = self.setup_round((8, 8), 6)
+        results = rollout.evaluate(players, deck, gambler, hand,
+                                   rollouts=2000, seed=1)
+        self.assertEqual(set(results), {'s', 'h', 'd', 'split'})
+        self.assertEqual(rollout.best_action(results), 'split')
+
+        for money, doubles in ((500, True), (15, False)):
+            offered = []
+
+            def policy(best, soft, dealer, options, pair):
+                offered.append(options)
+                return 'd' if 'd' in options else 's'
+
+            players, deck, gambler, hand = self.setup_round((8, 8), 6)
+            gambler.money = money
+            results = rollout.evaluate(players, deck, gambler, hand,
+                                       rollouts=200, policy=policy, seed=1)
+            self.assertEqual('d' in results, doubles)
+            self.assertEqual(any('d' in o for o in offered), doubles)
+
+    def test_hole_known(self):
+        """
+        Make sure a known hole card is used instead of being drawn.
+        """
+        # dealer has 19 (Nine & Ten), a stayed 20 always wins
+        players, deck, gambler, hand = self.setup_round((10, 10), 10)
+        results = rollout.evaluate(players, deck, gambler, hand,
+                                   rollouts=500, hole_known=True, seed=1)
+        self.assertEqual(results['s'], (1.0, 0.0))
+
+        results = rollout.evaluate(players, deck, gambler, hand,
+                                   rollouts=500, seed=1)
+        self.assertTrue(results['s'][0] < 1.0)
+
+    def test_rules(self):
+        """
+        Make sure the dealer hits or stands on a soft 17 by the table's
+        rules.
+        """
+        # dealer has a soft 17 (Six & Ace), a stayed 18 always wins if
+        # the dealer stands on it
+        players, deck, gambler, hand = self.setup_round((10, 8), 1)
+        players[-1].hands[0].cards[0] = Card('Spades', 'Six', 6)
+        results = rollout.evaluate(players, deck, gambler, hand,
+                                   rollouts=500, hole_known=True, seed=1,
+                                   rules=PRESETS['vegas_strip'])
+        self.assertEqual(results['s'], (1.0, 0.0))
+
+        results = rollout.evaluate(players, deck, gambler, hand,
+                                   rollouts=500, hole_known=True, seed=1)
+        self.assertTrue(results['s'][0] < 1.0)
+
+    def test_surrender(self):
+        """
+        Make sure surrender is offered only where the rules & the round
+        allow it, and always costs half the wager.
+        """
+        vegas = PRESETS['vegas_strip']
+        players, deck, gambler, hand = self.setup_round((10, 6), 10)
+        results = rollout.evaluate(players, deck, gambler, hand,
+                                   rollouts=500, seed=1, rules=vegas)
+        self.assertEqual(results['r'], (-0.5, 0.0))
+        self.assertTrue(results['s'][0] < -0.5)
+
+        results = rollout.evaluate(players, deck, gambler, hand,
+                                   rollouts=100, seed=1)
+        self.assertNotIn('r', results)
+
+        # not after a split
+        gambler.hands.append(Hand())
+        results = rollout.evaluate(players, deck, gambler, hand,
+                                   rollouts=100, seed=1, rules=vegas)
+        self.assertNotIn('r', results)
+
+
+if __name__ == '__main__':
+    unittest.main()
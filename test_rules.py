@@ -0,0 +1,91 @@
+#!/usr/bin/env python
+
+"""
+unittests for rules.py
+"""
+
+__author__ = "Kyle Long"
+__email__ = "long.kyle@gmail.com"
+__date__ = "08/26/2019"
+__copyright__ = "Copyright 2019, Kyle Long"
+__python_version__ = "3.7.4"
+
+
+import unittest
+from unittest import mock
+import blackjack as bj
+import simulation as sim
+import strategy as st
+from blackjack import Deck, Dealer, Gambler
+from rules import TableRules, PRESETS
+
+
+class TestRules(unittest.TestCase):
+
+    def test_precomputed(self):
+        """
+        Make sure the values the engine looks up match the rules.
+        """
+        self.assertEqual(TableRules().stand_values, (17, 18))
+        self.assertEqual(TableRules(hit_soft_17=False).stand_values,
+                         (17, 17))
+        self.assertEqual(TableRules().reshuffle_at(6), 156)
+        self.assertEqual(TableRules(penetration=0.75).reshuffle_at(2), 26)
+        # the cut card never leaves less than a round at the table needs
+        self.assertEqual(TableRules(penetration=0.75).reshuffle_at(1), 22)
+        self.assertEqual(TableRules().reshuffle_at(1, seats=6), 42)
+
+        rules = TableRules(max_hands=3, resplit_aces=False)
+        self.assertTrue(rules.can_split('Eight', 1))
+        self.assertFalse(rules.can_split('Eight', 2))
+        self.assertTrue(rules.can_split('Ace', 0))
+        self.assertFalse(rules.can_split('Ace', 1))
+
+        for kwargs in ({'blackjack_pays': 0}, {'max_hands': 0},
+                       {'penetration': 1}):
+            with self.assertRaises(ValueError):
+                TableRules(**kwargs)
+
+    def test_presets(self):
+        """
+        Make sure every preset plays whole shoes, and deeper
+        penetration plays more rounds per shoe.
+        """
+        rounds = {}
+        for name, rules in PRESETS.items():
+            totals = sim.play_shoes([st.BasicStrategy()], 0, 3, num_decks=2,
+                                    processes=1, rules=rules)
+            rounds[name] = totals[0][0]
+            self.assertTrue(rounds[name] > 0)
+        self.assertTrue(rounds['downtown'] > rounds['default'])
+        self.assertIs(bj.RULES.hit_soft_17, True)
+
+    def test_single_deck_full_table(self):
+        """
+        Make sure a full table can play a deep single deck preset
+        without running the shoe dry mid-round.
+        """
+        rounds = 200
+        players = [Gambler(f'Bot {i}', strategy=st.BasicStrategy())
+                   for i in range(bj.MAX_PLAYERS)]
+        for gambler in players:
+            gambler.money = 100000
+        players.append(Dealer())
+
+        events = []
+        bj.listeners.append(lambda event, **data: events.append(event))
+        answers = ['y'] * bj.MAX_PLAYERS * (rounds - 1) + \
+            ['n'] * bj.MAX_PLAYERS
+        try:
+            with mock.patch('builtins.input', side_effect=answers), \
+                    bj.quiet():
+                bj.play(players, Deck(num_decks=1),
+                        rules=PRESETS['vegas_strip'])
+        finally:
+            bj.listeners.clear()
+
+        self.assertEqual(events.count('round_end'), rounds)
+
+
+if __name__ == '__main__':
+    unittest.main()
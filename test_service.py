@@ -0,0 +1,149 @@
+#!/usr/bin/env python
+
+"""
+unittests for service.py
+"""
+
+__author__ = "Kyle Long"
+__email__ = "long.kyle@gmail.com"
+__date__ = "08/26/2019"
+__copyright__ = "Copyright 2019, Kyle Long"
+__python_version__ = "3.7.4"
+
+
+import json
+import unittest
+from http.client import HTTPConnection
+import service as sv
+import strategy as st
+from rules import PRESETS
+
+
+class TestService(unittest.TestCase):
+
+    def test_solver(self):
+        """
+        Make sure dealer outcomes add up & the solver makes the well
+        known plays.
+        """
+        for upcard in range(1, 11):
+            probs = sv.dealer_probabilities(upcard)
+            self.assertAlmostEqual(sum(probs.values()), 1)
+            self.assertEqual(probs['blackjack'], 0)
+        no_peek = sv.dealer_probabilities(1, peek=False)
+        self.assertAlmostEqual(no_peek['blackjack'], 96 / 311)
+
+        plays = {((5, 6), 6): st.DOUBLE_DOWN,
+                 ((10, 10), 6): st.STAY,
+                 ((8, 8), 10): st.SPLIT,
+                 ((10, 6), 10): st.HIT,
+                 ((10, 3), 4): st.STAY}
+        for (cards, upcard), action in plays.items():
+            values = sv.action_values(list(cards), upcard)
+            self.assertEqual(max(values, key=values.get), action)
+
+        # with only tens left, standing on 12 vs a 6 beats hitting
+        shoe = (0,) * 9 + (40,)
+        values = sv.action_values([7, 5], 6, shoe)
+        self.assertEqual(values[st.HIT], -1)
+
+    def test_rules(self):
+        """
+        Make sure answers follow the table's rules: surrender where it's
+        offered, the dealer's soft 17 & the blackjack payout.
+        """
+        vegas = PRESETS['vegas_strip']
+        values = sv.action_values([10, 6], 10, rules=vegas)
+        self.assertEqual(values[st.SURRENDER], -0.5)
+        self.assertEqual(max(values, key=values.get), st.SURRENDER)
+        self.assertNotIn(st.SURRENDER, sv.action_values([10, 6], 10))
+        self.assertNotIn(st.SURRENDER,
+                         sv.legal_options([10, 6, 1], vegas))
+
+        hits = sv.dealer_probabilities(6)
+        stands = sv.dealer_probabilities(6, rules=vegas)
+        self.assertTrue(stands['17'] > hits['17'])
+
+        service = sv.StrategyService(port=0, rules=PRESETS['six_to_five'])
+        answer = service._answer('action', (1, 10), 6, None, None)
+        self.assertEqual(answer['ev'][st.STAY], 1.2)
+
+    def test_http(self):
+        """
+        Make sure a batch is answered in order over one connection,
+        repeats come from the cache & bad queries get a 400.
+        """
+        service = sv.StrategyService(port=0)
+        service.start()
+        try:
+            conn = HTTPConnection('127.0.0.1', service.port)
+            batch = [{'type': 'action', 'cards': [10, 6], 'upcard': 10},
+                     {'type': 'dealer', 'upcard': 6},
+                     {'cards': ['A', 7], 'upcard': 9,
+                      'options': ['s', 'h']}] * 50
+
+            conn.request('POST', '/query', json.dumps(batch))
+            response = conn.getresponse()
+            self.assertEqual(response.status, 200)
+            answers = json.loads(response.read())
+            self.assertEqual(len(answers), 150)
+            self.assertEqual(answers[0]['action'], st.HIT)
+            self.assertAlmostEqual(sum(answers[1].values()), 1)
+            self.assertEqual(set(answers[2]['ev']), {'s', 'h'})
+
+            for bad in ({'cards': [10], 'upcard': 6}, 5, [1],
+                        {'cards': [10, 6], 'upcard': 6, 'shoe': [0] * 10}):
+                conn.request('POST', '/query', json.dumps(bad))
+                response = conn.getresponse()
+                self.assertEqual(response.status, 400)
+                response.read()
+
+            conn.request('GET', '/stats')
+            stats = json.loads(conn.getresponse().read())
+            self.assertEqual(stats['misses'], 3)
+            self.assertEqual(stats['hits'], 147)
+            conn.close()
+        finally:
+            service.stop()
+
+    def test_bad_queries(self):
+        """
+        Make sure degenerate shoes & options are refused rather than
+        answered wrong.
+        """
+        service = sv.StrategyService(port=0)
+        try:
+            tens = [0] * 9 + [40]
+            bad = {'all zero shoe': {'cards': [10, 6], 'upcard': 6,
+                                     'shoe': [0] * 10},
+                   'short shoe': {'cards': [10, 6], 'upcard': 6,
+                                  'shoe': [4] * 9},
+                   'negative count': {'cards': [10, 6], 'upcard': 6,
+                                      'shoe': [-1] + [4] * 9},
+                   'string shoe': {'cards': [10, 6], 'upcard': 6,
+                                   'shoe': '4444444444'},
+                   'no hole card': {'type': 'dealer', 'upcard': 1,
+                                    'shoe': tens},
+                   'dealer runs dry': {'type': 'dealer', 'upcard': 6,
+                                       'shoe': [0] * 9 + [1]},
+                   'empty options': {'cards': [10, 6], 'upcard': 6,
+                                     'options': []},
+                   'string options': {'cards': [10, 6], 'upcard': 6,
+                                      'options': 's'},
+                   'split non-pair': {'cards': [10, 6], 'upcard': 6,
+                                      'options': ['s', 'split']},
+                   'double 3 cards': {'cards': [2, 3, 4], 'upcard': 6,
+                                      'options': ['d']}}
+            for name, query in bad.items():
+                with self.subTest(name), self.assertRaises(ValueError):
+                    service.query(query)
+
+            dealer = service.query({'type': 'dealer', 'upcard': 10,
+                                    'shoe': tens})
+            self.assertAlmostEqual(sum(dealer.values()), 1)
+        finally:
+            service.server.server_close()
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,192 @@
+#!/usr/bin/env python
+
+"""
+unittests for shuffles.py
+"""
+
+__author__ = "Kyle Long"
+__email__ = "long.kyle@gmail.com"
+__date__ = "08/26/2019"
+__copyright__ = "Copyright 2019, Kyle Long"
+__python_version__ = "3.7.4"
+
+
+import os
+import random
+import tempfile
+import unittest
+import blackjack as bj
+import corpus
+import shuffles
+import simulation as sim
+import strategy as st
+from blackjack import Deck
+
+
+class TestShuffles(unittest.TestCase):
+
+    def setUp(self):
+        self.cards = list(range(312))
+
+    def test_steps(self):
+        """
+        Make sure every step only reorders the cards & leaves the
+        structure each model is known for.
+        """
+        rng = random.Random(1)
+        riffled = shuffles.riffle(self.cards, rng)
+        stripped = shuffles.strip(self.cards, rng, packets=5)
+        cut = shuffles.cut(self.cards, rng)
+        for order in (riffled, stripped, cut):
+            self.assertEqual(sorted(order), self.cards)
+            self.assertNotEqual(order, self.cards)
+
+        self.assertLessEqual(shuffles.rising_sequences(riffled), 2)
+        self.assertLessEqual(shuffles.rising_sequences(stripped), 5)
+        self.assertEqual(shuffles.rising_sequences(cut), 2)
+        self.assertEqual(shuffles.adjacent_pairs(cut), 310)
+        self.assertEqual(shuffles.rising_sequences(self.cards), 1)
+
+        grabbed = shuffles.grab_riffle(self.cards, rng)
+        self.assertEqual(sorted(grabbed), self.cards)
+
+    @unittest.skipIf(shuffles.np is None, 'needs numpy')
+    def test_batch_steps(self):
+        """
+        Make sure every batched step reorders each shoe on its own &
+        leaves the same structure as the list step.
+        """
+        np = shuffles.np
+        rng = np.random.default_rng(1)
+        orders = np.tile(np.arange(312), (20, 1))
+        riffled = shuffles.riffle_batch(orders, rng)
+        stripped = shuffles.strip_batch(orders, rng, packets=5)
+        cut = shuffles.cut_batch(orders, rng)
+        grabbed = shuffles.grab_riffle_batch(orders, rng, riffles=2)
+        for batch in (riffled, stripped, cut, grabbed):
+            self.assertEqual(batch.shape, orders.shape)
+            for order in batch.tolist():
+                self.assertEqual(sorted(order), self.cards)
+        # each shoe is shuffled on its own
+        self.assertEqual(len({tuple(order) for order in riffled.tolist()}),
+                         20)
+
+        for i in range(20):
+            self.assertLessEqual(
+                shuffles.rising_sequences(riffled[i].tolist()), 2)
+            self.assertLessEqual(
+                shuffles.rising_sequences(stripped[i].tolist()), 5)
+            self.assertEqual(shuffles.rising_sequences(cut[i].tolist()), 2)
+
+        # a grab pass with no riffle keeps every grab in order, & there
+        # are at most 4 grabs of 52 - 6 cards or more off each half
+        grabbed = shuffles.grab_riffle_batch(orders, rng, riffles=0)
+        for order in grabbed.tolist():
+            self.assertGreaterEqual(shuffles.adjacent_pairs(order), 312 - 8)
+            self.assertIn(order[0], range(156 - 58, 156 - 45))
+
+    @unittest.skipIf(shuffles.np is None, 'needs numpy')
+    def test_batch_procedure(self):
+        """
+        Make sure a procedure shuffles batches of shoes, steps without a
+        batched version included, & shoe orders don't depend on how many
+        shoes are asked for.
+        """
+        np = shuffles.np
+        procedure = shuffles.Procedure(shuffles.riffle,
+                                       lambda items, rng: items[::-1])
+        orders = procedure.apply_batch(np.tile(np.arange(312), (3, 1)),
+                                       np.random.default_rng(2))
+        self.assertEqual(shuffles.rising_sequences(orders[0].tolist()[::-1]),
+                         2)
+
+        casino = shuffles.PRESETS['casino']
+        short = list(shuffles.shoe_orders(casino, 5, num_decks=1, streams=4))
+        orders = list(shuffles.shoe_orders(casino, 9, num_decks=1, streams=4))
+        self.assertEqual(orders[:5], short)
+        self.assertEqual(len(set(orders)), 9)
+
+    def test_procedure(self):
+        """
+        Make sure a seeded procedure replays the same order & the
+        presets are all shuffles.
+        """
+        for procedure in shuffles.PRESETS.values():
+            order = procedure(self.cards, seed=7)
+            self.assertEqual(order, procedure(self.cards, seed=7))
+            self.assertEqual(sorted(order), self.cards)
+        with self.assertRaises(ValueError):
+            shuffles.Procedure()
+
+    def test_gather(self):
+        """
+        Make sure the discards come back in dealing order under the
+        undealt cards.
+        """
+        # 5 & 4 were dealt (next card dealt is last)
+        self.assertEqual(shuffles.gather([1, 2, 3, 4, 5], 3),
+                         [5, 4, 1, 2, 3])
+
+    def test_survival(self):
+        """
+        Make sure a uniform shuffle keeps no order & a single pass
+        keeps most of it.
+        """
+        uniform = shuffles.survival(shuffles.PRESETS['uniform'], trials=20)
+        quick = shuffles.survival(shuffles.PRESETS['quick'], trials=20)
+        self.assertLess(uniform['retained'], 0.05)
+        self.assertGreater(quick['retained'], 0.9)
+        self.assertGreater(quick['adjacent_pairs'],
+                           uniform['adjacent_pairs'])
+
+    def test_deck(self):
+        """
+        Make sure a Deck with a shuffler reshuffles from its discards &
+        plays shoes through the simulator.
+        """
+        procedure = shuffles.PRESETS['casino']
+        deck = Deck(num_decks=2, shuffler=procedure)
+        deck.create()
+        deck.shuffle(3)
+        order = deck.cards[:]
+        for _ in range(60):
+            deck.draw()
+
+        deck.cards = []
+        deck.create()
+        deck.shuffle(5)
+        self.assertEqual(deck.cards, procedure(shuffles.gather(order, 44),
+                                               5))
+        with bj.quiet():
+            results = sim.play_shoe(st.BasicStrategy(), deck, 6)
+        self.assertTrue(results)
+        with self.assertRaises(ValueError):
+            deck.shuffle(5, antithetic=True)
+
+    def test_corpus(self):
+        """
+        Make sure a corpus can be written with a shuffler & every shoe is
+        a full shoe.
+        """
+        fd, path = tempfile.mkstemp(suffix='.shoes')
+        os.close(fd)
+        try:
+            corpus.write_corpus(path, shoes=5, num_decks=2, seed=1,
+                                shuffler=shuffles.PRESETS['casino'])
+            orders = list(shuffles.shoe_orders(shuffles.PRESETS['casino'],
+                                               5, num_decks=2, seed=1))
+            with corpus.ShoeCorpus(path) as shoes:
+                for i, order in enumerate(orders):
+                    with shoes.shoe(i) as shoe:
+                        self.assertEqual(bytes(shoe), order)
+                    self.assertEqual(sorted(order),
+                                     sorted(list(range(52)) * 2))
+            totals = sim.play_shoes([st.BasicStrategy()], 0, 5,
+                                    processes=1, corpus=path)
+            self.assertGreater(totals[0][0], 0)
+        finally:
+            os.remove(path)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,202 @@
+#!/usr/bin/env python
+
+"""
+unittests for simulation.py
+"""
+
+__author__ = "Kyle Long"
+__email__ = "long.kyle@gmail.com"
+__date__ = "08/26/2019"
+__copyright__ = "Copyright 2019, Kyle Long"
+__python_version__ = "3.7.4"
+
+
+import io
+import unittest
+from unittest import mock
+from contextlib import redirect_stdout
+import simulation as sim
+import strategy as st
+import blackjack as bj
+from blackjack import Deck
+
+
+class TestSimulation(unittest.TestCase):
+
+    def test_play_shoe(self):
+        """
+        Make sure a shoe is played to the reshuffle point & that the
+        same seed replays the exact same results.
+        """
+        deck = Deck(num_decks=2)
+        with bj.quiet():
+            results_1 = sim.play_shoe(st.BasicStrategy(), deck, seed=7)
+            self.assertTrue(len(deck.cards) < 52)
+            results_2 = sim.play_shoe(st.BasicStrategy(), deck, seed=7)
+        self.assertTrue(results_1)
+        self.assertEqual(results_1, results_2)
+
+    def test_run_tournament(self):
+        """
+        Make sure every bot is ranked, best mean first, with a
+        confidence interval around its mean.
+        """
+        bots = [st.Strategy(), st.BasicStrategy()]
+        results = sim.run_tournament(bots, shoes=5, num_decks=1,
+                                     processes=1)
+        self.assertEqual(len(results), 2)
+        self.assertTrue(results[0]['mean'] >= results[1]['mean'])
+        for r in results:
+            self.assertTrue(r['rounds'] > 0)
+            self.assertTrue(r['ci_low'] <= r['mean'] <= r['ci_high'])
+
+    def test_compare(self):
+        """
+        Make sure common random numbers, antithetic pairs & a control
+        variate all produce a difference with a confidence interval
+        and report their variance reduction.
+        """
+        a = st.MimicDealerStrategy()
+        b = st.Strategy()
+        for kwargs in ({'crn': False},
+                       {'crn': True, 'antithetic': True},
+                       {'control': st.BasicStrategy(), 'control_ev': 0}):
+            result = sim.compare(a, b, shoes=4, num_decks=1,
+                                 processes=1, **kwargs)
+            self.assertEqual(result['shoes'], 4)
+            self.assertTrue(result['ci_low'] <= result['difference']
+                            <= result['ci_high'])
+            self.assertTrue(result['variance_reduction'] > 0)
+
+        # a bot compared with itself on common shoes differs by nothing
+        result = sim.compare(b, b, shoes=3, num_decks=1, processes=1)
+        self.assertEqual(result['difference'], 0)
+
+        with self.assertRaises(ValueError):
+            sim.compare(a, b, shoes=4, control=st.BasicStrategy())
+
+        # every round weighs the same, however many a shoe deals
+        totals = sim.play_shoes([a, b], 0, 4, num_decks=1, processes=1)
+        result = sim.compare(a, b, shoes=4, num_decks=1, processes=1)
+        self.assertAlmostEqual(result['difference'],
+                               totals[0][1] / totals[0][0]
+                               - totals[1][1] / totals[1][0])
+
+    def test_compare_seeded(self):
+        """
+        Make sure seeded bots compare the same however the shoes are
+        split across processes, & that the rules passed in are used.
+        """
+        results = []
+        for processes in (1, 2):
+            with mock.patch.object(sim, 'CHUNK_SHOES', 2):
+                results.append(sim.compare(
+                    st.RandomStrategy(seed=7), st.BasicStrategy(), shoes=6,
+                    num_decks=1, crn=False, processes=processes))
+        self.assertEqual(results[0], results[1])
+
+        # the same seeded bot on common shoes plays them the same way
+        result = sim.compare(st.RandomStrategy(seed=7),
+                             st.RandomStrategy(seed=7), shoes=3,
+                             num_decks=1, processes=1)
+        self.assertEqual(result['difference'], 0)
+
+        bot = st.BasicStrategy()
+        rules = bj.TableRules(hit_soft_17=False, penetration=0.25)
+        default = sim.compare(bot, st.Strategy(), shoes=4, num_decks=1,
+                              processes=1)
+        shallow = sim.compare(bot, st.Strategy(), shoes=4, num_decks=1,
+                              processes=1, rules=rules)
+        self.assertNotEqual(default['difference'], shallow['difference'])
+
+    def test_running_stats(self):
+        """
+        Make sure merged accumulators match one accumulator fed every
+        value.
+        """
+        values = [-10, 15, 10, -20, 0, 10, -10, 25, -5]
+        whole = sim.RunningStats()
+        for x in values:
+            whole.add(x)
+        merged = sim.RunningStats()
+        merged.merge(sim.RunningStats.from_sums(
+            4, sum(values[:4]), sum(x * x for x in values[:4])))
+        rest = sim.RunningStats()
+        for x in values[4:]:
+            rest.add(x)
+        merged.merge(rest)
+
+        self.assertEqual(merged.count, whole.count)
+        self.assertAlmostEqual(merged.mean, whole.mean)
+        self.assertAlmostEqual(merged.variance, whole.variance)
+
+    def test_simulate_until(self):
+        """
+        Make sure a simulation stops once its interval is narrow enough,
+        and gives up at max_shoes when it can't get there.
+        """
+        bot = st.BasicStrategy()
+        result = sim.simulate_until(bot, 0.1, num_decks=1, processes=1,
+                                    chunk_shoes=5, min_rounds=100)
+        self.assertTrue(result['converged'])
+        self.assertTrue(result['ci_high'] - result['ci_low'] <= 0.2)
+        self.assertTrue(result['ci_low'] <= result['ev']
+                        <= result['ci_high'])
+
+        result = sim.simulate_until(bot, 0.0001, num_decks=1, processes=1,
+                                    chunk_shoes=5, max_shoes=10)
+        self.assertFalse(result['converged'])
+        self.assertEqual(result['shoes'], 10)
+
+
+    def test_penetration_sweep(self):
+        """
+        Make sure every level of a sweep matches a tournament played at
+        that penetration.
+        """
+        bot = st.BasicStrategy()
+        results = sim.penetration_sweep(bot, 6, levels=(0.75, 0.5),
+                                        num_decks=2, seed=3, processes=1)
+        self.assertEqual([r['penetration'] for r in results], [0.5, 0.75])
+        self.assertTrue(results[0]['rounds'] < results[1]['rounds'])
+
+        for r in results:
+            rules = bj.TableRules(penetration=r['penetration'])
+            rounds, total, total_sq = sim.play_shoes([bot], 0, 6,
+                                                     num_decks=2, seed=3,
+                                                     processes=1,
+                                                     rules=rules)[0]
+            self.assertEqual(r['rounds'], rounds)
+            self.assertAlmostEqual(r['mean'], total / rounds)
+            self.assertAlmostEqual(sum(r['true_counts'].values()), 1)
+            self.assertAlmostEqual(r['rounds_per_shoe'], rounds / 6)
+
+        # too deep for a round to be sure of its cards
+        with self.assertRaises(ValueError):
+            sim.penetration_sweep(bot, 6, levels=(0.9,), num_decks=1,
+                                  processes=1)
+
+    def test_sweep_cli(self):
+        """
+        Make sure the sweep CLI leaves out the default levels a small
+        shoe can't reach, & takes levels of its own.
+        """
+        self.assertEqual(sim.sweep_levels(1), [0.5])
+        self.assertEqual(sim.sweep_levels(4)[-1], 0.85)
+        self.assertEqual(sim.sweep_levels(6), list(sim.SWEEP_LEVELS))
+
+        for argv, levels in ((['--decks', '2'], 6),
+                             (['--decks', '2', '--levels', '0.6', '0.5'], 2)):
+            out = io.StringIO()
+            with mock.patch('sys.argv', ['simulation.py', '--sweep',
+                                         '--shoes', '2', '--processes',
+                                         '1'] + argv), \
+                    redirect_stdout(out):
+                sim.main()
+            rows = out.getvalue().splitlines()
+            self.assertEqual(len([r for r in rows if r[:1].isdigit()]),
+                             levels)
+
+
+if __name__ == '__main__':
+    unittest.main()
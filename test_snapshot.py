@@ -0,0 +1,141 @@
+#!/usr/bin/env python
+
+"""
+unittests for snapshot.py
+"""
+
+__author__ = "Kyle Long"
+__email__ = "long.kyle@gmail.com"
+__date__ = "08/26/2019"
+__copyright__ = "Copyright 2019, Kyle Long"
+__python_version__ = "3.7.4"
+
+
+import unittest
+import blackjack as bj
+import shuffles
+import snapshot as snap
+import strategy as st
+from blackjack import Deck, Dealer, Gambler
+
+
+class TestSnapshot(unittest.TestCase):
+
+    def deal_table(self, seed):
+        """
+        Non-test method that deals a round to a bot & a dealer.
+        """
+        gambler = Gambler('Bot', strategy=st.BasicStrategy())
+        gambler.money = 500
+        players = [gambler, Dealer()]
+        deck = Deck(num_decks=2)
+        deck.create()
+        deck.shuffle(seed)
+        with bj.quiet():
+            bj.deal(players, deck)
+            bj.print_cards(players)
+
+        return players, deck
+
+    def test_round_trip(self):
+        """
+        Make sure every attribute survives a dumps/loads round trip.
+        """
+        players, deck = self.deal_table(seed=1)
+        players[0].money = 457.5
+        players[0].hands[0].insurance = True
+        players[0].hands[0].final_value = 19
+
+        data = snap.dumps(players, deck, snap.PLAYING)
+        restored, restored_deck, phase = snap.loads(data)
+
+        self.assertEqual(phase, snap.PLAYING)
+        self.assertEqual(restored_deck.card_ids(), deck.card_ids())
+        self.assertEqual(restored_deck.running_count, deck.running_count)
+        self.assertEqual(restored[0].money, 457.5)
+        self.assertIsInstance(restored[1], Dealer)
+
+        for player, copy in zip(players, restored):
+            self.assertEqual(player.name, copy.name)
+            for hand, hand_copy in zip(player.hands, copy.hands):
+                self.assertEqual(vars(hand).keys(), vars(hand_copy).keys())
+                for attr in ('wager', 'final_value') + snap.FLAGS:
+                    self.assertEqual(getattr(hand, attr),
+                                     getattr(hand_copy, attr))
+                self.assertEqual([(c.get_card_str()) for c in hand.cards],
+                                 [(c.get_card_str()) for c in hand_copy.cards])
+
+        with self.assertRaises(ValueError):
+            snap.loads(b'XXXX' + data[4:])
+        with self.assertRaises(ValueError):
+            snap.loads(data[:4] + bytes([snap.VERSION - 1]) + data[5:])
+
+    def test_resume_round(self):
+        """
+        Make sure a round resumed from a snapshot settles exactly like
+        the same round played straight through.
+        """
+        for seed in range(20):
+            players, deck = self.deal_table(seed)
+            data = snap.dumps(players, deck, snap.DEALT)
+            with bj.quiet():
+                snap.resume_round(players, deck, snap.DEALT)
+
+            restored, restored_deck, phase = snap.loads(data)
+            restored[0].strategy = st.BasicStrategy()
+            with bj.quiet():
+                snap.resume_round(restored, restored_deck, phase)
+
+            self.assertEqual(players[0].money, restored[0].money)
+            self.assertEqual(deck.card_ids(), restored_deck.card_ids())
+
+        # listeners see the end of a resumed round
+        events = []
+        bj.listeners.append(lambda event, **data: events.append(event))
+        try:
+            players, deck = self.deal_table(0)
+            restored, restored_deck, phase = snap.loads(
+                snap.dumps(players, deck, snap.DEALT))
+            restored[0].strategy = st.BasicStrategy()
+            with bj.quiet():
+                snap.resume_round(restored, restored_deck, phase)
+        finally:
+            bj.listeners.clear()
+        self.assertEqual(events[-1], 'round_end')
+
+    def test_table_state(self):
+        """
+        Make sure idle prompts, the last wager & a shuffler's discards
+        survive a snapshot, and a name too long to store is refused.
+        """
+        gambler = Gambler('G' * 300)
+        gambler.money = 500
+        gambler.last_wager = 25
+        gambler.timeouts = 2
+        players = [gambler, Dealer()]
+
+        deck = Deck(num_decks=1, shuffler=shuffles.PRESETS['casino'])
+        deck.create()
+        deck.shuffle(1)
+        for _ in range(20):
+            deck.draw()
+
+        restored, restored_deck, _ = snap.loads(snap.dumps(players, deck))
+        restored_deck.shuffler = deck.shuffler
+        self.assertEqual(restored[0].name, gambler.name)
+        self.assertEqual(restored[0].last_wager, 25)
+        self.assertEqual(restored[0].timeouts, 2)
+
+        for shoe in (deck, restored_deck):
+            shoe.cards = []
+            shoe.create()
+            shoe.shuffle(2)
+        self.assertEqual(deck.card_ids(), restored_deck.card_ids())
+
+        gambler.name = 'G' * 70000
+        with self.assertRaises(ValueError):
+            snap.dumps(players, deck)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,140 @@
+#!/usr/bin/env python
+
+"""
+unittests for spectate.py
+"""
+
+__author__ = "Kyle Long"
+__email__ = "long.kyle@gmail.com"
+__date__ = "08/26/2019"
+__copyright__ = "Copyright 2019, Kyle Long"
+__python_version__ = "3.7.4"
+
+
+import json
+import asyncio
+import time
+import socket
+import unittest
+import blackjack as bj
+import simulation as sim
+import spectate
+import strategy as st
+from blackjack import Card, Deck
+
+
+class TestSpectate(unittest.TestCase):
+
+    def setUp(self):
+        self.hub = spectate.SpectatorHub(port=0)
+        self.hub.start()
+        self.clients = []
+
+    def tearDown(self):
+        for client in self.clients:
+            client.close()
+        self.hub.stop()
+
+    def connect(self):
+        """
+        Non-test method that joins the hub & waits until it is
+        subscribed.
+        """
+        subscribed = len(self.hub.subscribers)
+        client = socket.create_connection(('127.0.0.1', self.hub.port))
+        client.settimeout(10)
+        self.clients.append(client)
+        while len(self.hub.subscribers) == subscribed:
+            time.sleep(0.01)
+        return client.makefile('r')
+
+    def follow(self, lines):
+        """
+        Non-test method that reads a feed until it has caught up with
+        the hub.
+
+        returns:
+            (tuple):    spectator's state & messages read
+        """
+        state = {}
+        messages = []
+        seq = None
+        while seq != self.hub.seq:
+            message = json.loads(lines.readline())
+            messages.append(message)
+            spectate.apply(state, message)
+            seq = message['seq']
+        return state, messages
+
+    def test_delta(self):
+        """
+        Make sure cards dealt are sent as appends & a reveal as a set.
+        """
+        old = {'0.0.cards': 'Ah', '1.0.cards': 'Kd??', 'shoe': 50}
+        new = {'0.0.cards': 'AhTs', '1.0.cards': 'Kd5c'}
+        changes = spectate.delta(old, new)
+        self.assertEqual(changes, {'add': {'0.0.cards': 'Ts'},
+                                   'set': {'1.0.cards': 'Kd5c'},
+                                   'del': ['shoe']})
+        self.assertEqual(spectate.apply(dict(old), changes), new)
+
+        card = Card('Hearts', 'Ten', 10)
+        self.assertEqual(spectate.card_code(card), 'Th')
+        card.hidden = True
+        self.assertEqual(spectate.card_code(card), '??')
+
+    def test_feed(self):
+        """
+        Play a shoe with spectators joined before & during it & make sure
+        every one of them ends up with the table's state.
+        """
+        early = [self.connect() for _ in range(3)]
+        feed = spectate.TableFeed(self.hub)
+        feed.start()
+        try:
+            with bj.quiet():
+                sim.play_shoe(st.BasicStrategy(), Deck(2), 3)
+        finally:
+            feed.stop()
+
+        # the hub handles publishes in order, so once this has run it
+        # has worked through every one of them
+        asyncio.run_coroutine_threadsafe(asyncio.sleep(0),
+                                         self.hub.loop).result()
+        late = self.connect()
+        self.assertIn('1.name', self.hub.state)
+
+        for lines in early:
+            state, messages = self.follow(lines)
+            self.assertEqual(state, self.hub.state)
+            self.assertIn('snapshot', messages[0])
+            self.assertTrue(any(m.get('event') == 'settle'
+                                for m in messages))
+        state, messages = self.follow(late)
+        self.assertEqual(state, self.hub.state)
+        self.assertEqual(len(messages), 1)
+        self.assertNotIn(feed.on_event, bj.listeners)
+
+    def test_backpressure(self):
+        """
+        Make sure a spectator that falls behind gets a snapshot instead
+        of the deltas it missed.
+        """
+        self.hub.queue_size = 2
+        lines = self.connect()
+        self.assertEqual(json.loads(lines.readline())['seq'], 0)
+
+        states = [{'shoe': i} for i in range(1, 11)]
+        self.hub.loop.call_soon_threadsafe(
+            lambda: [self.hub._publish(s, 'test') for s in states])
+
+        state, messages = self.follow(lines)
+        self.assertEqual(state, {'shoe': 10})
+        self.assertEqual(messages[-1], {'seq': 10,
+                                        'snapshot': {'shoe': 10}})
+        self.assertEqual(len(messages), 1)
+        self.assertEqual(self.hub.resyncs, 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,83 @@
+#!/usr/bin/env python
+
+"""
+unittests for strategy.py
+"""
+
+__author__ = "Kyle Long"
+__email__ = "long.kyle@gmail.com"
+__date__ = "08/26/2019"
+__copyright__ = "Copyright 2019, Kyle Long"
+__python_version__ = "3.7.4"
+
+
+import unittest
+import strategy as st
+from blackjack import Card, Hand
+
+
+class TestBasicStrategy(unittest.TestCase):
+
+    def make_hand(self, *values):
+        """
+        Non-test method that builds a hand from card values.
+        """
+        hand = Hand()
+        for v in values:
+            hand.cards.append(Card('Hearts', str(v), v))
+        return hand
+
+    def test_action(self):
+        """
+        Spot check hard, soft & pair decisions.
+        """
+        bot = st.BasicStrategy()
+        pair_options = ['s', 'h', 'd', 'split']
+        all_options = ['s', 'h', 'd']
+        no_double = ['s', 'h']
+
+        # hard 16 vs 10 hits, hard 16 vs 6 stays
+        hand = self.make_hand(10, 6)
+        self.assertEqual(bot.action(hand, Card('Hearts', 'King', 10),
+                                    no_double, 500, None), 'h')
+        self.assertEqual(bot.action(hand, Card('Hearts', 'Six', 6),
+                                    no_double, 500, None), 's')
+
+        # hard 11 doubles when allowed, otherwise hits
+        hand = self.make_hand(5, 6)
+        self.assertEqual(bot.action(hand, Card('Hearts', 'Ace', 1),
+                                    all_options, 500, None), 'd')
+        self.assertEqual(bot.action(hand, Card('Hearts', 'Ace', 1),
+                                    no_double, 500, None), 'h')
+
+        # soft 18 vs 3 doubles, stays when doubling isn't allowed
+        hand = self.make_hand(1, 7)
+        self.assertEqual(bot.action(hand, Card('Hearts', 'Three', 3),
+                                    all_options, 500, None), 'd')
+        self.assertEqual(bot.action(hand, Card('Hearts', 'Three', 3),
+                                    no_double, 500, None), 's')
+
+        # always split 8s, stand on 9s vs 7
+        hand = self.make_hand(8, 8)
+        self.assertEqual(bot.action(hand, Card('Hearts', 'Ten', 10),
+                                    pair_options, 500, None), 'split')
+        hand = self.make_hand(9, 9)
+        self.assertEqual(bot.action(hand, Card('Hearts', 'Seven', 7),
+                                    pair_options, 500, None), 's')
+
+
+class TestRandomStrategy(unittest.TestCase):
+
+    def test_legal_choices(self):
+        """
+        Make sure the random bot only picks legal actions & wagers.
+        """
+        bot = st.RandomStrategy(unit=10, seed=1)
+        for _ in range(100):
+            self.assertIn(bot.action(Hand(), None, ['s', 'h'], 5, None),
+                          ['s', 'h'])
+            self.assertTrue(1 <= bot.wager(5, None) <= 5)
+
+
+if __name__ == '__main__':
+    unittest.main()